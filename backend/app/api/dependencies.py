@@ -1,40 +1,19 @@
+import json
+from dataclasses import dataclass
+from typing import List, Optional
+
 from fastapi import Depends, HTTPException, status, Request
-from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-import jwt
-from app.core.security import decode_access_token, get_current_active_user
-from app.db.session import SessionLocal
+from app.core.admission import RESERVATIONS_KEY
+from app.core.profiling import PROFILE_HEADER
+# one session and one user lookup per request: every dependency below
+# uses these same callables, which FastAPI resolves once per request
+from app.core.security import get_current_active_user, get_current_user  # noqa: F401
+from app.db.session import get_db
 from app.db.models.user import User
 from app.services.history_service import log_action
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = decode_access_token(token)
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except jwt.PyJWTError:
-        raise credentials_exception
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    if user is None:
-        raise credentials_exception
-    return user
-
-def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+def get_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
     if current_user.role.name != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
     return current_user
@@ -55,4 +34,55 @@ def make_history_dep(action: str):
     ):
         source = _detect_source(request)
         await log_action(db, user, action, request, source)
-    return _history
\ No newline at end of file
+    return _history
+
+async def log_batch_action(
+    request: Request,
+    db: Session = Depends(get_db),
+    user = Depends(get_current_active_user),
+):
+    """
+    One history entry for a whole batch, e.g. "batch_compress (120 files)",
+    instead of one per file. The form is parsed once and cached on the
+    request, so reading it here costs nothing extra.
+    """
+    form = await request.form()
+    try:
+        op = json.loads(form.get("operation") or "{}").get("op") or "unknown"
+    except (ValueError, AttributeError):
+        op = "unknown"
+    count = len(form.getlist("files")) + len(
+        [u for u in str(form.get("upload_ids") or "").split(",") if u.strip()]
+    )
+    action = f"batch_{op} ({count} files)"[:50]
+    await log_action(db, user, action, request, _detect_source(request))
+
+@dataclass
+class JobOwner:
+    user_id: int
+    source: str
+    # memory reserved for this request, released once the response is
+    # sent (None outside AdmissionMiddleware: release right away)
+    reservations: Optional[List[int]] = None
+    # run the job under the profiler (admins only, on request)
+    profile: bool = False
+
+def get_job_owner(
+    request: Request,
+    db: Session = Depends(get_db),
+    user = Depends(get_current_active_user),
+) -> JobOwner:
+    """
+    Who a PDF job is scheduled for: the user and frontend/api source.
+    Resolved after the history entry is written, so it also hands the
+    request's database connection back to the pool; PDF jobs run for
+    seconds and need no database.
+    """
+    owner = JobOwner(
+        user.id,
+        _detect_source(request),
+        request.scope.get(RESERVATIONS_KEY),
+        PROFILE_HEADER in request.headers and user.role.name == "admin",
+    )
+    db.close()
+    return owner
@@ -0,0 +1,103 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.api.utils.thumbnail import thumbnail_cache
+from app.core.admission import memory_budget
+from app.core.metrics import registry, shared_metrics
+from app.core.scheduler import scheduler
+from app.core.server import resident_memory
+from app.db.session import engine
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# counters and gauges read from the existing attributes only when scraped
+
+registry.counter(
+    "thumbnail_cache_requests_total",
+    "Thumbnail cache lookups by result",
+    ("result",),
+    callback=lambda: {
+        ("hit",): thumbnail_cache.hits,
+        ("miss",): thumbnail_cache.misses,
+    },
+)
+registry.gauge(
+    "thumbnail_cache_bytes",
+    "Encoded thumbnails held in the cache",
+    callback=lambda: {(): thumbnail_cache.size},
+)
+
+def _pool_usage():
+    pool = engine.pool
+    usage = {("checked_out",): pool.checkedout()} if hasattr(pool, "checkedout") else {}
+    if hasattr(pool, "size"):
+        usage[("size",)] = pool.size()
+    if hasattr(pool, "overflow"):
+        usage[("overflow",)] = max(0, pool.overflow())
+    return usage
+
+registry.gauge(
+    "db_pool_connections",
+    "Connections of the database pool by state",
+    ("state",),
+    callback=_pool_usage,
+)
+registry.gauge(
+    "admission_memory_bytes",
+    "Working memory reserved by admitted requests and the budget",
+    ("state",),
+    callback=lambda: {
+        ("in_use",): memory_budget.in_use,
+        ("limit",): memory_budget.limit,
+    },
+)
+registry.counter(
+    "admission_requests_total",
+    "Requests admitted and rejected by the memory budget",
+    ("result",),
+    callback=lambda: {
+        ("admitted",): memory_budget.admitted,
+        ("rejected",): memory_budget.rejected,
+    },
+)
+registry.gauge(
+    "admission_requests_queued",
+    "Requests waiting for memory",
+    callback=lambda: {(): memory_budget.queued},
+)
+registry.gauge(
+    "scheduler_jobs",
+    "Jobs running and queued in the fair-share scheduler",
+    ("state",),
+    callback=lambda: {
+        ("running",): scheduler.running,
+        ("queued",): scheduler.queued,
+    },
+)
+registry.counter(
+    "scheduler_jobs_rejected_total",
+    "Jobs rejected by the fair-share scheduler",
+    callback=lambda: {(): scheduler.rejected},
+)
+
+def _resident_memory():
+    rss = resident_memory()
+    return {(): rss} if rss else {}
+
+registry.gauge(
+    "process_resident_memory_bytes",
+    "Resident memory of this worker process",
+    callback=_resident_memory,
+)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Metrics in the Prometheus text exposition format, of the whole
+    server when its workers share METRICS_DIR.
+    """
+    shared = shared_metrics()
+    text = shared.render() if shared is not None else registry.render()
+    return PlainTextResponse(text, media_type=PROMETHEUS_CONTENT_TYPE)
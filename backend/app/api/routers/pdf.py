@@ -1,25 +1,50 @@
-from typing import List, Optional
-from fastapi import UploadFile, File, Form, HTTPException, APIRouter, Depends
-from fastapi.responses import StreamingResponse, JSONResponse
-from io import BytesIO
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import replace
+from pydantic import ValidationError
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+from fastapi import UploadFile, File, Form, HTTPException, APIRouter, Depends, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from zipfile import ZipFile
+from starlette.background import BackgroundTask
 
-from app.api.dependencies import make_history_dep
-from app.api.utils.merge_pdf import merge_pdfs_bytes
-from app.api.utils.extract_text import extract_text_from_pdf_bytes
-from app.api.utils.extract_images import extract_images_from_pdf_bytes
+from app.api.dependencies import (
+    JobOwner, get_admin_user, get_job_owner, log_batch_action, make_history_dep,
+)
+from app.api.utils.merge_pdf import merge_pdf_files
+from app.api.utils.cost import estimate_cost, estimate_raster_cost
+from app.api.utils.engines import PdfEngine, get_engine
+from app.api.utils.output import output_file, spool
+from app.core.admission import AdmissionRejected, memory_budget
+from app.core.config import settings
+from app.core.profiling import list_profiles, profile_call, profile_path
+from app.core.metrics import OPERATION_INPUT_BYTES, OPERATION_PHASE, PAGES_PROCESSED
+from app.core.scheduler import scheduler
 from app.core.security import get_current_active_user
-from app.api.utils.remove_pages import remove_pages_bytes
-from app.api.utils.split_pdf import (
-    split_by_range_bytes,
-    split_by_interval_bytes,
-    extract_pages_bytes,
+from app.db.models.user import User
+from app.services.search_service import document_hash, index_pages
+from app.services.upload_service import UploadError, finalized_upload
+from app.api.utils.compress import PROFILES as COMPRESSION_PROFILES, run_in_process
+from app.api.utils import compress
+from app.api.utils.pipeline import run_pipeline_bytes, run_step_bytes, validate_steps
+from app.api.utils.optimize import optimize_level, optimize_pdf, optimize_pdf_file
+from app.api.utils.page_selection import parse_page_selection
+from app.api.utils.preflight import PreflightError, preflight_pdf
+from app.api.utils.thumbnail import (
+    THUMBNAIL_FORMATS,
+    cached_thumbnail,
+    document_page_count,
+    render_thumbnails,
 )
-from app.api.utils.compress import compress_pdf_bytes
-from app.api.utils.add_watermark import add_watermark_bytes, add_text_watermark_bytes
-from app.api.utils.convert_to_png import pdf_to_png_zip_bytes
-from app.api.utils.convert_to_jpg import pdf_to_jpg_zip_bytes
-from app.api.utils.multiple_pages_on_one import n_up_pdf_bytes
+from app.schemas.pipeline import PipelineStepAdapter, PipelineSteps
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/pdf",
@@ -27,64 +52,351 @@ router = APIRouter(
     dependencies=[Depends(get_current_active_user)]
 )
 
+ENGINE_DESCRIPTION = "pypdf, pymupdf or auto (default: server setting)"
+
+PAGE_SELECTION_DESCRIPTION = (
+    "e.g. '1-3,5', '10-1' (reversed), '1-20:2' (every 2nd page), 'even' or 'odd'"
+)
+
+UPLOAD_ID_DESCRIPTION = "Finalized resumable upload (POST /pdf/uploads) to use instead of a file"
+
+OPTIMIZE_DESCRIPTION = (
+    "Shrink the output PDF: off, fast (compress streams, object streams) "
+    "or max (also merge duplicate fonts and images); default: server setting"
+)
+
+RASTER_FORMAT_DESCRIPTION = "Output image format: png, jpeg or webp"
+RASTER_QUALITY_DESCRIPTION = (
+    "JPEG/WebP quality (1-100) or PNG compression level (0-9); encoder default if empty"
+)
+
+def _rejected(exc: AdmissionRejected) -> HTTPException:
+    if exc.retry_after is None:
+        return HTTPException(status_code=413, detail=str(exc))
+    return HTTPException(
+        status_code=503,
+        detail=str(exc),
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+async def _preflight(content: bytes, operation: str, filename: Optional[str]) -> None:
+    try:
+        with OPERATION_PHASE.time(operation=operation, phase="preflight"):
+            await run_in_threadpool(preflight_pdf, content)
+    except PreflightError as exc:
+        detail = f"{filename}: {exc}" if filename else str(exc)
+        raise HTTPException(status_code=exc.status_code, detail=detail)
+
+async def _read(
+    file: Optional[UploadFile],
+    operation: str,
+    upload_id: Optional[str] = None,
+    owner: Optional[JobOwner] = None,
+) -> bytes:
+    """
+    Read the uploaded file, or the assembled file of a finalized
+    resumable upload, and reject it unless it passes the preflight
+    checks, before any cost estimate, engine or scheduler slot touches
+    it. Resumable uploads were checked when they were finalized.
+    """
+    if upload_id is not None:
+        path, _ = await _upload(upload_id, owner)
+        with OPERATION_PHASE.time(operation=operation, phase="upload"):
+            content = await run_in_threadpool(_read_file, path)
+        OPERATION_INPUT_BYTES.observe(len(content), operation=operation)
+        return content
+    if file is None:
+        raise HTTPException(status_code=400, detail="Send a file or an upload_id")
+    with OPERATION_PHASE.time(operation=operation, phase="upload"):
+        content = await file.read()
+    OPERATION_INPUT_BYTES.observe(len(content), operation=operation)
+    await _preflight(content, operation, file.filename)
+    return content
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _upload(upload_id: str, owner: JobOwner) -> Tuple[str, dict]:
+    try:
+        return await run_in_threadpool(finalized_upload, upload_id, owner.user_id)
+    except UploadError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+
+async def _filename(file: Optional[UploadFile], upload_id: Optional[str], owner: JobOwner) -> Optional[str]:
+    if upload_id is not None:
+        _, meta = await _upload(upload_id, owner)
+        return meta["filename"]
+    return file.filename
+
+async def _run(owner: JobOwner, operation: str, cost: int, func, *args, **kwargs):
+    """
+    Run blocking PDF work in the threadpool once its estimated peak memory
+    fits into the process budget and the fair-share scheduler gives the
+    owner a CPU slot. Memory is reserved first, so no worker slot sits
+    idle while a job waits for memory, and held until the response has
+    been sent. Requests that cannot be admitted get 503 with
+    Retry-After, or 413 if they could never fit.
+    """
+    queued = time.perf_counter()
+    try:
+        await memory_budget.acquire(cost)
+    except AdmissionRejected as exc:
+        raise _rejected(exc)
+    if owner.reservations is not None:
+        # released by AdmissionMiddleware after the response is sent
+        owner.reservations.append(cost)
+    try:
+        async with scheduler.slot(owner.user_id, owner.source, cost):
+            OPERATION_PHASE.observe(
+                time.perf_counter() - queued, operation=operation, phase="queue"
+            )
+            with OPERATION_PHASE.time(operation=operation, phase="process"):
+                if not owner.profile:
+                    return await run_in_threadpool(func, *args, **kwargs)
+                result, profile_id = await run_in_threadpool(
+                    profile_call, operation, owner.user_id, func, *args, **kwargs
+                )
+                log.info("Profiled %s as %s", operation, profile_id)
+                return result
+    except AdmissionRejected as exc:
+        raise _rejected(exc)
+    finally:
+        if owner.reservations is None:
+            memory_budget.release(cost)
+
+def _zip_entries(zip_io: BinaryIO) -> int:
+    # reads only the central directory at the end of the archive
+    with ZipFile(zip_io) as zf:
+        count = len(zf.infolist())
+    zip_io.seek(0)
+    return count
+
+def _write_zip(out: BinaryIO, members: Iterable[Tuple[str, bytes]]) -> None:
+    with ZipFile(out, "w") as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+
+@contextmanager
+def _output(suffix: str):
+    """Output file for a job's result; removed again if the job fails."""
+    out = output_file(suffix)
+    try:
+        with out:
+            yield out
+    except BaseException:
+        os.unlink(out.name)
+        raise
+
+def _spooled(func, suffix: str):
+    """
+    Wrap a job returning an in-memory buffer so that, still in the worker
+    thread, the buffer is moved to an output file whose path is returned.
+    """
+    @functools.wraps(func)
+    def job(*args, **kwargs):
+        return spool(func(*args, **kwargs), suffix)
+    return job
+
+def _optimized(func, operation: str, level: str):
+    """
+    Wrap a job returning a PDF buffer, or a list of them, so that the
+    result passes the output optimization stage in the same worker thread.
+    """
+    @functools.wraps(func)
+    def job(*args, **kwargs):
+        result = func(*args, **kwargs)
+        with OPERATION_PHASE.time(operation=operation, phase="optimize"):
+            if isinstance(result, list):
+                return [optimize_pdf(part, level) for part in result]
+            return optimize_pdf(result, level)
+    return job
+
+def _merge_files(inputs: List[BinaryIO], out: BinaryIO, level: str) -> None:
+    merge_pdf_files(inputs, out)
+    out.flush()
+    with OPERATION_PHASE.time(operation="merge", phase="optimize"):
+        optimize_pdf_file(out.name, level)
+
+def _level(optimize: Optional[str]) -> str:
+    try:
+        return optimize_level(optimize)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+def _download(path: str, media_type: str, filename: str, headers=None) -> FileResponse:
+    """
+    Send an output file and delete it afterwards. FileResponse sets
+    Content-Length and hands the path to the server where it supports
+    zero-copy sending (the ASGI pathsend extension); otherwise the file
+    is read in chunks off the event loop.
+    """
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=filename,
+        headers=headers,
+        background=BackgroundTask(os.unlink, path),
+    )
+
+def _engine(name: Optional[str], operation: str, size: int) -> PdfEngine:
+    try:
+        return get_engine(name, operation, size)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
 @router.get("/health")
 async def health_check():
     return JSONResponse({"status": "ok"})
 
+@router.get("/scheduler", dependencies=[Depends(get_admin_user)])
+async def scheduler_stats():
+    """Queue wait per request source and in-flight/finished work per user."""
+    return JSONResponse(scheduler.snapshot())
+
+@router.get("/profiles", dependencies=[Depends(get_admin_user)])
+async def profiles():
+    """
+    Profiles of calls sent by an admin with the X-Profile header, newest
+    first: operation, parameters, duration and peak traced memory.
+    """
+    return JSONResponse(await run_in_threadpool(list_profiles))
+
+@router.get("/profiles/{profile_id}/{filename}", dependencies=[Depends(get_admin_user)])
+async def profile_file(profile_id: str, filename: str):
+    """
+    Download profile.folded (collapsed stacks for flame graphs),
+    memory.txt (largest allocations) or params.json of one profile.
+    """
+    path = profile_path(profile_id, filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=filename)
+
 @router.post("/merge-pdf",
              dependencies=[Depends(make_history_dep("merge_pdf"))])
 async def merge_pdf_endpoint(
-    files: List[UploadFile] = File(..., description="Select two or more PDF files")
+    files: List[UploadFile] = File([], description="Select two or more PDF files"),
+    upload_ids: Optional[str] = Form(
+        None, description="Comma-separated finalized resumable uploads, merged before the files"
+    ),
+    low_memory: bool = Form(
+        False, description="Merge from disk one file at a time (pypdf engine only)"
+    ),
+    engine: Optional[str] = Form(
+        None, description=f"{ENGINE_DESCRIPTION}; only pypdf together with low_memory"
+    ),
+    optimize: Optional[str] = Form(None, description=OPTIMIZE_DESCRIPTION),
+    owner: JobOwner = Depends(get_job_owner),
 ):
-    if len(files) < 2:
+    uploads = [u.strip() for u in (upload_ids or "").split(",") if u.strip()]
+    if len(uploads) + len(files) < 2:
         raise HTTPException(status_code=400, detail="At least two PDFs are required to merge.")
+    level = _level(optimize)
+
+    if low_memory:
+        if engine not in (None, "", "pypdf"):
+            # the streaming merge is pypdf code; a different engine would be ignored
+            raise HTTPException(
+                status_code=400, detail="low_memory merges only support the pypdf engine"
+            )
+        # uploads are already spooled to disk by Starlette; read them one
+        # by one and write the result to a temporary file
+        # only one input is parsed at a time
+        paths = [(await _upload(u, owner))[0] for u in uploads]
+        cost = estimate_cost(
+            "merge", max([os.path.getsize(p) for p in paths] + [f.size or 0 for f in files])
+        )
+        for f in files:
+            # checked one at a time, so at most one input is in memory
+            await _preflight(await f.read(), "merge", f.filename)
+            await f.seek(0)
+        try:
+            with _output(".pdf") as out, ExitStack() as stack:
+                inputs = [stack.enter_context(open(p, "rb")) for p in paths]
+                inputs += [f.file for f in files]
+                await _run(owner, "merge", cost, _merge_files, inputs, out, level)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        return _download(out.name, "application/pdf", "merged.pdf")
 
     # Read all uploaded PDFs into memory
-    file_bytes = [await f.read() for f in files]
+    file_bytes = [await _read(None, "merge", u, owner) for u in uploads]
+    file_bytes += [await _read(f, "merge") for f in files]
 
     # Merge them
-    merged_io = merge_pdfs_bytes(file_bytes)
-
-    # Stream back as a downloadable PDF
-    return StreamingResponse(
-        merged_io,
-        media_type="application/pdf",
-        headers={"Content-Disposition": 'attachment; filename="merged.pdf"'}
+    size = sum(len(b) for b in file_bytes)
+    path = await _run(
+        owner, "merge", estimate_cost("merge", size),
+        _spooled(_optimized(_engine(engine, "merge", size).merge, "merge", level), ".pdf"),
+        file_bytes,
     )
+    return _download(path, "application/pdf", "merged.pdf")
 
 @router.post("/extract-text",
              dependencies=[Depends(make_history_dep("extract_text"))])
 async def extract_text_endpoint(
-    file: UploadFile = File(..., description="Select one PDF to extract from"),
-    page_range: str = Form("", description="e.g. '1-3,5-7'"),
-    preserve_layout: bool = Form(False, description="Keep horizontal layout")
+    file: Optional[UploadFile] = File(None, description="Select one PDF to extract from"),
+    upload_id: Optional[str] = Form(None, description=UPLOAD_ID_DESCRIPTION),
+    page_range: str = Form("", description=PAGE_SELECTION_DESCRIPTION),
+    preserve_layout: bool = Form(False, description="Keep horizontal layout"),
+    engine: Optional[str] = Form(None, description=ENGINE_DESCRIPTION),
+    owner: JobOwner = Depends(get_job_owner),
 ):
-    content = await file.read()
-    text = extract_text_from_pdf_bytes(content, page_range, preserve_layout)
+    content = await _read(file, "extract_text", upload_id, owner)
+    try:
+        page_count, page_texts = await _run(
+            owner, "extract_text", estimate_cost("extract_text", len(content)),
+            _engine(engine, "extract_text", len(content)).extract_text,
+            content, page_range, preserve_layout,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    PAGES_PROCESSED.inc(len(page_texts), operation="extract_text")
+
+    # pages extracted without layout are added to the search index,
+    # so later lookups don't need to parse the PDF again
+    # (a blocking SQLite write, so it runs off the event loop)
+    if not preserve_layout:
+        await run_in_threadpool(
+            index_pages,
+            document_hash(content),
+            await _filename(file, upload_id, owner),
+            page_count,
+            page_texts,
+            owner.user_id,
+        )
+
+    text = "\n\n".join(t for _, t in page_texts)
     return JSONResponse({"text": text})
 
 @router.post("/extract-images",
              dependencies=[Depends(make_history_dep("extract_images"))])
 async def extract_images_endpoint(
-    file: UploadFile = File(..., description="Select one PDF"),
-    page_range: str = Form("", description="e.g. '1-3,5-7'"),
-    image_format: str = Form("all", description="jpeg, png, or all"),
+    file: Optional[UploadFile] = File(None, description="Select one PDF"),
+    upload_id: Optional[str] = Form(None, description=UPLOAD_ID_DESCRIPTION),
+    page_range: str = Form("", description=PAGE_SELECTION_DESCRIPTION),
+    image_format: str = Form("all", description="jpeg, jp2, png, tiff or all"),
     min_width: int = Form(0, description="Min image width in px"),
-    min_height: int = Form(0, description="Min image height in px")
+    min_height: int = Form(0, description="Min image height in px"),
+    passthrough: bool = Form(True, description="Copy JPEG/JPEG 2000 streams unchanged"),
+    deduplicate: bool = Form(True, description="Skip images repeated across pages"),
+    engine: Optional[str] = Form(None, description=ENGINE_DESCRIPTION),
+    owner: JobOwner = Depends(get_job_owner),
 ):
-    # Add debug print
-    print(f"Received min_width={min_width}, min_height={min_height}")
-    content = await file.read()
-    zip_io, count = extract_images_from_pdf_bytes(
-        content, page_range, image_format, min_width, min_height
-    )
-    return StreamingResponse(
-        zip_io,
-        media_type="application/zip",
-        headers={
-            "Content-Disposition": 'attachment; filename="images.zip"',
-            "x-image-count": str(count)
-        }
+    content = await _read(file, "extract_images", upload_id, owner)
+    try:
+        with _output(".zip") as out:
+            _, count = await _run(
+                owner, "extract_images", estimate_cost("extract_images", len(content)),
+                _engine(engine, "extract_images", len(content)).extract_images,
+                content, page_range, image_format, min_width, min_height,
+                passthrough=passthrough, deduplicate=deduplicate, out=out,
+            )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _download(
+        out.name, "application/zip", "images.zip", {"x-image-count": str(count)}
     )
 
 @router.post(
@@ -92,88 +404,116 @@ async def extract_images_endpoint(
     dependencies=[Depends(make_history_dep("remove_pages"))]
 )
 async def remove_pages_endpoint(
-    file: UploadFile = File(
-        ..., description="Select one PDF to remove pages from"
+    file: Optional[UploadFile] = File(
+        None, description="Select one PDF to remove pages from"
     ),
+    upload_id: Optional[str] = Form(None, description=UPLOAD_ID_DESCRIPTION),
     page_range: str = Form(
         "", description="e.g. '1-3,5-7' pages to delete"
     ),
+    engine: Optional[str] = Form(None, description=ENGINE_DESCRIPTION),
+    optimize: Optional[str] = Form(None, description=OPTIMIZE_DESCRIPTION),
+    owner: JobOwner = Depends(get_job_owner),
 ):
     """
     Delete the given pages from a single PDF and return the new PDF.
     """
-    content = await file.read()
-    modified_pdf = remove_pages_bytes(content, page_range)
-    return StreamingResponse(
-        modified_pdf,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": 'attachment; filename="modified.pdf"'
-        }
-    )
+    level = _level(optimize)
+    content = await _read(file, "remove_pages", upload_id, owner)
+    try:
+        path = await _run(
+            owner, "remove_pages", estimate_cost("remove_pages", len(content)),
+            _spooled(_optimized(
+                _engine(engine, "remove_pages", len(content)).remove_pages, "remove_pages", level
+            ), ".pdf"),
+            content, page_range,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _download(path, "application/pdf", "modified.pdf")
 
 @router.post(
     "/split-pdf",
     dependencies=[Depends(make_history_dep("split_pdf"))]
 )
 async def split_pdf_endpoint(
-    file: UploadFile = File(..., description="Select one PDF to split"),
+    file: Optional[UploadFile] = File(None, description="Select one PDF to split"),
+    upload_id: Optional[str] = Form(None, description=UPLOAD_ID_DESCRIPTION),
     split_method: str = Form("range", description="range, interval or extract"),
-    page_range: str = Form("", description="e.g. '1-3,5-7'"),
+    page_range: str = Form("", description=PAGE_SELECTION_DESCRIPTION),
     interval: int = Form(1, description="Pages per chunk"),
-    extract_option: str = Form("all", description="all, even, or odd")
+    extract_option: str = Form("all", description="all, even, or odd"),
+    engine: Optional[str] = Form(None, description=ENGINE_DESCRIPTION),
+    optimize: Optional[str] = Form(None, description=OPTIMIZE_DESCRIPTION),
+    owner: JobOwner = Depends(get_job_owner),
 ):
-    content = await file.read()
-
     if split_method == "range":
-        parts = split_by_range_bytes(content, page_range)
+        operation, argument = "split_range", page_range
     elif split_method == "interval":
-        parts = split_by_interval_bytes(content, interval)
+        operation, argument = "split_interval", interval
     elif split_method == "extract":
-        parts = extract_pages_bytes(content, extract_option)
+        operation, argument = "extract_pages", extract_option
     else:
         raise HTTPException(status_code=400, detail="Invalid split method")
+    level = _level(optimize)
+    content = await _read(file, operation, upload_id, owner)
+    try:
+        parts = await _run(
+            owner, operation, estimate_cost(operation, len(content)),
+            _optimized(getattr(_engine(engine, operation, len(content)), operation), operation, level),
+            content, argument,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
-    zip_io = BytesIO()
-    with ZipFile(zip_io, "w") as zf:
-        for idx, part in enumerate(parts, start=1):
-            zf.writestr(f"part_{idx}.pdf", part.getvalue())
-    zip_io.seek(0)
-
-    return StreamingResponse(
-        zip_io,
-        media_type="application/zip",
-        headers={"Content-Disposition": 'attachment; filename="split.zip"'}
-    )
+    with OPERATION_PHASE.time(operation=operation, phase="serialize"), _output(".zip") as out:
+        await run_in_threadpool(
+            _write_zip,
+            out,
+            ((f"part_{idx}.pdf", part.getvalue()) for idx, part in enumerate(parts, start=1)),
+        )
+    return _download(out.name, "application/zip", "split.zip")
 
 @router.post("/compress-pdf",
              dependencies=[Depends(make_history_dep("compress_pdf"))])
 async def compress_pdf_endpoint(
-    file: UploadFile = File(..., description="Select one PDF to compress"),
+    file: Optional[UploadFile] = File(None, description="Select one PDF to compress"),
+    upload_id: Optional[str] = Form(None, description=UPLOAD_ID_DESCRIPTION),
     remove_duplicates: bool = Form(True, description="Remove duplicate objects"),
     remove_images: bool = Form(False, description="Remove all images"),
     reduce_image_quality: Optional[int] = Form(
         None,
         description="If set, re-encode all images to this JPEG quality (0–100)"
-    )
+    ),
+    profile: Optional[str] = Form(
+        None,
+        description="screen (72 DPI), ebook (150 DPI) or print (300 DPI) image downsampling"
+    ),
+    engine: Optional[str] = Form(None, description=ENGINE_DESCRIPTION),
+    optimize: Optional[str] = Form(None, description=OPTIMIZE_DESCRIPTION),
+    owner: JobOwner = Depends(get_job_owner),
 ):
-    content = await file.read()
-    compressed_io = compress_pdf_bytes(
+    if profile is not None and profile not in COMPRESSION_PROFILES:
+        raise HTTPException(status_code=400, detail="Invalid compression profile")
+    level = _level(optimize)
+
+    content = await _read(file, "compress", upload_id, owner)
+    path = await _run(
+        owner, "compress", estimate_cost("compress", len(content)),
+        _spooled(_optimized(_engine(engine, "compress", len(content)).compress, "compress", level), ".pdf"),
         content,
         remove_duplicates=remove_duplicates,
         remove_images=remove_images,
-        reduce_image_quality=reduce_image_quality
-    )
-    return StreamingResponse(
-        compressed_io,
-        media_type="application/pdf",
-        headers={"Content-Disposition": 'attachment; filename="compressed.pdf"'}
+        reduce_image_quality=reduce_image_quality,
+        profile=profile,
     )
+    return _download(path, "application/pdf", "compressed.pdf")
 
 @router.post("/add-text-watermark",
              dependencies=[Depends(make_history_dep("add_text_watermark"))])
 async def add_text_watermark_endpoint(
-    file: UploadFile = File(..., description="Select one PDF to watermark"),
+    file: Optional[UploadFile] = File(None, description="Select one PDF to watermark"),
+    upload_id: Optional[str] = Form(None, description=UPLOAD_ID_DESCRIPTION),
     text: str = Form(..., description="Watermark text"),
     color: str = Form("#888888", description="Hex color (e.g. #FF0000)"),
     font_size: int = Form(48, description="Font size in pt"),
@@ -181,66 +521,364 @@ async def add_text_watermark_endpoint(
     rotation: float = Form(45, description="Rotation in degrees"),
     position: str = Form("center",
                         description="Position: topLeft, topCenter, topRight, center, bottomLeft, bottomCenter, bottomRight"),
+    engine: Optional[str] = Form(None, description=ENGINE_DESCRIPTION),
+    optimize: Optional[str] = Form(None, description=OPTIMIZE_DESCRIPTION),
+    owner: JobOwner = Depends(get_job_owner),
 ):
     """
     Add a pure-text watermark to every page.
     """
-    data = await file.read()
-    watermarked = add_text_watermark_bytes(
+    level = _level(optimize)
+    data = await _read(file, "add_text_watermark", upload_id, owner)
+    path = await _run(
+        owner, "add_text_watermark", estimate_cost("add_text_watermark", len(data)),
+        _spooled(_optimized(
+            _engine(engine, "add_text_watermark", len(data)).add_text_watermark, "add_text_watermark", level
+        ), ".pdf"),
         data, text, color, font_size, opacity, rotation, position
     )
-    return StreamingResponse(
-        watermarked,
-        media_type="application/pdf",
-        headers={"Content-Disposition": 'attachment; filename="watermarked.pdf"'}
-    )
+    return _download(path, "application/pdf", "watermarked.pdf")
 
 @router.post("/pdf-to-png",
              dependencies=[Depends(make_history_dep("pdf_to_png"))])
 async def pdf_to_png_endpoint(
-    file: UploadFile = File(..., description="Select one PDF to convert to PNG"),
+    file: Optional[UploadFile] = File(None, description="Select one PDF to convert to PNG"),
+    upload_id: Optional[str] = Form(None, description=UPLOAD_ID_DESCRIPTION),
     dpi: int = Form(300, description="Resolution in DPI"),
+    page_range: Optional[str] = Form(None, description="Pages to render, e.g. '1-3,5'; all if empty"),
+    format: str = Form("png", description=RASTER_FORMAT_DESCRIPTION),
+    quality: Optional[int] = Form(None, description=RASTER_QUALITY_DESCRIPTION),
+    grayscale: bool = Form(False, description="Render a single gray channel"),
+    transparent: bool = Form(False, description="Keep an alpha channel (PNG/WebP only)"),
+    max_pixels: Optional[int] = Form(None, gt=0, description="Upper bound on width × height per page; DPI is lowered to fit"),
+    engine: Optional[str] = Form(None, description=ENGINE_DESCRIPTION),
+    owner: JobOwner = Depends(get_job_owner),
 ):
     """
-    Convert each page of the uploaded PDF into a PNG and return a ZIP of images.
+    Convert the selected pages of the uploaded PDF into images (PNG by
+    default) and return a ZIP of images.
     """
-    content = await file.read()
-    zip_io = pdf_to_png_zip_bytes(content, dpi=dpi)
-    return StreamingResponse(
-        zip_io,
-        media_type="application/zip",
-        headers={"Content-Disposition": 'attachment; filename="pages.zip"'}
-    )
+    content = await _read(file, "to_png", upload_id, owner)
+    try:
+        cost = await run_in_threadpool(
+            estimate_raster_cost,
+            content, dpi, page_range, format, grayscale, transparent, max_pixels, "to_png",
+        )
+        with _output(".zip") as out:
+            await _run(
+                owner, "to_png", cost, _engine(engine, "to_png", len(content)).to_png,
+                content, dpi=dpi, fmt=format, page_range=page_range, quality=quality,
+                grayscale=grayscale, alpha=transparent, max_pixels=max_pixels, out=out,
+            )
+            PAGES_PROCESSED.inc(_zip_entries(out), operation="to_png")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _download(out.name, "application/zip", "pages.zip")
 
 @router.post("/pdf-to-jpg",
              dependencies=[Depends(make_history_dep("pdf_to_jpg"))])
 async def pdf_to_jpg_endpoint(
-    file: UploadFile = File(..., description="Select one PDF to convert to JPEG"),
+    file: Optional[UploadFile] = File(None, description="Select one PDF to convert to JPEG"),
+    upload_id: Optional[str] = Form(None, description=UPLOAD_ID_DESCRIPTION),
     dpi: int = Form(300, description="Resolution in DPI"),
+    page_range: Optional[str] = Form(None, description="Pages to render, e.g. '1-3,5'; all if empty"),
+    format: str = Form("jpeg", description=RASTER_FORMAT_DESCRIPTION),
+    quality: Optional[int] = Form(None, description=RASTER_QUALITY_DESCRIPTION),
+    grayscale: bool = Form(False, description="Render a single gray channel"),
+    max_pixels: Optional[int] = Form(None, gt=0, description="Upper bound on width × height per page; DPI is lowered to fit"),
+    engine: Optional[str] = Form(None, description=ENGINE_DESCRIPTION),
+    owner: JobOwner = Depends(get_job_owner),
 ):
     """
-    Convert each page of the uploaded PDF into a JPEG and return a ZIP archive.
+    Convert the selected pages of the uploaded PDF into images (JPEG by
+    default) and return a ZIP archive.
     """
-    content = await file.read()
-    zip_io = pdf_to_jpg_zip_bytes(content, dpi=dpi)
-    return StreamingResponse(
-        zip_io,
-        media_type="application/zip",
-        headers={"Content-Disposition": 'attachment; filename="pages_jpg.zip"'}
-    )
+    content = await _read(file, "to_jpg", upload_id, owner)
+    try:
+        cost = await run_in_threadpool(
+            estimate_raster_cost,
+            content, dpi, page_range, format, grayscale, False, max_pixels, "to_jpg",
+        )
+        with _output(".zip") as out:
+            await _run(
+                owner, "to_jpg", cost, _engine(engine, "to_jpg", len(content)).to_jpg,
+                content, dpi=dpi, fmt=format, page_range=page_range, quality=quality,
+                grayscale=grayscale, max_pixels=max_pixels, out=out,
+            )
+            PAGES_PROCESSED.inc(_zip_entries(out), operation="to_jpg")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _download(out.name, "application/zip", "pages_jpg.zip")
 
 @router.post("/n-up",
              dependencies=[Depends(make_history_dep("n_up"))])
 async def n_up_endpoint(
-    file: UploadFile = File(..., description="Select one PDF"),
+    file: Optional[UploadFile] = File(None, description="Select one PDF"),
+    upload_id: Optional[str] = Form(None, description=UPLOAD_ID_DESCRIPTION),
     cols: int = Form(4, description="Columns per sheet"),
-    rows: int = Form(4, description="Rows per sheet")
+    rows: int = Form(4, description="Rows per sheet"),
+    engine: Optional[str] = Form(None, description=ENGINE_DESCRIPTION),
+    optimize: Optional[str] = Form(None, description=OPTIMIZE_DESCRIPTION),
+    owner: JobOwner = Depends(get_job_owner),
+):
+    level = _level(optimize)
+    data = await _read(file, "n_up", upload_id, owner)
+    path = await _run(
+        owner, "n_up", estimate_cost("n_up", len(data)),
+        _spooled(_optimized(_engine(engine, "n_up", len(data)).n_up, "n_up", level), ".pdf"),
+        data, cols=cols, rows=rows,
+    )
+    return _download(path, "application/pdf", "nup.pdf")
+
+
+@router.post("/pipeline",
+             dependencies=[Depends(make_history_dep("pipeline"))])
+async def pipeline_endpoint(
+    file: Optional[UploadFile] = File(None, description="Select one PDF"),
+    upload_id: Optional[str] = Form(None, description=UPLOAD_ID_DESCRIPTION),
+    steps: str = Form(
+        ...,
+        description='JSON list of steps run in order, e.g. '
+                    '[{"op": "remove_pages", "params": {"page_range": "1"}}, '
+                    '{"op": "add_text_watermark", "params": {"text": "DRAFT"}}, '
+                    '{"op": "compress", "params": {"profile": "ebook"}}]. '
+                    'Operations: remove_pages, add_text_watermark, compress, n_up',
+    ),
+    optimize: Optional[str] = Form(None, description=OPTIMIZE_DESCRIPTION),
+    owner: JobOwner = Depends(get_job_owner),
 ):
-    data = await file.read()
-    out_io = n_up_pdf_bytes(data, cols=cols, rows=rows)
+    """
+    Run several operations on one upload. The PDF is parsed once, every
+    step works on the same in-memory document and the result is written
+    once at the end.
+    """
+    try:
+        parsed = [s.model_dump() for s in PipelineSteps.validate_json(steps)]
+        validate_steps(parsed)
+        level = optimize_level(optimize)
+    except (ValidationError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    content = await _read(file, "pipeline", upload_id, owner)
+    try:
+        path = await _run(
+            owner, "pipeline", estimate_cost("pipeline", len(content)),
+            _spooled(_optimized(run_pipeline_bytes, "pipeline", level), ".pdf"), content, parsed,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _download(path, "application/pdf", "pipeline.pdf")
+
+
+class _ZipStream:
+    """Write target of a ZipFile whose bytes are handed out as they are produced."""
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def write(self, data) -> int:
+        self._buf += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+def _batch_name(index: int, filename: Optional[str]) -> str:
+    base = os.path.basename(filename or "") or "document.pdf"
+    return f"{index:04d}_{base}"
+
+@router.post("/batch", dependencies=[Depends(log_batch_action)])
+async def batch_endpoint(
+    operation: str = Form(
+        ...,
+        description='One step as in /pipeline, applied to every file, e.g. '
+                    '{"op": "compress", "params": {"profile": "ebook"}}',
+    ),
+    files: List[UploadFile] = File([], description="Select the PDFs to process"),
+    upload_ids: Optional[str] = Form(None, description="Comma-separated finalized resumable uploads"),
+    optimize: Optional[str] = Form(None, description=OPTIMIZE_DESCRIPTION),
+    owner: JobOwner = Depends(get_job_owner),
+):
+    """
+    Run one operation over many PDFs. Files are processed in parallel in
+    worker processes, each one admitted and scheduled like a single
+    request, and the ZIP is streamed as results finish. manifest.json at
+    its end lists every input with its output name or error; a failing
+    file does not fail the batch. One history entry is written for the
+    whole batch.
+
+    At most BATCH_CONCURRENCY files run at a time, but never more than
+    the scheduler lets one user run (SCHEDULER_USER_LIMIT, split between
+    the server workers), so with the defaults a batch runs one or two
+    files at a time. A file the scheduler or the memory budget turns
+    away as busy waits for Retry-After and is tried again, up to
+    BATCH_BUSY_RETRIES times, before it is reported as a 503.
+    """
+    try:
+        step = PipelineStepAdapter.validate_json(operation).model_dump()
+        validate_steps([step])
+        level = optimize_level(optimize)
+    except (ValidationError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    inputs = [(f, None) for f in files]
+    inputs += [(None, u.strip()) for u in (upload_ids or "").split(",") if u.strip()]
+    if not inputs:
+        raise HTTPException(status_code=400, detail="No files to process")
+    if len(inputs) > settings.BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=413, detail=f"At most {settings.BATCH_MAX_FILES} files per batch"
+        )
+
+    # every file reserves and releases its own memory; holding all of
+    # them until the ZIP is sent would exhaust the budget
+    job_owner = replace(owner, reservations=None, profile=False)
+    # more would only wait in the scheduler queue and time out there
+    limit = asyncio.Semaphore(
+        min(settings.BATCH_CONCURRENCY or compress.POOL_WORKERS, scheduler.user_limit)
+    )
+
+    async def run_file(content: bytes):
+        for attempt in range(settings.BATCH_BUSY_RETRIES + 1):
+            try:
+                return await _run(
+                    job_owner, "batch", estimate_cost("pipeline", len(content)),
+                    run_in_process, run_step_bytes, content, step, level,
+                )
+            except HTTPException as exc:
+                if exc.status_code != 503 or attempt == settings.BATCH_BUSY_RETRIES:
+                    raise
+                await asyncio.sleep(int((exc.headers or {}).get("Retry-After", 1)))
+
+    async def process(index: int, file: Optional[UploadFile], upload_id: Optional[str]) -> dict:
+        entry = {"index": index, "input": upload_id or file.filename}
+        async with limit:
+            try:
+                filename = await _filename(file, upload_id, job_owner)
+                content = await _read(file, "batch", upload_id, job_owner)
+                data = await run_file(content)
+            except HTTPException as exc:
+                return {**entry, "status": exc.status_code, "error": exc.detail}
+            except ValueError as exc:
+                return {**entry, "status": 400, "error": str(exc)}
+            except Exception as exc:
+                log.exception("Batch item %d failed", index)
+                return {**entry, "status": 500, "error": f"{type(exc).__name__}: {exc}"}
+        return {**entry, "status": 200, "output": _batch_name(index, filename), "data": data}
+
+    async def stream():
+        tasks = [
+            asyncio.create_task(process(index, *item))
+            for index, item in enumerate(inputs, start=1)
+        ]
+        sink = _ZipStream()
+        manifest = []
+        try:
+            with ZipFile(sink, "w") as zf:
+                for finished in asyncio.as_completed(tasks):
+                    entry = await finished
+                    data = entry.pop("data", None)
+                    if data is not None:
+                        await run_in_threadpool(zf.writestr, entry["output"], data)
+                        entry["bytes"] = len(data)
+                    manifest.append(entry)
+                    yield sink.take()
+                manifest.sort(key=lambda e: e["index"])
+                zf.writestr("manifest.json", json.dumps({"operation": step, "files": manifest}, indent=1))
+            yield sink.take()
+        finally:
+            # client gone: stop the files that have not finished
+            for task in tasks:
+                task.cancel()
+
     return StreamingResponse(
-        out_io,
-        media_type="application/pdf",
-        headers={"Content-Disposition": 'attachment; filename="nup.pdf"'}
+        stream(),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="batch.zip"'},
     )
 
+THUMBNAIL_CACHE_CONTROL = "private, max-age=86400, immutable"
+
+def _thumbnail_response(
+    data: bytes, fmt: str, doc_hash: str, page: int, size: int, quality: int
+) -> Response:
+    return Response(
+        data,
+        media_type=THUMBNAIL_FORMATS[fmt],
+        headers={
+            "Cache-Control": THUMBNAIL_CACHE_CONTROL,
+            "ETag": f'"{doc_hash[:16]}-{page}-{size}-{fmt}-{quality}"',
+            "X-Document-Hash": doc_hash,
+        },
+    )
+
+@router.post("/thumbnail")
+async def thumbnail_endpoint(
+    file: Optional[UploadFile] = File(None, description="Select one PDF"),
+    upload_id: Optional[str] = Form(None, description=UPLOAD_ID_DESCRIPTION),
+    page_range: str = Form("1", description="Pages to preview, e.g. '1' or '1-4'"),
+    size: int = Form(256, ge=16, le=2048, description="Longer edge in px"),
+    format: str = Form("webp", description="webp, jpeg or png"),
+    quality: int = Form(75, ge=1, le=100, description="WebP/JPEG quality"),
+    owner: JobOwner = Depends(get_job_owner),
+):
+    """
+    Render low-resolution previews of selected pages. A single page is
+    returned as an image, several pages as a ZIP. Renders are cached by
+    (document hash, page, size, format); the hash is returned in the
+    X-Document-Hash header and can be used with GET /thumbnail/{hash}/{page}.
+    """
+    if format not in THUMBNAIL_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid thumbnail format")
+
+    content = await _read(file, "thumbnail", upload_id, owner)
+    doc_hash = document_hash(content)
+    total = await run_in_threadpool(document_page_count, content, doc_hash)
+    try:
+        pages = list(parse_page_selection(page_range, total))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not pages:
+        raise HTTPException(status_code=400, detail="No pages selected")
+
+    images = await _run(
+        owner, "thumbnail", estimate_cost("thumbnail", len(content)),
+        render_thumbnails, content, doc_hash, pages, size, format, quality, owner.user_id,
+    )
+    PAGES_PROCESSED.inc(len(pages), operation="thumbnail")
+    if len(pages) == 1:
+        return _thumbnail_response(
+            images[pages[0]], format, doc_hash, pages[0] + 1, size, quality
+        )
+
+    with OPERATION_PHASE.time(operation="thumbnail", phase="serialize"), _output(".zip") as out:
+        await run_in_threadpool(
+            _write_zip, out, ((f"page_{idx + 1}.{format}", images[idx]) for idx in pages)
+        )
+    return _download(
+        out.name, "application/zip", "thumbnails.zip", {"X-Document-Hash": doc_hash}
+    )
+
+@router.get("/thumbnail/{doc_hash}/{page}")
+async def cached_thumbnail_endpoint(
+    doc_hash: str,
+    page: int,
+    size: int = Query(256, ge=16, le=2048),
+    format: str = Query("webp"),
+    quality: int = Query(75, ge=1, le=100),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Return an already rendered preview without uploading the PDF again.
+    Responds 404 when it is not (or no longer) cached, or when the caller
+    has not uploaded the document themselves.
+    """
+    data = cached_thumbnail(doc_hash, page - 1, size, format, quality, current_user.id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not cached")
+    return _thumbnail_response(data, format, doc_hash, page, size, quality)
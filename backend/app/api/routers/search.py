@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.dependencies import make_history_dep
+from app.api.utils.preflight import PreflightError, preflight_pdf
+from app.core.security import get_current_active_user
+from app.db.models.user import User
+from app.schemas.search import IndexResult, SearchHit
+from app.services.search_service import index_document, search
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("/", response_model=list[SearchHit])
+def search_documents(
+    q: str = Query(..., min_length=1, description="Searched terms"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Fulltextové vyhľadávanie v indexovanom texte dokumentov.
+
+    Vracia zhodné strany (číslované od 1) s úryvkom textu. Administrátor
+    prehľadáva všetky dokumenty, ostatní len tie, ktoré sami indexovali.
+    """
+    user_id = None if current_user.role.name == "admin" else current_user.id
+    return search(q, user_id=user_id, limit=limit, offset=offset)
+
+
+@router.post(
+    "/index",
+    response_model=IndexResult,
+    dependencies=[Depends(make_history_dep("index_document"))],
+)
+async def index_document_endpoint(
+    file: UploadFile = File(..., description="Select one PDF to index"),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Index every page of the uploaded PDF. Documents are keyed by content
+    hash, so uploading an already indexed file only records ownership.
+    """
+    content = await file.read()
+    try:
+        await run_in_threadpool(preflight_pdf, content)
+    except PreflightError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+    return await run_in_threadpool(
+        index_document, content, file.filename, current_user.id
+    )
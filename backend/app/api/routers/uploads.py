@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.dependencies import JobOwner, get_job_owner
+from app.core.security import get_current_active_user
+from app.schemas.upload import UploadCreate, UploadFinalize, UploadStatus
+from app.services.upload_service import (
+    ChunkWriter,
+    UploadError,
+    create_upload,
+    delete_upload,
+    finalize_upload,
+    upload_status,
+)
+
+router = APIRouter(
+    prefix="/pdf/uploads",
+    tags=["uploads"],
+    dependencies=[Depends(get_current_active_user)],
+)
+
+# request body is written to disk in blocks of this size
+_WRITE_BLOCK = 1024 * 1024
+
+async def _call(func, *args):
+    try:
+        return await run_in_threadpool(func, *args)
+    except UploadError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+
+@router.post("", response_model=UploadStatus, status_code=status.HTTP_201_CREATED)
+async def create_upload_endpoint(
+    upload: UploadCreate,
+    owner: JobOwner = Depends(get_job_owner),
+):
+    """
+    Start a resumable upload of one PDF. Send its bytes with
+    PUT /pdf/uploads/{id}?offset=N (any chunk size, in any order, also
+    in parallel), check progress with GET, then finalize. The finalized
+    upload can be passed as `upload_id` to every PDF operation.
+    """
+    return await _call(create_upload, owner.user_id, upload.filename, upload.size)
+
+@router.put("/{upload_id}", response_model=UploadStatus)
+async def upload_chunk_endpoint(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Position of the chunk in the file"),
+    owner: JobOwner = Depends(get_job_owner),
+):
+    """
+    Write the raw request body at `offset`. The body is streamed to the
+    file as it arrives. A chunk cut off by a dropped connection is not
+    counted; send it again.
+    """
+    writer = await _call(ChunkWriter, upload_id, owner.user_id, offset)
+    try:
+        block = bytearray()
+        async for piece in request.stream():
+            block += piece
+            if len(block) >= _WRITE_BLOCK:
+                await _call(writer.write, bytes(block))
+                block.clear()
+        if block:
+            await _call(writer.write, bytes(block))
+        return await _call(writer.commit)
+    finally:
+        writer.close()
+
+@router.get("/{upload_id}", response_model=UploadStatus)
+async def upload_status_endpoint(upload_id: str, owner: JobOwner = Depends(get_job_owner)):
+    """Bytes received so far and the ranges still missing."""
+    return await _call(upload_status, upload_id, owner.user_id)
+
+@router.post("/{upload_id}/finalize", response_model=UploadStatus)
+async def finalize_upload_endpoint(
+    upload_id: str,
+    body: UploadFinalize = UploadFinalize(),
+    owner: JobOwner = Depends(get_job_owner),
+):
+    """
+    Check that the whole file has arrived, verify the optional SHA-256
+    and run the preflight checks on it.
+    """
+    return await _call(finalize_upload, upload_id, owner.user_id, body.sha256)
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_upload_endpoint(upload_id: str, owner: JobOwner = Depends(get_job_owner)):
+    await _call(delete_upload, upload_id, owner.user_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -107,3 +107,27 @@ def add_text_watermark_bytes(
     )
     # reuse existing PDF-to-PDF stamp logic
     return add_watermark_bytes(pdf_bytes, wm_pdf, over=False)
+
+def add_text_watermark_to_writer(
+    writer: PdfWriter,
+    text: str,
+    color_hex: str = "#888888",
+    font_size: int = 48,
+    opacity: float = 0.3,
+    rotation: float = 45,
+    position: str = "center",
+) -> PdfWriter:
+    """
+    Same as add_text_watermark_bytes, applied in place to a writer.
+    """
+    first = writer.pages[0]
+    w = float(first.mediabox.width)
+    h = float(first.mediabox.height)
+
+    wm_pdf = create_text_watermark_pdf(
+        text, color_hex, font_size, opacity, rotation, position, w, h
+    )
+    stamp_page = PdfReader(BytesIO(wm_pdf)).pages[0]
+    for page in writer.pages:
+        page.merge_page(stamp_page, over=False)
+    return writer
@@ -1,19 +1,447 @@
+import math
+import os
+import threading
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
-from typing import Optional
+from multiprocessing import get_context
+from typing import Dict, Iterator, List, Optional, Tuple
+from PIL import Image
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    ContentStream,
+    DecodedStreamObject,
+    DictionaryObject,
+    EncodedStreamObject,
+    NameObject,
+    NumberObject,
+    PdfObject,
+    StreamObject,
+)
+from app.api.utils.extract_images import _image_key, _iter_image_xobjects, _last_filter
+
+# target resolution and JPEG quality per compression profile
+PROFILES = {
+    "screen": {"dpi": 72, "quality": 60},
+    "ebook": {"dpi": 150, "quality": 75},
+    "print": {"dpi": 300, "quality": 90},
+}
+# images are resampled only when their effective resolution exceeds the
+# target by this factor; smaller gains are not worth the quality loss
+DOWNSAMPLE_THRESHOLD = 1.2
+_MAX_FORM_DEPTH = 12
+
+# image dictionary entries needed to decode the samples in a worker
+_IMAGE_KEYS = (
+    "/Width", "/Height", "/BitsPerComponent", "/ColorSpace",
+    "/Filter", "/DecodeParms", "/Decode", "/ImageMask",
+)
+
+Matrix = Tuple[float, float, float, float, float, float]
+_IDENTITY: Matrix = (1, 0, 0, 1, 0, 0)
+
+# process pool shared by all requests; created on first use
+POOL_WORKERS = os.cpu_count() or 1
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded server process is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_WORKERS,
+                mp_context=get_context("spawn"),
+            )
+        return _pool
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def run_in_process(func, *args, **kwargs):
+    """
+    Run a picklable call in the shared worker processes and wait for its
+    result. A pool whose worker died is replaced and the call retried once.
+    """
+    pool = _get_pool()
+    try:
+        return pool.submit(func, *args, **kwargs).result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        return _get_pool().submit(func, *args, **kwargs).result()
+
+def shutdown_pool() -> None:
+    """Stop the worker processes; called when the application shuts down."""
+    if _pool is not None:
+        _discard_pool(_pool)
+
+def _collect_unique_images(writer: PdfWriter) -> List[List[StreamObject]]:
+    """
+    Group the image XObjects used by the writer's pages. Every object is
+    listed once no matter how many pages reference it, and objects with
+    identical data and pixel-relevant dictionary entries end up in the
+    same group, so each group needs to be
+    re-encoded only once.
+    """
+    seen_refs = set()
+    groups: Dict[tuple, List[StreamObject]] = {}
+    for page in writer.pages:
+        for xobj in _iter_image_xobjects(page.get("/Resources"), set()):
+            ref = xobj.indirect_reference
+            if ref is None or ref.idnum in seen_refs:
+                continue
+            seen_refs.add(ref.idnum)
+            # stencil masks and 1-bit images only grow as JPEG
+            if xobj.get("/ImageMask") or xobj.get("/BitsPerComponent") == 1:
+                continue
+            # the same bytes under a different /Decode, /SMask, … are a
+            # different image and get their own encoding
+            groups.setdefault(_image_key(xobj), []).append(xobj)
+    return list(groups.values())
+
+def _multiply(m: Matrix, n: Matrix) -> Matrix:
+    a, b, c, d, e, f = m
+    A, B, C, D, E, F = n
+    return (
+        a * A + b * C, a * B + b * D,
+        c * A + d * C, c * B + d * D,
+        e * A + f * C + E, e * B + f * D + F,
+    )
+
+def _collect_display_sizes(
+    content: Optional[ContentStream],
+    resources: Optional[DictionaryObject],
+    ctm: Matrix,
+    sizes: Dict[int, Tuple[float, float]],
+    depth: int = 0,
+) -> None:
+    """
+    Replay the q/Q/cm/Do operators of a content stream and record, for
+    every image XObject it paints, the largest size (in points) at which
+    it is drawn. Form XObjects are followed with their /Matrix applied.
+    """
+    if content is None or not resources or depth > _MAX_FORM_DEPTH:
+        return
+    xobjects = resources.get_object().get("/XObject")
+    if not xobjects:
+        return
+    xobjects = xobjects.get_object()
+
+    stack = []
+    for operands, operator in content.operations:
+        if operator == b"q":
+            stack.append(ctm)
+        elif operator == b"Q":
+            if stack:
+                ctm = stack.pop()
+        elif operator == b"cm" and len(operands) == 6:
+            ctm = _multiply(tuple(float(v) for v in operands), ctm)
+        elif operator == b"Do" and operands and operands[0] in xobjects:
+            xobj = xobjects[operands[0]].get_object()
+            subtype = xobj.get("/Subtype")
+            if subtype == "/Image" and xobj.indirect_reference is not None:
+                a, b, c, d, _, _ = ctm
+                w, h = math.hypot(a, b), math.hypot(c, d)
+                idnum = xobj.indirect_reference.idnum
+                prev_w, prev_h = sizes.get(idnum, (0.0, 0.0))
+                sizes[idnum] = (max(w, prev_w), max(h, prev_h))
+            elif subtype == "/Form" and xobj.indirect_reference is not None:
+                matrix = xobj.get("/Matrix")
+                form_ctm = _multiply(
+                    tuple(float(v) for v in matrix) if matrix else _IDENTITY, ctm
+                )
+                _collect_display_sizes(
+                    ContentStream(xobj, xobj.indirect_reference.pdf),
+                    xobj.get("/Resources"),
+                    form_ctm,
+                    sizes,
+                    depth + 1,
+                )
+
+def _image_display_sizes(writer: PdfWriter) -> Dict[int, Tuple[float, float]]:
+    """Largest drawn size in points of every image XObject, by object id."""
+    sizes: Dict[int, Tuple[float, float]] = {}
+    for page in writer.pages:
+        resources = page.get("/Resources")
+        # pages without image or form XObjects need no content parsing
+        if not resources or not resources.get_object().get("/XObject"):
+            continue
+        _collect_display_sizes(page.get_contents(), resources, _IDENTITY, sizes)
+    return sizes
+
+def _target_size(
+    xobj: StreamObject,
+    displayed: Optional[Tuple[float, float]],
+    dpi: int,
+) -> Optional[Tuple[int, int]]:
+    """
+    Pixel size the image should be resampled to for `dpi`, or None when
+    its effective resolution is already at or near the target.
+    """
+    if not displayed or not displayed[0] or not displayed[1]:
+        return None
+    width, height = int(xobj["/Width"]), int(xobj["/Height"])
+    # effective DPI = pixels per inch of the largest placement
+    effective = min(width * 72 / displayed[0], height * 72 / displayed[1])
+    if effective <= dpi * DOWNSAMPLE_THRESHOLD:
+        return None
+    scale = dpi / effective
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def _has_simple_colorspace(xobj: StreamObject) -> bool:
+    cs = xobj.get("/ColorSpace")
+    if cs in ("/DeviceRGB", "/DeviceGray"):
+        return True
+    cs = cs.get_object() if cs is not None else None
+    if isinstance(cs, ArrayObject) and len(cs) == 2 and cs[0] == "/ICCBased":
+        return cs[1].get_object().get("/N") in (1, 3)
+    return False
+
+def _portable(obj: PdfObject) -> PdfObject:
+    """
+    Deep copy of a PDF object with every indirect reference resolved, so
+    it can be pickled and used without the source document. Streams
+    (e.g. ICC profiles, Indexed lookup tables) are stored decoded.
+    """
+    obj = obj.get_object()
+    if isinstance(obj, StreamObject):
+        copy = DecodedStreamObject()
+        # ICC profiles can be larger than the image; decoding only uses
+        # their channel count /N
+        if "/N" not in obj:
+            copy.set_data(obj.get_data())
+        copy.update({k: _portable(v) for k, v in obj.items()
+                     if k not in ("/Filter", "/DecodeParms", "/Length")})
+        return copy
+    if isinstance(obj, DictionaryObject):
+        return DictionaryObject({k: _portable(v) for k, v in obj.items()})
+    if isinstance(obj, ArrayObject):
+        return ArrayObject(_portable(v) for v in obj)
+    return obj
+
+def _image_job(xobj: StreamObject) -> tuple:
+    """
+    Portable (picklable) description of an image for a worker process.
+    The still-encoded stream is sent in both cases, so decoding happens
+    in the worker and only compressed data crosses the process boundary:
+    plain RGB/gray JPEGs as the bare JPEG file, anything else (Flate,
+    CCITT, CMYK, Indexed, …) with the image dictionary needed to decode it.
+    """
+    if (
+        _last_filter(xobj) == "/DCTDecode"
+        and "/Decode" not in xobj
+        and _has_simple_colorspace(xobj)
+    ):
+        return ("encoded", xobj.get_data())
+    # soft masks are kept as they are and not needed for the samples
+    header = DictionaryObject({
+        k: _portable(v) for k, v in xobj.items()
+        if k in _IMAGE_KEYS
+    })
+    return ("pdf", header, xobj._data)
+
+def _decode_job_image(header: DictionaryObject, data: bytes) -> Image.Image:
+    # unfiltered samples are already decoded
+    xobj = EncodedStreamObject() if "/Filter" in header else DecodedStreamObject()
+    xobj.update(header)
+    xobj[NameObject("/Subtype")] = NameObject("/Image")
+    xobj._data = data
+    return xobj.decode_as_image()
+
+def _encode_image(
+    job: tuple,
+    quality: int,
+    size: Optional[Tuple[int, int]] = None,
+    try_flate: bool = False,
+) -> Tuple[str, bytes, str, Tuple[int, int]]:
+    """
+    Worker: decode the job's image, optionally resample it to `size`, and
+    encode it as JPEG (and as Flate when `try_flate`), returning the
+    smaller encoding as (filter, data, mode, size).
+    """
+    if job[0] == "encoded":
+        img = Image.open(BytesIO(job[1]))
+        if size:
+            # let the JPEG decoder downscale by 1/2, 1/4 or 1/8 for free
+            img.draft(img.mode, size)
+    else:
+        img = _decode_job_image(job[1], job[2])
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+    if size and img.size != size:
+        img = img.resize(size, Image.Resampling.LANCZOS)
+
+    buf = BytesIO()
+    img.save(buf, "JPEG", quality=quality, optimize=True)
+    best = ("/DCTDecode", buf.getvalue())
+    if try_flate:
+        flate = zlib.compress(img.tobytes(), 6)
+        if len(flate) < len(best[1]):
+            best = ("/FlateDecode", flate)
+    return best[0], best[1], img.mode, img.size
+
+def _apply_encoded(
+    xobj: StreamObject,
+    filter_name: str,
+    data: bytes,
+    mode: str,
+    size: Tuple[int, int],
+) -> None:
+    """Rewrite an image XObject in place to hold the re-encoded samples."""
+    xobj._data = data
+    if isinstance(xobj, EncodedStreamObject):
+        xobj.decoded_self = None
+    xobj[NameObject("/Filter")] = NameObject(filter_name)
+    xobj[NameObject("/ColorSpace")] = NameObject(
+        "/DeviceGray" if mode == "L" else "/DeviceRGB"
+    )
+    xobj[NameObject("/BitsPerComponent")] = NumberObject(8)
+    xobj[NameObject("/Width")] = NumberObject(size[0])
+    xobj[NameObject("/Height")] = NumberObject(size[1])
+    for key in ("/DecodeParms", "/Decode"):
+        xobj.pop(key, None)
+    # colour-key masks refer to the original sample values; soft masks
+    # may have their own resolution and are kept
+    if isinstance(xobj.get("/Mask"), ArrayObject):
+        del xobj["/Mask"]
+
+def _run_jobs(
+    jobs: List[Tuple[List[StreamObject], dict]],
+    quality: int,
+    parallel: bool,
+) -> Iterator[Tuple[List[StreamObject], Tuple[str, bytes, str, Tuple[int, int]]]]:
+    """
+    Encode every image group, yielding results as they complete. At most
+    two jobs per worker are in flight, so decoded images of a large
+    document are never all held in memory at once.
+    """
+    if not parallel or len(jobs) < 2:
+        for group, options in jobs:
+            yield group, _encode_image(_image_job(group[0]), quality, **options)
+        return
+
+    pool = _get_pool()
+    limit = 2 * POOL_WORKERS
+    pending = {}
+    todo = iter(jobs)
+    try:
+        while True:
+            for group, options in todo:
+                future = pool.submit(_encode_image, _image_job(group[0]), quality, **options)
+                pending[future] = (group, options)
+                if len(pending) >= limit:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                yield pending.pop(future)[0], result
+    except BrokenProcessPool:
+        # a worker died (e.g. killed for memory); drop the pool so the next
+        # request gets a fresh one and finish this document serially
+        _discard_pool(pool)
+        for group, options in [*pending.values(), *todo]:
+            yield group, _encode_image(_image_job(group[0]), quality, **options)
+
+def recompress_images(
+    writer: PdfWriter,
+    quality: int,
+    parallel: bool = True,
+    target_dpi: Optional[int] = None,
+) -> int:
+    """
+    Re-encode the writer's unique images at JPEG `quality`. With
+    `target_dpi`, images drawn at a higher effective resolution are first
+    resampled down to it, and Flate is tried next to JPEG. Encodings that
+    are not smaller than the current stream are discarded.
+    Returns the number of rewritten image objects.
+    """
+    groups = _collect_unique_images(writer)
+    if target_dpi is None:
+        jobs = [(group, {}) for group in groups]
+    else:
+        sizes = _image_display_sizes(writer)
+        jobs = []
+        for group in groups:
+            # identical images may be separate objects drawn at different
+            # sizes; the largest placement decides the resolution
+            placed = [sizes[x.indirect_reference.idnum] for x in group
+                      if x.indirect_reference.idnum in sizes]
+            displayed = (
+                (max(w for w, _ in placed), max(h for _, h in placed))
+                if placed else None
+            )
+            jobs.append((group, {
+                "size": _target_size(group[0], displayed, target_dpi),
+                "try_flate": True,
+            }))
+
+    replaced = 0
+    for group, (filter_name, data, mode, size) in _run_jobs(jobs, quality, parallel):
+        if len(data) >= len(group[0]._data):
+            continue
+        for xobj in group:
+            _apply_encoded(xobj, filter_name, data, mode, size)
+            replaced += 1
+    return replaced
+
+def compress_writer(
+    writer: PdfWriter,
+    remove_duplicates: bool = True,
+    remove_images: bool = False,
+    reduce_image_quality: Optional[int] = None,
+    parallel: bool = True,
+    profile: Optional[str] = None,
+) -> PdfWriter:
+    """
+    Apply the compress_pdf_bytes steps to a writer in place.
+    """
+    if profile is not None and profile not in PROFILES:
+        raise ValueError(f"Unknown compression profile: {profile}")
+
+    # re-encode (and with a profile, downsample) images, if requested
+    if not remove_images:
+        if profile is not None:
+            target = PROFILES[profile]
+            quality = target["quality"] if reduce_image_quality is None else reduce_image_quality
+            recompress_images(writer, quality, parallel=parallel, target_dpi=target["dpi"])
+        elif reduce_image_quality is not None:
+            recompress_images(writer, reduce_image_quality, parallel=parallel)
+
+    # strip images if requested
+    if remove_images:
+        writer.remove_images()
+
+    # merge identical objects & drop orphans
+    if remove_duplicates:
+        writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    return writer
 
 def compress_pdf_bytes(
     pdf_bytes: bytes,
     remove_duplicates: bool = True,
     remove_images: bool = False,
     reduce_image_quality: Optional[int] = None,
+    parallel: bool = True,
+    profile: Optional[str] = None,
 ) -> BytesIO:
     """
     Take raw PDF bytes and return a BytesIO of the compressed PDF.
-    
+
     - remove_duplicates: merge identical objects & drop unused ones
     - remove_images: strip out all images
-    - reduce_image_quality: re-encode images at given JPEG quality
+    - reduce_image_quality: re-encode images at given JPEG quality; each
+      distinct image is encoded once, in a process pool when `parallel`
+    - profile: "screen", "ebook" or "print"; downsample images shown above
+      the profile's DPI and keep the smallest of JPEG, Flate or original
 
     Based on the techniques in:
     https://pypdf.readthedocs.io/en/latest/user/file-size.html
@@ -25,19 +453,14 @@ def compress_pdf_bytes(
     for page in reader.pages:
         writer.add_page(page)
 
-    # re-encode images at given JPEG quality, if requested
-    if reduce_image_quality is not None:
-        for page in writer.pages:
-            for img in page.images:
-                img.replace(img.image, quality=reduce_image_quality)
-
-    # strip images if requested
-    if remove_images:
-        writer.remove_images()
-
-    # merge identical objects & drop orphans
-    if remove_duplicates:
-        writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    compress_writer(
+        writer,
+        remove_duplicates=remove_duplicates,
+        remove_images=remove_images,
+        reduce_image_quality=reduce_image_quality,
+        parallel=parallel,
+        profile=profile,
+    )
 
     out = BytesIO()
     writer.write(out)
@@ -0,0 +1,70 @@
+from typing import Optional
+import fitz  # PyMuPDF
+
+from app.api.utils.page_selection import parse_page_selection
+
+# fixed overhead of any request (parsed objects, buffers, response)
+BASE_COST = 16 * 1024 * 1024
+
+# peak working memory per input byte: the upload itself, the parsed
+# document and the serialized output are all alive at the same time
+_INPUT_FACTORS = {
+    "merge": 3,
+    "extract_text": 3,
+    "extract_images": 4,
+    "remove_pages": 3,
+    "split_range": 4,
+    "split_interval": 4,
+    "extract_pages": 4,
+    "compress": 5,
+    "add_text_watermark": 3,
+    "n_up": 4,
+    "pipeline": 5,
+    "to_png": 2,
+    "to_jpg": 2,
+    "thumbnail": 2,
+}
+_DEFAULT_FACTOR = 4
+
+# encoded page size relative to the raw pixmap; the encoded pages of a
+# conversion are held in the in-memory ZIP until the response is sent
+_ENCODED_RATIO = {"png": 0.5, "jpeg": 0.1, "webp": 0.1}
+
+def estimate_cost(operation: str, input_bytes: int) -> int:
+    """Predicted peak memory in bytes of a non-rendering operation."""
+    factor = _INPUT_FACTORS.get(operation, _DEFAULT_FACTOR)
+    return BASE_COST + factor * input_bytes
+
+def estimate_raster_cost(
+    pdf_bytes: bytes,
+    dpi: float = 300,
+    page_range: Optional[str] = None,
+    fmt: str = "png",
+    grayscale: bool = False,
+    alpha: bool = False,
+    max_pixels: Optional[int] = None,
+    operation: str = "to_png",
+) -> int:
+    """
+    Predicted peak memory in bytes of rendering the selected pages.
+
+    Pages are rendered one at a time, so the largest pixmap (plus the
+    encoder's copy of it) counts once, while the encoded output of every
+    page accumulates. Page sizes are read from the page boxes without
+    rendering anything.
+    """
+    channels = (1 if grayscale else 3) + (1 if alpha and fmt != "jpeg" else 0)
+    zoom = dpi / 72
+    largest = 0
+    total = 0
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for idx in parse_page_selection(page_range, len(doc)):
+            rect = doc[idx].rect
+            pixels = rect.width * rect.height * zoom * zoom
+            if max_pixels:
+                pixels = min(pixels, max_pixels)
+            size = int(pixels * channels)
+            largest = max(largest, size)
+            total += size
+    encoded = int(total * _ENCODED_RATIO.get(fmt, 0.5))
+    return estimate_cost(operation, len(pdf_bytes)) + 2 * largest + encoded
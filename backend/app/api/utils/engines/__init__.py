@@ -0,0 +1,13 @@
+from app.api.utils.engines.base import OPERATIONS, PdfEngine
+from app.api.utils.engines.pymupdf_engine import PymupdfEngine
+from app.api.utils.engines.pypdf_engine import PypdfEngine
+from app.api.utils.engines.selection import ENGINE_NAMES, get_engine
+
+__all__ = [
+    "ENGINE_NAMES",
+    "OPERATIONS",
+    "PdfEngine",
+    "PymupdfEngine",
+    "PypdfEngine",
+    "get_engine",
+]
@@ -0,0 +1,108 @@
+from abc import ABC, abstractmethod
+from io import BytesIO
+from typing import BinaryIO, List, Optional, Tuple
+
+# operation names used for engine selection and benchmark results
+OPERATIONS = (
+    "merge",
+    "extract_text",
+    "extract_images",
+    "remove_pages",
+    "split_range",
+    "split_interval",
+    "extract_pages",
+    "compress",
+    "add_text_watermark",
+    "n_up",
+    "to_png",
+    "to_jpg",
+)
+
+class PdfEngine(ABC):
+    """
+    Common interface of the PDF backends. Every engine implements every
+    operation with the same parameters and equivalent output (same pages,
+    same page order, same archive layout, same ValueError for invalid
+    input), so callers can switch freely.
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    def merge(self, pdfs: List[bytes]) -> BytesIO:
+        ...
+
+    @abstractmethod
+    def extract_text(
+        self,
+        pdf_bytes: bytes,
+        page_range: Optional[str] = None,
+        preserve_layout: bool = False,
+    ) -> Tuple[int, List[Tuple[int, str]]]:
+        ...
+
+    @abstractmethod
+    def extract_images(
+        self,
+        pdf_bytes: bytes,
+        page_range: Optional[str] = None,
+        image_format: str = "all",
+        min_width: int = 0,
+        min_height: int = 0,
+        passthrough: bool = True,
+        deduplicate: bool = True,
+        out: Optional[BinaryIO] = None,
+    ) -> Tuple[BinaryIO, int]:
+        ...
+
+    @abstractmethod
+    def remove_pages(self, pdf_bytes: bytes, page_range: Optional[str] = None) -> BytesIO:
+        ...
+
+    @abstractmethod
+    def split_range(self, pdf_bytes: bytes, range_str: str) -> List[BytesIO]:
+        ...
+
+    @abstractmethod
+    def split_interval(self, pdf_bytes: bytes, interval: int) -> List[BytesIO]:
+        ...
+
+    @abstractmethod
+    def extract_pages(self, pdf_bytes: bytes, option: str) -> List[BytesIO]:
+        ...
+
+    @abstractmethod
+    def compress(
+        self,
+        pdf_bytes: bytes,
+        remove_duplicates: bool = True,
+        remove_images: bool = False,
+        reduce_image_quality: Optional[int] = None,
+        profile: Optional[str] = None,
+    ) -> BytesIO:
+        ...
+
+    @abstractmethod
+    def add_text_watermark(
+        self,
+        pdf_bytes: bytes,
+        text: str,
+        color_hex: str = "#888888",
+        font_size: int = 48,
+        opacity: float = 0.3,
+        rotation: float = 45,
+        position: str = "center",
+    ) -> BytesIO:
+        ...
+
+    @abstractmethod
+    def n_up(self, pdf_bytes: bytes, cols: int = 4, rows: int = 4) -> BytesIO:
+        ...
+
+    @abstractmethod
+    def to_png(self, pdf_bytes: bytes, dpi: int = 300, **options) -> BytesIO:
+        ...
+
+    @abstractmethod
+    def to_jpg(self, pdf_bytes: bytes, dpi: int = 300, **options) -> BytesIO:
+        ...
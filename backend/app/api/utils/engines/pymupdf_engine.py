@@ -0,0 +1,289 @@
+from io import BytesIO
+from typing import BinaryIO, List, Optional, Tuple
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+import hashlib
+import re
+import fitz  # PyMuPDF
+from PIL import Image
+
+from app.api.utils.add_watermark import create_text_watermark_pdf
+from app.api.utils.compress import DOWNSAMPLE_THRESHOLD, PROFILES
+from app.api.utils.convert_to_jpg import pdf_to_jpg_zip_bytes
+from app.api.utils.convert_to_png import pdf_to_png_zip_bytes
+from app.api.utils.engines.base import PdfEngine
+from app.api.utils.extract_images import (
+    _FORMAT_ALIASES,
+    _IMAGE_KEYS,
+    _INLINE_IMAGE,
+    _MAX_KEY_DEPTH,
+    _PIL_FORMATS,
+)
+from app.api.utils.page_selection import parse_page_selection
+
+# /Filter name → extension, as in extract_images
+_FILTER_EXTENSIONS = {"DCTDecode": "jpg", "JPXDecode": "jp2", "CCITTFaxDecode": "tiff"}
+_REFERENCE = re.compile(r"(\d+) 0 R")
+_STREAM_ENTRIES = re.compile(r"/(?:Length|Filter|DecodeParms)\b(?:\s*/?\w+)?")
+
+def _open(pdf_bytes: bytes) -> fitz.Document:
+    return fitz.open(stream=pdf_bytes, filetype="pdf")
+
+def _to_io(doc: fitz.Document, **options) -> BytesIO:
+    # garbage=1 drops objects orphaned by page selection, like pypdf which
+    # only writes what the kept pages reference
+    options.setdefault("garbage", 1)
+    out = BytesIO(doc.tobytes(**options))
+    doc.close()
+    return out
+
+def _canonical(doc: fitz.Document, text: str, depth: int = 0) -> str:
+    """Object source with every "n 0 R" replaced by the object it names (see extract_images._canonical)."""
+    if depth > _MAX_KEY_DEPTH:
+        return text
+
+    def resolve(match: "re.Match") -> str:
+        xref = int(match.group(1))
+        body = doc.xref_object(xref, compressed=True)
+        if doc.xref_is_stream(xref):
+            body = _STREAM_ENTRIES.sub("", body) + hashlib.sha1(doc.xref_stream(xref)).hexdigest()
+        return "{" + _canonical(doc, body, depth + 1) + "}"
+
+    return _REFERENCE.sub(resolve, text)
+
+def _image_key(doc: fitz.Document, xref: int) -> tuple:
+    # as extract_images._image_key: stream data and pixel-relevant entries
+    digest = hashlib.sha1(doc.xref_stream(xref)).digest()
+    return (digest,) + tuple(
+        _canonical(doc, doc.xref_get_key(xref, key[1:])[1]) for key in _IMAGE_KEYS
+    )
+
+def _inline_images(page: fitz.Page) -> List[Tuple[str, bytes, int, int]]:
+    """Inline images of a page as (extension, file bytes, width, height)."""
+    if not _INLINE_IMAGE.search(page.read_contents()):
+        return []
+    inline = {info["number"] for info in page.get_image_info(xrefs=True) if info["xref"] == 0}
+    blocks = page.get_text("dict", flags=fitz.TEXT_PRESERVE_IMAGES)["blocks"]
+    return [
+        (_FORMAT_ALIASES.get(b["ext"], b["ext"]), b["image"], b["width"], b["height"])
+        for b in blocks
+        if b["type"] == 1 and b["number"] in inline
+    ]
+
+def _copy_pages(doc: fitz.Document, pages: range) -> BytesIO:
+    part = fitz.open()
+    if abs(pages.step) == 1:
+        # insert_pdf copies a contiguous run in either direction
+        part.insert_pdf(doc, from_page=pages[0], to_page=pages[-1])
+    else:
+        for idx in pages:
+            part.insert_pdf(doc, from_page=idx, to_page=idx)
+    return _to_io(part)
+
+class PymupdfEngine(PdfEngine):
+    """MuPDF-backed implementation; most operations run in C."""
+
+    name = "pymupdf"
+
+    def merge(self, pdfs: List[bytes]) -> BytesIO:
+        out = fitz.open()
+        for content in pdfs:
+            with _open(content) as src:
+                out.insert_pdf(src)
+        return _to_io(out)
+
+    def extract_text(
+        self,
+        pdf_bytes: bytes,
+        page_range: Optional[str] = None,
+        preserve_layout: bool = False,
+    ) -> Tuple[int, List[Tuple[int, str]]]:
+        with _open(pdf_bytes) as doc:
+            pages = parse_page_selection(page_range, len(doc))
+            # MuPDF has no layout mode; sorting blocks by position is the
+            # closest equivalent
+            return len(doc), [
+                (idx, doc[idx].get_text("text", sort=preserve_layout))
+                for idx in pages
+            ]
+
+    def extract_images(
+        self,
+        pdf_bytes: bytes,
+        page_range: Optional[str] = None,
+        image_format: str = "all",
+        min_width: int = 0,
+        min_height: int = 0,
+        passthrough: bool = True,
+        deduplicate: bool = True,
+        out: Optional[BinaryIO] = None,
+    ) -> Tuple[BinaryIO, int]:
+        wanted = _FORMAT_ALIASES.get(image_format.lower(), image_format.lower())
+        output = out if out is not None else BytesIO()
+        seen_xrefs = set()
+        seen_hashes = set()
+        count = 0
+        with _open(pdf_bytes) as doc, ZipFile(output, "w") as zipf:
+            for page_index in parse_page_selection(page_range, len(doc)):
+                images = doc[page_index].get_images(full=True)
+                img_index = -1
+                for img_index, (xref, _, width, height, _, _, _, _, filt, *_) in enumerate(images):
+                    if width < min_width or height < min_height:
+                        continue
+                    ext = _FILTER_EXTENSIONS.get(filt, "png")
+                    if wanted != "all" and ext != wanted:
+                        continue
+
+                    if deduplicate:
+                        if xref in seen_xrefs:
+                            continue
+                        seen_xrefs.add(xref)
+                        key = _image_key(doc, xref)
+                        if key in seen_hashes:
+                            continue
+                        seen_hashes.add(key)
+
+                    try:
+                        if passthrough and ext in ("jpg", "jp2"):
+                            data = doc.extract_image(xref)["image"]
+                        else:
+                            pix = fitz.Pixmap(doc, xref)
+                            mode = {1: "L", 3: "RGB", 4: "CMYK"}.get(pix.n - pix.alpha, "RGB")
+                            if pix.alpha or mode not in ("L", "RGB", "CMYK"):
+                                pix = fitz.Pixmap(fitz.csRGB, pix, 0)
+                                mode = "RGB"
+                            img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+                            buf = BytesIO()
+                            img.save(buf, format=_PIL_FORMATS[ext])
+                            data = buf.getvalue()
+                    except Exception:
+                        continue
+
+                    filename = f"page{page_index+1}_img{img_index+1}.{ext}"
+                    method = ZIP_DEFLATED if ext == "tiff" else ZIP_STORED
+                    zipf.writestr(filename, data, compress_type=method)
+                    count += 1
+
+                inline = _inline_images(doc[page_index])
+                for img_index, (ext, data, width, height) in enumerate(inline, start=img_index + 2):
+                    if width < min_width or height < min_height:
+                        continue
+                    if wanted != "all" and ext != wanted:
+                        continue
+                    if deduplicate:
+                        key = (hashlib.sha1(data).digest(), ext)
+                        if key in seen_hashes:
+                            continue
+                        seen_hashes.add(key)
+                    method = ZIP_DEFLATED if ext == "tiff" else ZIP_STORED
+                    zipf.writestr(f"page{page_index+1}_img{img_index}.{ext}", data, compress_type=method)
+                    count += 1
+        if output.seekable():
+            output.seek(0)
+        return output, count
+
+    def remove_pages(self, pdf_bytes: bytes, page_range: Optional[str] = None) -> BytesIO:
+        doc = _open(pdf_bytes)
+        remove = parse_page_selection(page_range, len(doc))
+        keep = [i for i in range(len(doc)) if i not in remove]
+        if not keep:
+            doc.close()
+            raise ValueError("Cannot remove every page of the document")
+        doc.select(keep)
+        return _to_io(doc)
+
+    def split_range(self, pdf_bytes: bytes, range_str: str) -> List[BytesIO]:
+        with _open(pdf_bytes) as doc:
+            return [
+                _copy_pages(doc, pages)
+                for pages in parse_page_selection(range_str, len(doc)).parts()
+            ]
+
+    def split_interval(self, pdf_bytes: bytes, interval: int) -> List[BytesIO]:
+        with _open(pdf_bytes) as doc:
+            total = len(doc)
+            return [
+                _copy_pages(doc, range(start, min(start + interval, total)))
+                for start in range(0, total, interval)
+            ]
+
+    def extract_pages(self, pdf_bytes: bytes, option: str) -> List[BytesIO]:
+        with _open(pdf_bytes) as doc:
+            return [
+                _copy_pages(doc, range(idx, idx + 1))
+                for idx in parse_page_selection(option, len(doc))
+            ]
+
+    def compress(
+        self,
+        pdf_bytes: bytes,
+        remove_duplicates: bool = True,
+        remove_images: bool = False,
+        reduce_image_quality: Optional[int] = None,
+        profile: Optional[str] = None,
+    ) -> BytesIO:
+        if profile is not None and profile not in PROFILES:
+            raise ValueError(f"Unknown compression profile: {profile}")
+
+        doc = _open(pdf_bytes)
+        if remove_images:
+            # redact the whole page, removing images but keeping text and
+            # vector graphics
+            for page in doc:
+                page.add_redact_annot(page.rect)
+                page.apply_redactions(
+                    images=fitz.PDF_REDACT_IMAGE_REMOVE,
+                    graphics=fitz.PDF_REDACT_LINE_ART_NONE,
+                    text=fitz.PDF_REDACT_TEXT_NONE,
+                )
+        elif profile is not None:
+            target = PROFILES[profile]
+            quality = target["quality"] if reduce_image_quality is None else reduce_image_quality
+            doc.rewrite_images(
+                dpi_threshold=int(target["dpi"] * DOWNSAMPLE_THRESHOLD),
+                dpi_target=target["dpi"],
+                quality=quality,
+            )
+        elif reduce_image_quality is not None:
+            doc.rewrite_images(quality=reduce_image_quality)
+
+        return _to_io(doc, garbage=4 if remove_duplicates else 1, deflate=True)
+
+    def add_text_watermark(
+        self,
+        pdf_bytes: bytes,
+        text: str,
+        color_hex: str = "#888888",
+        font_size: int = 48,
+        opacity: float = 0.3,
+        rotation: float = 45,
+        position: str = "center",
+    ) -> BytesIO:
+        doc = _open(pdf_bytes)
+        # same reportlab stamp as the pypdf engine, sized by the first page
+        w, h = doc[0].rect.width, doc[0].rect.height
+        wm_pdf = create_text_watermark_pdf(
+            text, color_hex, font_size, opacity, rotation, position, w, h
+        )
+        with _open(wm_pdf) as stamp:
+            for page in doc:
+                # anchor the stamp to the bottom-left corner, unscaled,
+                # as pypdf's merge_page does
+                top = page.rect.height - h
+                page.show_pdf_page(fitz.Rect(0, top, w, top + h), stamp, 0, overlay=False)
+        return _to_io(doc)
+
+    def n_up(self, pdf_bytes: bytes, cols: int = 4, rows: int = 4) -> BytesIO:
+        out = fitz.open()
+        with _open(pdf_bytes) as src:
+            w, h = src[0].rect.width, src[0].rect.height
+            dest = out.new_page(width=w * cols, height=h * rows)
+            for x in range(cols):
+                for y in range(rows):
+                    dest.show_pdf_page(fitz.Rect(x * w, y * h, (x + 1) * w, (y + 1) * h), src, 0)
+        return _to_io(out)
+
+    def to_png(self, pdf_bytes: bytes, dpi: int = 300, **options) -> BytesIO:
+        return pdf_to_png_zip_bytes(pdf_bytes, dpi=dpi, **options)
+
+    def to_jpg(self, pdf_bytes: bytes, dpi: int = 300, **options) -> BytesIO:
+        return pdf_to_jpg_zip_bytes(pdf_bytes, dpi=dpi, **options)
@@ -0,0 +1,67 @@
+from io import BytesIO
+from typing import BinaryIO, List, Optional, Tuple
+
+from app.api.utils.add_watermark import add_text_watermark_bytes
+from app.api.utils.compress import compress_pdf_bytes
+from app.api.utils.convert_to_jpg import pdf_to_jpg_zip_bytes
+from app.api.utils.convert_to_png import pdf_to_png_zip_bytes
+from app.api.utils.engines.base import PdfEngine
+from app.api.utils.extract_images import extract_images_from_pdf_bytes
+from app.api.utils.extract_text import extract_page_texts
+from app.api.utils.merge_pdf import merge_pdfs_bytes
+from app.api.utils.multiple_pages_on_one import n_up_pdf_bytes
+from app.api.utils.remove_pages import remove_pages_bytes
+from app.api.utils.split_pdf import (
+    extract_pages_bytes,
+    split_by_interval_bytes,
+    split_by_range_bytes,
+)
+
+class PypdfEngine(PdfEngine):
+    """
+    The original pure-Python implementation. pypdf cannot render pages,
+    so rasterization uses the same PyMuPDF code as the PyMuPDF engine.
+    """
+
+    name = "pypdf"
+
+    def merge(self, pdfs: List[bytes]) -> BytesIO:
+        return merge_pdfs_bytes(pdfs)
+
+    def extract_text(
+        self,
+        pdf_bytes: bytes,
+        page_range: Optional[str] = None,
+        preserve_layout: bool = False,
+    ) -> Tuple[int, List[Tuple[int, str]]]:
+        return extract_page_texts(pdf_bytes, page_range, preserve_layout)
+
+    def extract_images(self, pdf_bytes: bytes, *args, **kwargs) -> Tuple[BinaryIO, int]:
+        return extract_images_from_pdf_bytes(pdf_bytes, *args, **kwargs)
+
+    def remove_pages(self, pdf_bytes: bytes, page_range: Optional[str] = None) -> BytesIO:
+        return remove_pages_bytes(pdf_bytes, page_range)
+
+    def split_range(self, pdf_bytes: bytes, range_str: str) -> List[BytesIO]:
+        return split_by_range_bytes(pdf_bytes, range_str)
+
+    def split_interval(self, pdf_bytes: bytes, interval: int) -> List[BytesIO]:
+        return split_by_interval_bytes(pdf_bytes, interval)
+
+    def extract_pages(self, pdf_bytes: bytes, option: str) -> List[BytesIO]:
+        return extract_pages_bytes(pdf_bytes, option)
+
+    def compress(self, pdf_bytes: bytes, *args, **kwargs) -> BytesIO:
+        return compress_pdf_bytes(pdf_bytes, *args, **kwargs)
+
+    def add_text_watermark(self, pdf_bytes: bytes, *args, **kwargs) -> BytesIO:
+        return add_text_watermark_bytes(pdf_bytes, *args, **kwargs)
+
+    def n_up(self, pdf_bytes: bytes, cols: int = 4, rows: int = 4) -> BytesIO:
+        return n_up_pdf_bytes(pdf_bytes, cols=cols, rows=rows)
+
+    def to_png(self, pdf_bytes: bytes, dpi: int = 300, **options) -> BytesIO:
+        return pdf_to_png_zip_bytes(pdf_bytes, dpi=dpi, **options)
+
+    def to_jpg(self, pdf_bytes: bytes, dpi: int = 300, **options) -> BytesIO:
+        return pdf_to_jpg_zip_bytes(pdf_bytes, dpi=dpi, **options)
@@ -0,0 +1,90 @@
+import json
+import logging
+import math
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.api.utils.engines.base import PdfEngine
+from app.api.utils.engines.pymupdf_engine import PymupdfEngine
+from app.api.utils.engines.pypdf_engine import PypdfEngine
+
+log = logging.getLogger(__name__)
+
+ENGINES: Dict[str, PdfEngine] = {
+    "pypdf": PypdfEngine(),
+    "pymupdf": PymupdfEngine(),
+}
+ENGINE_NAMES = (*ENGINES, "auto")
+DEFAULT_ENGINE = "pypdf"
+
+# (operation, engine) → [(input_bytes, seconds), …]
+Timings = Dict[Tuple[str, str], List[Tuple[int, float]]]
+
+
+@lru_cache(maxsize=4)
+def _load_timings(path: str, mtime: float) -> Timings:
+    """
+    Read a benchmark results file (see benchmarks/run.py). The mtime is
+    part of the cache key, so a rewritten file is picked up without a
+    restart.
+    """
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    timings: Timings = {}
+    for row in data.get("results", []):
+        if row.get("engine") not in ENGINES or not row.get("operation"):
+            continue
+        key = (row["operation"], row["engine"])
+        timings.setdefault(key, []).append((int(row["input_bytes"]), float(row["seconds"])))
+    return timings
+
+
+def _benchmark_timings() -> Timings:
+    path = settings.PDF_ENGINE_BENCHMARKS
+    if not path:
+        return {}
+    try:
+        return _load_timings(path, os.path.getmtime(path))
+    except (OSError, ValueError, KeyError) as exc:
+        log.warning("Cannot read engine benchmarks %s: %s", path, exc)
+        return {}
+
+
+def _predict(samples: List[Tuple[int, float]], size: int) -> float:
+    """Time of the benchmark sample closest to `size` on a log scale."""
+    target = math.log1p(size)
+    _, seconds = min(samples, key=lambda s: abs(math.log1p(s[0]) - target))
+    return seconds
+
+
+def _auto_engine(operation: Optional[str], size: int) -> PdfEngine:
+    timings = _benchmark_timings()
+    candidates = [
+        (_predict(timings[(operation, name)], size), name)
+        for name in ENGINES
+        if (operation, name) in timings
+    ]
+    if not candidates:
+        return ENGINES[DEFAULT_ENGINE]
+    return ENGINES[min(candidates)[1]]
+
+
+def get_engine(
+    name: Optional[str] = None,
+    operation: Optional[str] = None,
+    size: int = 0,
+) -> PdfEngine:
+    """
+    Resolve an engine by name; None means the deployment default
+    (settings.PDF_ENGINE). "auto" picks, per operation, the engine that
+    was fastest in the recorded benchmarks for inputs of similar size,
+    falling back to pypdf when there are no results.
+    """
+    name = (name or settings.PDF_ENGINE).lower()
+    if name == "auto":
+        return _auto_engine(operation, size)
+    if name not in ENGINES:
+        raise ValueError(f"Unknown PDF engine: {name}")
+    return ENGINES[name]
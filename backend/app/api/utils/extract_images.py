@@ -1,32 +1,125 @@
+import hashlib
+import re
 from io import BytesIO
-from typing import List, Optional, Tuple
-from zipfile import ZipFile
-from pypdf import PdfReader
-from PIL import Image
-
-def _parse_page_ranges(range_str: Optional[str], total: int) -> List[int]:
-    """Parse a page-range string like "1-3,5" into zero-based page indices."""
-    if not range_str:
-        return list(range(total))
-    pages = set()
-    for part in range_str.split(","):
-        part = part.strip()
-        if "-" in part:
-            start, end = part.split("-", 1)
-            try:
-                start_i = max(int(start) - 1, 0)
-                end_i = min(int(end), total)
-                pages.update(range(start_i, end_i))
-            except ValueError:
-                continue
-        else:
-            try:
-                idx = int(part) - 1
-                if 0 <= idx < total:
-                    pages.add(idx)
-            except ValueError:
-                continue
-    return sorted(pages)
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+from pypdf import PageObject, PdfReader
+from pypdf.generic import DictionaryObject, StreamObject
+
+from app.api.utils.page_selection import parse_page_selection
+
+# last filter in the chain → extension of the emitted file; DCT and JPX
+# streams are complete JPEG / JPEG 2000 files and can be copied verbatim
+_PASSTHROUGH_FILTERS = {"/DCTDecode": "jpg", "/JPXDecode": "jp2"}
+_DECODED_FILTERS = {"/CCITTFaxDecode": "tiff"}
+_PIL_FORMATS = {"jpg": "JPEG", "jp2": "JPEG2000", "png": "PNG", "tiff": "TIFF"}
+_FORMAT_ALIASES = {"jpeg": "jpg", "jpx": "jp2", "tif": "tiff"}
+# entries that change how the same stream data is turned into pixels
+_IMAGE_KEYS = (
+    "/Width", "/Height", "/ColorSpace", "/BitsPerComponent", "/Decode",
+    "/DecodeParms", "/Filter", "/ImageMask", "/Mask", "/SMask",
+)
+_INLINE_IMAGE = re.compile(rb"(?:^|\s)BI\s")
+# nesting followed when comparing entries such as [/ICCBased 7 0 R]
+_MAX_KEY_DEPTH = 4
+
+def _last_filter(xobj: StreamObject) -> Optional[str]:
+    filters = xobj.get("/Filter")
+    if filters is None:
+        return None
+    if isinstance(filters, list):
+        return str(filters[-1]) if filters else None
+    return str(filters)
+
+def _image_extension(xobj: StreamObject) -> str:
+    """Output extension derived from the stream's filter, without decoding."""
+    last = _last_filter(xobj)
+    return _PASSTHROUGH_FILTERS.get(last) or _DECODED_FILTERS.get(last) or "png"
+
+def _canonical(value, depth: int = 0):
+    """
+    Hashable form of a PDF value with indirect references resolved, so
+    that separate but equal copies (e.g. of an ICC profile) compare equal.
+    Streams are represented by a hash of their decoded data.
+    """
+    if value is None:
+        return None
+    value = value.get_object()
+    if depth > _MAX_KEY_DEPTH:
+        return repr(value)
+    if isinstance(value, StreamObject):
+        entries = {k: v for k, v in value.items() if k not in ("/Length", "/Filter", "/DecodeParms")}
+        return _canonical(DictionaryObject(entries), depth), hashlib.sha1(value.get_data()).digest()
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _canonical(v, depth + 1)) for k, v in value.items()))
+    if isinstance(value, list):
+        return tuple(_canonical(v, depth + 1) for v in value)
+    return repr(value)
+
+def _image_key(xobj: StreamObject) -> tuple:
+    """
+    Identity of an image's content: its data and every dictionary entry
+    that affects its pixels. Equal keys mean interchangeable images.
+    """
+    digest = hashlib.sha1(xobj.get_data()).digest()
+    return (digest,) + tuple(_canonical(xobj.get(key)) for key in _IMAGE_KEYS)
+
+def _iter_image_xobjects(
+    resources: Optional[DictionaryObject],
+    visited: set,
+) -> Iterator[StreamObject]:
+    """
+    Walk the /XObject resources of a page (descending into form XObjects)
+    and yield image streams. Only dictionaries are inspected here, image
+    data is not read.
+    """
+    if not resources:
+        return
+    xobjects = resources.get_object().get("/XObject")
+    if not xobjects:
+        return
+    for ref in xobjects.get_object().values():
+        xobj = ref.get_object()
+        ident = getattr(ref, "idnum", None) or id(xobj)
+        subtype = xobj.get("/Subtype")
+        if subtype == "/Image":
+            yield xobj
+        elif subtype == "/Form" and ident not in visited:
+            visited.add(ident)
+            yield from _iter_image_xobjects(xobj.get("/Resources"), visited)
+
+def _iter_inline_images(page: PageObject) -> Iterator[Tuple[str, bytes, int, int]]:
+    """
+    Inline images (BI … ID … EI) of a page as (extension, file bytes,
+    width, height). Finding them means parsing the content stream, which
+    is only done when the stream contains a BI operator.
+    """
+    contents = page.get_contents()
+    if contents is None or not _INLINE_IMAGE.search(contents.get_data()):
+        return
+    images = page.images
+    for name in images.keys():
+        if not name.startswith("~"):
+            continue
+        try:
+            image = images[name]
+        except Exception:
+            continue
+        ext = image.name.rsplit(".", 1)[-1].lower()
+        width, height = image.image.size
+        yield _FORMAT_ALIASES.get(ext, ext), image.data, width, height
+
+def _image_bytes(xobj: StreamObject, ext: str, passthrough: bool) -> bytes:
+    if passthrough and ext in ("jpg", "jp2"):
+        # filters before DCT/JPX (e.g. Flate) are undone, the image
+        # codec itself is not
+        return xobj.get_data()
+    img = xobj.decode_as_image()
+    if ext == "jpg" and img.mode not in ("L", "RGB", "CMYK"):
+        img = img.convert("RGB")
+    buf = BytesIO()
+    img.save(buf, format=_PIL_FORMATS[ext])
+    return buf.getvalue()
 
 def extract_images_from_pdf_bytes(
     pdf_bytes: bytes,
@@ -34,38 +127,86 @@ def extract_images_from_pdf_bytes(
     image_format: str = "all",
     min_width: int = 0,
     min_height: int = 0,
-) -> Tuple[BytesIO, int]:
-    """Extract images from PDF bytes, apply filters, and return as ZIP archive."""
+    passthrough: bool = True,
+    deduplicate: bool = True,
+    out: Optional[BinaryIO] = None,
+) -> Tuple[BinaryIO, int]:
+    """
+    Extract images from PDF bytes, apply filters, and return as ZIP archive.
+
+    - size and format filters are evaluated on the XObject dictionary
+      (/Width, /Height, /Filter), so skipped images are never decoded
+    - passthrough: emit JPEG / JPEG 2000 streams unchanged instead of
+      decoding and re-encoding them
+    - deduplicate: images shared between pages (logos, backgrounds) or
+      with identical content are written only once
+    - inline images (BI … ID … EI) are included; only pages whose
+      content stream contains one are parsed
+    - out: writable stream receiving the ZIP; each image is written as
+      soon as it is found
+    """
+    wanted = _FORMAT_ALIASES.get(image_format.lower(), image_format.lower())
     reader = PdfReader(BytesIO(pdf_bytes))
-    pages = _parse_page_ranges(page_range, len(reader.pages))
-    output = BytesIO()
+    pages = parse_page_selection(page_range, len(reader.pages))
+    output = out if out is not None else BytesIO()
+    seen_refs = set()
+    seen_hashes = set()
     count = 0
 
     with ZipFile(output, "w") as zipf:
         for page_index in pages:
             page = reader.pages[page_index]
-            for img_index, img in enumerate(page.images):
-                # Get dimensions directly from the image data using PIL
-                width, height = 0, 0
-                try:
-                    with Image.open(BytesIO(img.data)) as pil_img:
-                        width, height = pil_img.size
-                except:
-                    pass
-                
-                # Apply dimension filter
+            images = _iter_image_xobjects(page.get("/Resources"), set())
+            img_index = -1
+            for img_index, xobj in enumerate(images):
+                width = int(xobj.get("/Width", 0))
+                height = int(xobj.get("/Height", 0))
                 if width < min_width or height < min_height:
                     continue
 
-                # Apply format filter
-                ext = (img.name.split(".")[-1] if img.name else "bin").lower()
-                if image_format != "all" and ext != image_format:
+                ext = _image_extension(xobj)
+                if wanted != "all" and ext != wanted:
+                    continue
+
+                if deduplicate:
+                    ref = xobj.indirect_reference
+                    if ref is not None:
+                        if ref.idnum in seen_refs:
+                            continue
+                        seen_refs.add(ref.idnum)
+                    key = _image_key(xobj)
+                    if key in seen_hashes:
+                        continue
+                    seen_hashes.add(key)
+
+                try:
+                    data = _image_bytes(xobj, ext, passthrough)
+                except Exception:
+                    # undecodable image – skip it rather than fail the export
                     continue
 
-                # Add to ZIP
                 filename = f"page{page_index+1}_img{img_index+1}.{ext}"
-                zipf.writestr(filename, img.data)
+                # image codecs are already compressed, deflate only helps TIFF
+                method = ZIP_DEFLATED if ext == "tiff" else ZIP_STORED
+                zipf.writestr(filename, data, compress_type=method)
+                count += 1
+
+            # numbered after the page's XObject images
+            inline = _iter_inline_images(page)
+            for img_index, (ext, data, width, height) in enumerate(inline, start=img_index + 2):
+                if width < min_width or height < min_height:
+                    continue
+                if wanted != "all" and ext != wanted:
+                    continue
+                if deduplicate:
+                    key = (hashlib.sha1(data).digest(), ext)
+                    if key in seen_hashes:
+                        continue
+                    seen_hashes.add(key)
+                method = ZIP_DEFLATED if ext == "tiff" else ZIP_STORED
+                zipf.writestr(f"page{page_index+1}_img{img_index}.{ext}", data, compress_type=method)
                 count += 1
 
-    output.seek(0)
-    return output, count
\ No newline at end of file
+    if output.seekable():
+        output.seek(0)
+    return output, count
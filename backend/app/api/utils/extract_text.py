@@ -1,36 +1,38 @@
 from io import BytesIO
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from pypdf import PdfReader
 
-def _parse_page_ranges(range_str: Optional[str], total: int) -> List[int]:
-    if not range_str:
-        return list(range(total))
-    pages = set()
-    for part in range_str.split(","):
-        part = part.strip()
-        if "-" in part:
-            start, end = part.split("-", 1)
-            pages.update(range(int(start) - 1, int(end)))
-        else:
-            pages.add(int(part) - 1)
-    return sorted(p for p in pages if 0 <= p < total)
+from app.api.utils.page_selection import parse_page_selection
 
-def extract_text_from_pdf_bytes(
+def extract_page_texts(
     pdf_bytes: bytes,
     page_range: Optional[str] = None,
     preserve_layout: bool = False
-) -> str:
+) -> Tuple[int, List[Tuple[int, str]]]:
     """
-    Merge the extracted text from the given PDF bytes,
-    optionally limiting to a page_range like "1-3,5", and
-    preserving layout if requested.
+    Extract text page by page. Returns the total page count together with
+    (zero-based page index, text) pairs, so callers such as the search
+    index can keep per-page results.
     """
     reader = PdfReader(BytesIO(pdf_bytes))
-    pages = _parse_page_ranges(page_range, len(reader.pages))
-    text_chunks = []
+    pages = parse_page_selection(page_range, len(reader.pages))
+    results = []
     for idx in pages:
         page = reader.pages[idx]
         # layout_mode_space_vertically=False will preserve horizontal layout
         text = page.extract_text(layout_mode_space_vertically=not preserve_layout)
-        text_chunks.append(text or "")
-    return "\n\n".join(text_chunks)
\ No newline at end of file
+        results.append((idx, text or ""))
+    return len(reader.pages), results
+
+def extract_text_from_pdf_bytes(
+    pdf_bytes: bytes,
+    page_range: Optional[str] = None,
+    preserve_layout: bool = False
+) -> str:
+    """
+    Merge the extracted text from the given PDF bytes,
+    optionally limiting to a page_range like "1-3,5", and
+    preserving layout if requested.
+    """
+    _, page_texts = extract_page_texts(pdf_bytes, page_range, preserve_layout)
+    return "\n\n".join(text for _, text in page_texts)
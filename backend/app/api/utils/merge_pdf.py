@@ -1,6 +1,20 @@
 from io import BytesIO
-from typing import List
+from typing import BinaryIO, Dict, Iterable, List
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    PdfObject,
+    StreamObject,
+)
+
+# object numbers reserved in the streamed output
+_PAGES_ID = 1
+_CATALOG_ID = 2
 
 def merge_pdfs_bytes(file_bytes_list: List[bytes]) -> BytesIO:
     """
@@ -15,4 +29,150 @@ def merge_pdfs_bytes(file_bytes_list: List[bytes]) -> BytesIO:
     output = BytesIO()
     writer.write(output)
     output.seek(0)
-    return output
\ No newline at end of file
+    return output
+
+class _StreamedPdf:
+    """
+    Minimal append-only PDF writer: objects are serialized as soon as they
+    are added and only their byte offsets are kept in memory.
+    """
+
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.pos = 0
+        # offsets[id - 1]; the reserved page tree and catalog come last
+        self.offsets: List[int] = [0, 0]
+        self.kids: List[int] = []
+        self._write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes) -> None:
+        self.out.write(data)
+        self.pos += len(data)
+
+    def reserve(self) -> int:
+        self.offsets.append(0)
+        return len(self.offsets)
+
+    def write_object(self, idnum: int, obj: PdfObject) -> None:
+        self.offsets[idnum - 1] = self.pos
+        buf = BytesIO()
+        buf.write(f"{idnum} 0 obj\n".encode())
+        obj.write_to_stream(buf)
+        buf.write(b"\nendobj\n")
+        self._write(buf.getvalue())
+
+    def close(self) -> None:
+        pages = DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(IndirectObject(k, 0, None) for k in self.kids),
+            NameObject("/Count"): NumberObject(len(self.kids)),
+        })
+        catalog = DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): IndirectObject(_PAGES_ID, 0, None),
+        })
+        self.write_object(_PAGES_ID, pages)
+        self.write_object(_CATALOG_ID, catalog)
+
+        xref_pos = self.pos
+        size = len(self.offsets) + 1
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        lines += [f"{offset:010d} 00000 n \n" for offset in self.offsets]
+        lines.append(
+            f"trailer\n<< /Size {size} /Root {_CATALOG_ID} 0 R >>\n"
+            f"startxref\n{xref_pos}\n%%EOF\n"
+        )
+        self._write("".join(lines).encode())
+
+def _copy_document(reader: PdfReader, pdf: _StreamedPdf) -> int:
+    """
+    Copy every page of `reader`, and every object reachable from the
+    pages, into `pdf`. Objects are renumbered, written and dropped from
+    the reader's cache one at a time. Returns the number of pages copied.
+    """
+    id_map: Dict[int, int] = {}
+    pending: List[IndirectObject] = []
+    # page tree nodes and the catalog are rebuilt, references to them
+    # (e.g. a page's /Parent reached through an annotation) become null
+    skipped = {reader.trailer.raw_get("/Root").idnum}
+
+    def new_id(ref: IndirectObject) -> int:
+        if ref.idnum not in id_map:
+            id_map[ref.idnum] = pdf.reserve()
+            pending.append(ref)
+        return id_map[ref.idnum]
+
+    def translate(obj: PdfObject) -> PdfObject:
+        if isinstance(obj, IndirectObject):
+            if obj.idnum in skipped:
+                return NullObject()
+            return IndirectObject(new_id(obj), 0, None)
+        if isinstance(obj, StreamObject):
+            copy = StreamObject()
+            copy._data = obj._data
+            copy.update({k: translate(v) for k, v in obj.items() if k != "/Length"})
+            return copy
+        if isinstance(obj, DictionaryObject):
+            return DictionaryObject({k: translate(v) for k, v in obj.items()})
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(translate(v) for v in obj)
+        return obj
+
+    pages = reader.pages
+    page_refs = [page.indirect_reference for page in pages]
+    for node in _page_tree_nodes(reader):
+        skipped.add(node)
+    # page objects are numbered up front so links between pages resolve
+    for ref in page_refs:
+        id_map[ref.idnum] = pdf.reserve()
+
+    for page, ref in zip(pages, page_refs):
+        copy = DictionaryObject({
+            k: translate(v) for k, v in page.items() if k != "/Parent"
+        })
+        copy[NameObject("/Parent")] = IndirectObject(_PAGES_ID, 0, None)
+        pdf.write_object(id_map[ref.idnum], copy)
+        pdf.kids.append(id_map[ref.idnum])
+
+        while pending:
+            dep = pending.pop()
+            obj = reader.get_object(dep)
+            pdf.write_object(id_map[dep.idnum], translate(obj) if obj is not None else NullObject())
+            reader.resolved_objects.pop((dep.generation, dep.idnum), None)
+    return len(page_refs)
+
+def _page_tree_nodes(reader: PdfReader) -> List[int]:
+    """Object numbers of the intermediate /Pages nodes of the page tree."""
+    nodes = []
+    stack = [reader.trailer["/Root"].raw_get("/Pages")]
+    while stack:
+        ref = stack.pop()
+        if not isinstance(ref, IndirectObject):
+            continue
+        node = ref.get_object()
+        if node.get("/Type") == "/Pages":
+            nodes.append(ref.idnum)
+            stack.extend(node.get("/Kids", ArrayObject()).get_object())
+    return nodes
+
+def merge_pdf_files(sources: Iterable[BinaryIO], out: BinaryIO) -> int:
+    """
+    Merge PDFs into `out` with memory bounded by the largest single object
+    rather than by the number or size of the inputs.
+
+    Sources are read one at a time (e.g. disk-spooled uploads); each
+    reader is released as soon as its pages have been copied, and the
+    result is written incrementally, so `out` can be a file on disk.
+    Document-level data (outlines, forms, named destinations) is dropped,
+    as in merge_pdfs_bytes. Returns the total number of pages.
+    """
+    pdf = _StreamedPdf(out)
+    total = 0
+    for index, source in enumerate(sources, start=1):
+        reader = PdfReader(source)
+        if reader.is_encrypted:
+            raise ValueError(f"File {index} is encrypted")
+        total += _copy_document(reader, pdf)
+        del reader
+    pdf.close()
+    return total
@@ -1,5 +1,39 @@
 from io import BytesIO
-from pypdf import PdfReader, PdfWriter, Transformation
+from pypdf import PageObject, PdfReader, PdfWriter, Transformation
+
+def _tile_page(
+    writer: PdfWriter,
+    src: PageObject,
+    cols: int,
+    rows: int
+) -> None:
+    # source dimensions
+    w = float(src.mediabox.width)
+    h = float(src.mediabox.height)
+
+    # blank page sized to hold the grid
+    dest = writer.add_blank_page(width=w * cols, height=h * rows)
+
+    # tile it
+    for x in range(cols):
+        for y in range(rows):
+            dest.merge_transformed_page(
+                src,
+                Transformation().translate(x * w, y * h)
+            )
+
+def n_up_writer(
+    writer: PdfWriter,
+    cols: int = 4,
+    rows: int = 4
+) -> PdfWriter:
+    """
+    Same as n_up_pdf_bytes for a document that is already open: returns a
+    new writer with the first page of `writer` tiled on a single page.
+    """
+    out = PdfWriter()
+    _tile_page(out, writer.pages[0], cols, rows)
+    return out
 
 def n_up_pdf_bytes(
     pdf_bytes: bytes,
@@ -13,24 +47,11 @@ def n_up_pdf_bytes(
     Returns a BytesIO containing the new PDF.
     """
     reader = PdfReader(BytesIO(pdf_bytes))
-    src = reader.pages[0]
-    
-    # source dimensions
-    w = float(src.mediabox.width)
-    h = float(src.mediabox.height)
-    
+
     # create new PDF + blank page sized to hold the grid
     writer = PdfWriter()
-    dest = writer.add_blank_page(width=w * cols, height=h * rows)
-    
-    # tile it
-    for x in range(cols):
-        for y in range(rows):
-            dest.merge_transformed_page(
-                src,
-                Transformation().translate(x * w, y * h)
-            )
-    
+    _tile_page(writer, reader.pages[0], cols, rows)
+
     out = BytesIO()
     writer.write(out)
     out.seek(0)
@@ -0,0 +1,77 @@
+import logging
+import os
+from io import BytesIO
+from typing import Optional
+import fitz  # PyMuPDF
+
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+# MuPDF save options per level. "fast" compresses what was written
+# uncompressed, drops unreferenced objects and packs the rest into object
+# streams with a cross-reference stream; "max" also merges identical
+# objects and streams (fonts and images repeated by merge or n-up) and
+# compresses uncompressed fonts and images.
+OPTIMIZE_LEVELS = {
+    "off": None,
+    "fast": {"garbage": 1, "deflate": True, "use_objstms": 1},
+    "max": {
+        "garbage": 4,
+        "deflate": True,
+        "deflate_fonts": True,
+        "deflate_images": True,
+        "use_objstms": 1,
+    },
+}
+
+def optimize_level(level: Optional[str]) -> str:
+    """Validated optimization level; PDF_OPTIMIZE when none is given."""
+    level = (level or settings.PDF_OPTIMIZE).lower()
+    if level not in OPTIMIZE_LEVELS:
+        raise ValueError(f"Invalid optimize level '{level}': use off, fast or max")
+    return level
+
+def optimize_pdf(data: BytesIO, level: str) -> BytesIO:
+    """
+    Rewrite a finished PDF to shrink it, as the last step before it is
+    sent. The result is only used when it is smaller; a PDF MuPDF cannot
+    rewrite is returned unchanged.
+    """
+    options = OPTIMIZE_LEVELS[level]
+    if options is None:
+        return data
+    original = data.getvalue()
+    try:
+        with fitz.open(stream=original, filetype="pdf") as doc:
+            optimized = doc.tobytes(**options)
+    except (fitz.FileDataError, RuntimeError) as exc:
+        log.warning("Output not optimized: %s", exc)
+        return data
+    if len(optimized) >= len(original):
+        return data
+    data.close()
+    return BytesIO(optimized)
+
+def optimize_pdf_file(path: str, level: str) -> None:
+    """
+    optimize_pdf for an output file on disk, replaced in place. MuPDF
+    loads the streams one at a time, so the file is not read into
+    memory as a whole.
+    """
+    options = OPTIMIZE_LEVELS[level]
+    if options is None:
+        return
+    tmp = f"{path}.opt"
+    try:
+        with fitz.open(path, filetype="pdf") as doc:
+            doc.save(tmp, **options)
+    except (fitz.FileDataError, RuntimeError) as exc:
+        log.warning("Output not optimized: %s", exc)
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        return
+    if os.path.getsize(tmp) < os.path.getsize(path):
+        os.replace(tmp, path)
+    else:
+        os.unlink(tmp)
@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+from typing import BinaryIO
+
+from app.core.config import settings
+
+def output_file(suffix: str) -> BinaryIO:
+    """
+    Named temporary file for a response body. It is not deleted on
+    close; the response removes it after sending.
+    """
+    return tempfile.NamedTemporaryFile(
+        "w+b", suffix=suffix, dir=settings.OUTPUT_DIR, delete=False
+    )
+
+def spool(data: BinaryIO, suffix: str) -> str:
+    """
+    Move an in-memory result to an output file and return its path. The
+    buffer is written in one call and closed, so its memory is freed
+    before the response is sent.
+    """
+    with output_file(suffix) as out:
+        try:
+            if hasattr(data, "getbuffer"):
+                out.write(data.getbuffer())
+            else:
+                data.seek(0)
+                shutil.copyfileobj(data, out)
+        except BaseException:
+            out.close()
+            os.unlink(out.name)
+            raise
+        finally:
+            data.close()
+    return out.name
@@ -0,0 +1,120 @@
+import math
+from typing import Iterator, List, Optional
+
+_LAST = ("last", "end")
+
+class PageSelection:
+    """
+    Selected zero-based page indices of a document with `total` pages,
+    kept as a list of `range` objects (one per comma-separated item), so
+    "1-1000000" costs one range no matter how many pages it covers.
+
+    Iteration is lazy and yields pages in the order they were given
+    ("5-1" counts down); a page selected by several items is yielded
+    once. Membership tests cost one comparison per item.
+    """
+
+    __slots__ = ("ranges", "total", "_overlapping")
+
+    def __init__(self, ranges: List[range], total: int):
+        self.ranges = [r for r in ranges if r]
+        self.total = total
+        bounds = sorted((min(r[0], r[-1]), max(r[0], r[-1])) for r in self.ranges)
+        self._overlapping = any(
+            nxt[0] <= prev[1] for prev, nxt in zip(bounds, bounds[1:])
+        )
+
+    def __iter__(self) -> Iterator[int]:
+        if not self._overlapping:
+            for r in self.ranges:
+                yield from r
+            return
+        seen = set()
+        for r in self.ranges:
+            for idx in r:
+                if idx not in seen:
+                    seen.add(idx)
+                    yield idx
+
+    def __len__(self) -> int:
+        if not self._overlapping:
+            return sum(len(r) for r in self.ranges)
+        return sum(1 for _ in self)
+
+    def __bool__(self) -> bool:
+        return bool(self.ranges)
+
+    def __contains__(self, idx: int) -> bool:
+        return any(idx in r for r in self.ranges)
+
+    def __repr__(self) -> str:
+        return f"PageSelection({self.ranges!r}, total={self.total})"
+
+    def parts(self) -> List[range]:
+        """One range per item of the selection, e.g. per output document of a split."""
+        return list(self.ranges)
+
+    def covers_all(self) -> bool:
+        return len(self) == self.total
+
+def _page_number(text: str, default: int, total: int) -> int:
+    text = text.strip().lower()
+    if not text:
+        return default
+    if text in _LAST:
+        return total
+    return int(text)
+
+def _clip(first: int, last: int, step: int, total: int) -> range:
+    """range of the zero-based indices first..last (inclusive, either direction) inside the document."""
+    if first <= last:
+        if first < 0:
+            first += math.ceil(-first / step) * step
+        return range(first, min(last, total - 1) + 1, step)
+    if first > total - 1:
+        first -= math.ceil((first - total + 1) / step) * step
+    return range(first, max(last, 0) - 1, -step)
+
+def _parse_item(item: str, total: int) -> range:
+    keyword = item.lower()
+    if keyword == "all":
+        return range(total)
+    if keyword == "even":
+        return range(1, total, 2)
+    if keyword == "odd":
+        return range(0, total, 2)
+    if keyword == "reverse":
+        return range(total - 1, -1, -1)
+
+    body, _, step_text = item.partition(":")
+    step = int(step_text) if step_text.strip() else 1
+    if step < 1:
+        raise ValueError
+    if "-" in body:
+        start_text, end_text = body.split("-", 1)
+        start = _page_number(start_text, 1, total)
+        end = _page_number(end_text, total, total)
+    else:
+        start = end = _page_number(body, 1, total)
+    return _clip(start - 1, end - 1, step, total)
+
+def parse_page_selection(spec: Optional[str], total: int) -> PageSelection:
+    """
+    Parse a page selection such as "1-3,5", "10-1" (reversed), "1-20:2"
+    (every other page), "4-" (to the end), "even", "odd", "reverse" or
+    "all". Page numbers are 1-based and "last" names the final page.
+    An empty spec selects every page. Pages beyond the document are
+    ignored; malformed items raise ValueError.
+    """
+    if not spec or not spec.strip():
+        return PageSelection([range(total)], total)
+    ranges = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            ranges.append(_parse_item(item, total))
+        except ValueError:
+            raise ValueError(f"Invalid page range: '{item}'") from None
+    return PageSelection(ranges, total)
@@ -0,0 +1,70 @@
+import inspect
+from io import BytesIO
+from typing import Any, Callable, Dict, List
+from pypdf import PdfReader, PdfWriter
+
+from app.api.utils.add_watermark import add_text_watermark_to_writer
+from app.api.utils.compress import compress_writer
+from app.api.utils.multiple_pages_on_one import n_up_writer
+from app.api.utils.optimize import optimize_pdf
+from app.api.utils.remove_pages import remove_pages_from_writer
+
+# step name → function(writer, **params) -> writer
+STEPS: Dict[str, Callable[..., PdfWriter]] = {
+    "remove_pages": remove_pages_from_writer,
+    "add_text_watermark": add_text_watermark_to_writer,
+    "compress": compress_writer,
+    "n_up": n_up_writer,
+}
+
+def validate_steps(steps: List[Dict[str, Any]]) -> None:
+    """
+    Check every step name and its parameters against the step function's
+    signature before any work is done. Raises ValueError.
+    """
+    if not steps:
+        raise ValueError("The pipeline needs at least one step")
+    for number, step in enumerate(steps, start=1):
+        func = STEPS.get(step["op"])
+        if func is None:
+            raise ValueError(f"Step {number}: unknown operation '{step['op']}'")
+        try:
+            inspect.signature(func).bind(None, **step.get("params", {}))
+        except TypeError as exc:
+            raise ValueError(f"Step {number} ({step['op']}): {exc}") from exc
+
+def run_pipeline_bytes(
+    pdf_bytes: bytes,
+    steps: List[Dict[str, Any]],
+) -> BytesIO:
+    """
+    Parse the PDF once, apply each {"op": ..., "params": {...}} step to the
+    same in-memory PdfWriter, and serialize once at the end.
+    """
+    validate_steps(steps)
+    reader = PdfReader(BytesIO(pdf_bytes))
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+
+    for step in steps:
+        if len(writer.pages) == 0:
+            raise ValueError(f"No pages left before step '{step['op']}'")
+        writer = STEPS[step["op"]](writer, **step.get("params", {}))
+
+    out = BytesIO()
+    writer.write(out)
+    out.seek(0)
+    return out
+
+def run_step_bytes(pdf_bytes: bytes, step: Dict[str, Any], optimize: str = "off") -> bytes:
+    """
+    Apply one step to a PDF inside a worker process (see
+    run_in_process) and optimize the result at the given level.
+    Compression does not start a process pool of its own there.
+    """
+    params = dict(step.get("params", {}))
+    if step["op"] == "compress":
+        params["parallel"] = False
+    out = run_pipeline_bytes(pdf_bytes, [{"op": step["op"], "params": params}])
+    return optimize_pdf(out, optimize).getvalue()
@@ -0,0 +1,155 @@
+import os
+import re
+from typing import Callable, Optional
+import fitz  # PyMuPDF
+
+from app.core.config import settings
+
+_HEADER_WINDOW = 1024
+_TRAILER_WINDOW = 64 * 1024
+_TRAILER_OVERLAP = 256
+_STARTXREF = re.compile(rb"startxref\s+(\d+)\s+%%EOF", re.S)
+_XREF_TARGET = re.compile(rb"\s*(?:xref\b|\d+\s+\d+\s+obj\b)")
+_COMPONENTS = {"/DeviceGray": 1, "/CalGray": 1, "/DeviceCMYK": 4}
+
+class PreflightError(ValueError):
+    """
+    The upload was rejected before any real processing. `status_code`
+    is 400 for damaged or encrypted files and 413 for files over a limit.
+    """
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def _find_startxref(read: Callable[[int, int], bytes], size: int) -> Optional[int]:
+    """
+    Offset of the last startxref/%%EOF trailer. It is normally in the
+    last bytes, but padding after %%EOF is common, so the file is
+    scanned backwards window by window until a trailer turns up.
+    """
+    end = size
+    while end > 0:
+        start = max(0, end - _TRAILER_WINDOW)
+        match = None
+        for match in _STARTXREF.finditer(read(start, end - start)):
+            pass
+        if match is not None:
+            return int(match.group(1))
+        if start == 0:
+            return None
+        # the windows overlap so that a trailer split between two is found
+        end = start + _TRAILER_OVERLAP
+    return None
+
+def _check_structure(read: Callable[[int, int], bytes], size: int) -> None:
+    # read(offset, length) → bytes of the file
+    header = read(0, _HEADER_WINDOW).find(b"%PDF-")
+    if header < 0:
+        raise PreflightError("Not a PDF file (missing %PDF header)")
+    offset = _find_startxref(read, size)
+    if offset is None:
+        raise PreflightError("Damaged PDF: missing startxref/%%EOF trailer (truncated upload?)")
+    if not settings.PREFLIGHT_STRICT:
+        # a wrong offset is repaired by the engines from the objects themselves
+        return
+    # offsets count from the start of the file, but writers that put
+    # bytes before %PDF count them from the header, as readers accept
+    for target in {offset, header + offset}:
+        if target < size and _XREF_TARGET.match(read(target, 64)):
+            return
+    raise PreflightError("Damaged PDF: startxref does not point at a cross-reference table")
+
+def _int_key(doc: fitz.Document, xref: int, key: str) -> Optional[int]:
+    kind, value = doc.xref_get_key(xref, key)
+    return int(value) if kind == "int" else None
+
+def _decoded_size(doc: fitz.Document, xref: int) -> Optional[int]:
+    """Declared size of a stream once decoded, where the dictionary states it."""
+    if doc.xref_get_key(xref, "Subtype")[1] == "/Image":
+        width = _int_key(doc, xref, "Width") or 0
+        height = _int_key(doc, xref, "Height") or 0
+        bits = _int_key(doc, xref, "BitsPerComponent") or 8
+        components = _COMPONENTS.get(doc.xref_get_key(xref, "ColorSpace")[1], 3)
+        return width * height * components * bits // 8
+    return _int_key(doc, xref, "DL")
+
+def _check_size(size: int) -> None:
+    if size > settings.PREFLIGHT_MAX_BYTES:
+        raise PreflightError(
+            f"PDF is larger than {settings.PREFLIGHT_MAX_BYTES} bytes", 413
+        )
+
+def _check_document(open_doc: Callable[[], fitz.Document], size: int) -> int:
+    try:
+        doc = open_doc()
+    except (fitz.FileDataError, RuntimeError) as exc:
+        raise PreflightError(f"Damaged PDF: {exc}") from None
+    with doc:
+        # the trailer is read without decrypting anything, so every
+        # encryption method is caught, also AES ones the engines could
+        # not open anyway
+        if doc.needs_pass or doc.xref_get_key(-1, "Encrypt")[0] != "null":
+            raise PreflightError("Encrypted PDFs are not supported; remove the password first")
+        if doc.is_repaired and settings.PREFLIGHT_STRICT:
+            raise PreflightError("Damaged PDF: broken cross-reference table")
+
+        page_count = doc.page_count
+        if page_count == 0:
+            raise PreflightError("PDF has no pages")
+        if page_count > settings.PREFLIGHT_MAX_PAGES:
+            raise PreflightError(
+                f"PDF has {page_count} pages, the limit is {settings.PREFLIGHT_MAX_PAGES}", 413
+            )
+        objects = doc.xref_length()
+        if objects > settings.PREFLIGHT_MAX_OBJECTS:
+            raise PreflightError(
+                f"PDF has {objects} objects, the limit is {settings.PREFLIGHT_MAX_OBJECTS}", 413
+            )
+
+        limit = settings.PREFLIGHT_MAX_PAGE_SIZE
+        for pno in range(page_count):
+            rect = doc.page_cropbox(pno)
+            if rect.width > limit or rect.height > limit:
+                raise PreflightError(
+                    f"Page {pno + 1} is {rect.width:.0f} × {rect.height:.0f} pt, "
+                    f"the limit is {limit} pt per side", 413
+                )
+
+        for xref in range(1, objects):
+            if not doc.xref_is_stream(xref):
+                continue
+            length = _int_key(doc, xref, "Length")
+            if length is not None and length > size:
+                raise PreflightError(f"Damaged PDF: stream {xref} is longer than the file")
+            decoded = _decoded_size(doc, xref)
+            if decoded is not None and decoded > settings.PREFLIGHT_MAX_STREAM_BYTES:
+                raise PreflightError(
+                    f"Stream {xref} would decode to {decoded} bytes, "
+                    f"the limit is {settings.PREFLIGHT_MAX_STREAM_BYTES}", 413
+                )
+    return page_count
+
+def preflight_pdf(pdf_bytes: bytes) -> int:
+    """
+    Cheap sanity checks of an uploaded PDF before it is handed to an
+    engine: header, trailer and startxref, encryption, page count, page
+    dimensions and the declared sizes of its streams, against the
+    PREFLIGHT_* settings. Only the cross-reference table, the page boxes
+    and the stream dictionaries are read; nothing is decoded or
+    rendered. Returns the page count; raises PreflightError.
+    """
+    _check_size(len(pdf_bytes))
+    _check_structure(lambda offset, length: pdf_bytes[offset:offset + length], len(pdf_bytes))
+    return _check_document(lambda: fitz.open(stream=pdf_bytes, filetype="pdf"), len(pdf_bytes))
+
+def preflight_file(path: str) -> int:
+    """preflight_pdf for a file on disk, which is never read into memory as a whole."""
+    size = os.path.getsize(path)
+    _check_size(size)
+    with open(path, "rb") as f:
+        def read(offset: int, length: int) -> bytes:
+            f.seek(offset)
+            return f.read(length)
+        _check_structure(read, size)
+    return _check_document(lambda: fitz.open(path, filetype="pdf"), size)
@@ -0,0 +1,117 @@
+from io import BytesIO
+from typing import BinaryIO, Optional
+from zipfile import ZipFile
+import fitz  # PyMuPDF
+from PIL import Image
+
+from app.api.utils.page_selection import parse_page_selection
+
+# output format → (archive extension, media type)
+RASTER_FORMATS = {
+    "png": ("png", "image/png"),
+    "jpeg": ("jpg", "image/jpeg"),
+    "webp": ("webp", "image/webp"),
+}
+_FORMAT_ALIASES = {"jpg": "jpeg"}
+
+# formats that can carry an alpha channel
+_ALPHA_FORMATS = {"png", "webp"}
+
+def normalize_format(fmt: str) -> str:
+    """Return the canonical raster format name or raise ValueError."""
+    fmt = _FORMAT_ALIASES.get(fmt.lower(), fmt.lower())
+    if fmt not in RASTER_FORMATS:
+        raise ValueError(f"Unsupported image format: {fmt}")
+    return fmt
+
+def _pixel_count(rect: fitz.Rect, zoom: float) -> int:
+    # the pixmap covers the page rectangle rounded out to whole pixels
+    irect = (rect * fitz.Matrix(zoom, zoom)).irect
+    return irect.width * irect.height
+
+def _capped_zoom(page: fitz.Page, zoom: float, max_pixels: Optional[int]) -> float:
+    if max_pixels:
+        rect = page.rect
+        pixels = _pixel_count(rect, zoom)
+        if pixels > max_pixels:
+            zoom *= (max_pixels / pixels) ** 0.5
+            while zoom > 0 and _pixel_count(rect, zoom) > max_pixels:
+                zoom *= 0.99
+    return zoom
+
+def render_page(
+    page: fitz.Page,
+    zoom: float,
+    fmt: str = "png",
+    quality: Optional[int] = None,
+    grayscale: bool = False,
+    alpha: bool = False,
+    max_pixels: Optional[int] = None,
+) -> bytes:
+    """
+    Render one page at `zoom` (1.0 = 72 DPI) and encode it.
+
+    The pixmap is rendered directly in the colorspace the output needs:
+    one channel for grayscale, no alpha unless requested and supported by
+    the format. `quality` is the JPEG/WebP quality (1-100) or the PNG
+    compression level (0-9); None keeps the encoder default.
+    """
+    zoom = _capped_zoom(page, zoom, max_pixels)
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    alpha = alpha and fmt in _ALPHA_FORMATS
+    pix = page.get_pixmap(
+        matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace, alpha=alpha
+    )
+
+    if fmt == "jpeg":
+        return pix.tobytes("jpeg", jpg_quality=quality or 95)
+    if fmt == "png" and quality is None:
+        return pix.tobytes("png")
+
+    mode = ("L" if grayscale else "RGB") + ("A" if alpha else "")
+    img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+    buf = BytesIO()
+    if fmt == "png":
+        img.save(buf, "PNG", compress_level=quality)
+    else:
+        img.save(buf, "WEBP", quality=quality or 80, method=4)
+    return buf.getvalue()
+
+def rasterize_pdf_bytes(
+    pdf_bytes: bytes,
+    dpi: int = 300,
+    fmt: str = "png",
+    page_range: Optional[str] = None,
+    quality: Optional[int] = None,
+    grayscale: bool = False,
+    alpha: bool = False,
+    max_pixels: Optional[int] = None,
+    out: Optional[BinaryIO] = None,
+) -> BinaryIO:
+    """
+    Render the selected pages (all pages if `page_range` is empty) and
+    bundle them into a ZIP (page_1.png, page_2.png, … numbered by their
+    page in the source). Pages outside the range are never rendered.
+    The ZIP is written to `out` if given, page by page, else to a BytesIO.
+    """
+    fmt = normalize_format(fmt)
+    ext = RASTER_FORMATS[fmt][0]
+    if quality is not None:
+        low, high = (0, 9) if fmt == "png" else (1, 100)
+        if not low <= quality <= high:
+            raise ValueError(f"Quality for {fmt} must be between {low} and {high}")
+    zoom = dpi / 72  # 72 DPI is the PDF default
+
+    zip_buf = out if out is not None else BytesIO()
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        pages = parse_page_selection(page_range, len(doc))
+        if not pages:
+            raise ValueError("No pages selected")
+        with ZipFile(zip_buf, "w") as zf:
+            for idx in pages:
+                data = render_page(
+                    doc[idx], zoom, fmt, quality, grayscale, alpha, max_pixels
+                )
+                zf.writestr(f"page_{idx + 1}.{ext}", data)
+    zip_buf.seek(0)
+    return zip_buf
@@ -1,7 +1,27 @@
 from io import BytesIO
 from typing import List, Optional
 from pypdf import PdfReader, PdfWriter
-from app.api.utils.extract_text import _parse_page_ranges
+from app.api.utils.page_selection import parse_page_selection
+
+def remove_pages_from_writer(
+    writer: PdfWriter,
+    page_range: Optional[str] = None
+) -> PdfWriter:
+    """
+    Remove the pages in `page_range` (e.g. "1-3,5") and return a new
+    writer holding only the kept pages. Removing them in place would
+    leave their content streams and resources in the writer as orphan
+    objects, still written out.
+    """
+    total = len(writer.pages)
+    remove = parse_page_selection(page_range, total)
+    if remove.covers_all():
+        raise ValueError("Cannot remove every page of the document")
+    result = PdfWriter()
+    for idx in range(total):
+        if idx not in remove:
+            result.add_page(writer.pages[idx])
+    return result
 
 def remove_pages_bytes(
     pdf_bytes: bytes,
@@ -10,18 +30,21 @@ def remove_pages_bytes(
     """
     Remove the specified pages from a PDF byte-stream.
     page_range is a string like "1-3,5" indicating pages to delete.
-    Returns the modified PDF as BytesIO.
+    Returns the modified PDF as BytesIO. Raises ValueError if no page
+    would be left.
     """
     reader = PdfReader(BytesIO(pdf_bytes))
     total = len(reader.pages)
     # parse 1-based page numbers into zero-based indices to remove
-    remove_indices = set(_parse_page_ranges(page_range, total))
+    remove = parse_page_selection(page_range, total)
+    if remove.covers_all():
+        raise ValueError("Cannot remove every page of the document")
 
     writer = PdfWriter()
     # copy only pages not slated for removal
-    for idx, page in enumerate(reader.pages):
-        if idx not in remove_indices:
-            writer.add_page(page)
+    for idx in range(total):
+        if idx not in remove:
+            writer.add_page(reader.pages[idx])
 
     output = BytesIO()
     writer.write(output)
@@ -2,25 +2,20 @@ from io import BytesIO
 from typing import List
 from pypdf import PdfReader, PdfWriter
 
+from app.api.utils.page_selection import parse_page_selection
+
 def split_by_range_bytes(
     pdf_bytes: bytes,
     range_str: str
 ) -> List[BytesIO]:
+    """
+    One output document per item of `range_str` ("1-3,5" → two PDFs);
+    only the selected pages are loaded.
+    """
     reader = PdfReader(BytesIO(pdf_bytes))
     total = len(reader.pages)
     outputs: List[BytesIO] = []
-    for part in [p.strip() for p in range_str.split(",") if p.strip()]:
-        if "-" in part:
-            start_str, end_str = part.split("-", 1)
-            start = max(int(start_str) - 1, 0)
-            end = min(int(end_str) - 1, total - 1)
-            indices = list(range(start, end + 1))
-        else:
-            idx = int(part) - 1
-            if 0 <= idx < total:
-                indices = [idx]
-            else:
-                continue
+    for indices in parse_page_selection(range_str, total).parts():
         writer = PdfWriter()
         for i in indices:
             writer.add_page(reader.pages[i])
@@ -51,15 +46,11 @@ def extract_pages_bytes(
     pdf_bytes: bytes,
     option: str
 ) -> List[BytesIO]:
+    """One single-page document per selected page; `option` is all, even or odd."""
     reader = PdfReader(BytesIO(pdf_bytes))
     total = len(reader.pages)
     outputs: List[BytesIO] = []
-    for idx in range(total):
-        page_num = idx + 1
-        if option == "even" and (page_num % 2 != 0):
-            continue
-        if option == "odd" and (page_num % 2 != 1):
-            continue
+    for idx in parse_page_selection(option, total):
         writer = PdfWriter()
         writer.add_page(reader.pages[idx])
         out = BytesIO()
@@ -0,0 +1,149 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+import fitz  # PyMuPDF
+
+from app.api.utils.rasterize import render_page
+from app.core.config import settings
+
+THUMBNAIL_FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+
+class ThumbnailCache:
+    """
+    Thread-safe LRU cache of encoded images bounded by total size in bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: Hashable, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+thumbnail_cache = ThumbnailCache(settings.THUMBNAIL_CACHE_BYTES)
+
+# page counts of recently seen documents, so fully cached requests do not
+# have to open the PDF at all
+_page_counts: "OrderedDict[str, int]" = OrderedDict()
+_PAGE_COUNTS_MAX = 4096
+_page_counts_lock = threading.Lock()
+
+# users who uploaded each recently seen document; only they may fetch
+# its previews by hash
+_owners: "OrderedDict[str, Set[int]]" = OrderedDict()
+_owners_lock = threading.Lock()
+
+def _add_owner(doc_hash: str, user_id: int) -> None:
+    with _owners_lock:
+        _owners.setdefault(doc_hash, set()).add(user_id)
+        _owners.move_to_end(doc_hash)
+        if len(_owners) > _PAGE_COUNTS_MAX:
+            _owners.popitem(last=False)
+
+def _is_owner(doc_hash: str, user_id: int) -> bool:
+    with _owners_lock:
+        return user_id in _owners.get(doc_hash, ())
+
+def document_page_count(pdf_bytes: bytes, doc_hash: str) -> int:
+    with _page_counts_lock:
+        count = _page_counts.get(doc_hash)
+        if count is not None:
+            _page_counts.move_to_end(doc_hash)
+            return count
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        count = len(doc)
+    with _page_counts_lock:
+        _page_counts[doc_hash] = count
+        if len(_page_counts) > _PAGE_COUNTS_MAX:
+            _page_counts.popitem(last=False)
+    return count
+
+def _cache_key(doc_hash: str, page: int, size: int, fmt: str, quality: int) -> Tuple:
+    # PNG is lossless, its renders do not depend on quality
+    return (doc_hash, page, size, fmt, None if fmt == "png" else quality)
+
+def _render(page: fitz.Page, size: int, fmt: str, quality: int) -> bytes:
+    # fit the page into a size×size box; previews never need alpha
+    zoom = size / max(page.rect.width, page.rect.height)
+    return render_page(page, zoom, fmt, quality if fmt != "png" else None)
+
+def cached_thumbnail(
+    doc_hash: str,
+    page: int,
+    size: int = 256,
+    fmt: str = "webp",
+    quality: int = 75,
+    user_id: Optional[int] = None,
+) -> Optional[bytes]:
+    """
+    Return a previously rendered thumbnail without the source PDF. With
+    `user_id`, only to a user who has uploaded the document: to anyone
+    else it is not cached, so a hash reveals nothing.
+    """
+    if user_id is not None and not _is_owner(doc_hash, user_id):
+        return None
+    return thumbnail_cache.get(_cache_key(doc_hash, page, size, fmt, quality))
+
+def render_thumbnails(
+    pdf_bytes: bytes,
+    doc_hash: str,
+    pages: List[int],
+    size: int = 256,
+    fmt: str = "webp",
+    quality: int = 75,
+    user_id: Optional[int] = None,
+) -> Dict[int, bytes]:
+    """
+    Render the given zero-based pages so that their longer edge is `size`
+    pixels. Cached renders are reused; the PDF is only opened when at
+    least one page is missing from the cache. `user_id` is recorded as
+    an owner of the document for cached_thumbnail.
+    """
+    if user_id is not None:
+        _add_owner(doc_hash, user_id)
+    if fmt not in THUMBNAIL_FORMATS:
+        raise ValueError(f"Unsupported thumbnail format: {fmt}")
+
+    results: Dict[int, bytes] = {}
+    missing = []
+    for idx in pages:
+        data = thumbnail_cache.get(_cache_key(doc_hash, idx, size, fmt, quality))
+        if data is None:
+            missing.append(idx)
+        else:
+            results[idx] = data
+
+    if missing:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            for idx in missing:
+                data = _render(doc[idx], size, fmt, quality)
+                thumbnail_cache.put(_cache_key(doc_hash, idx, size, fmt, quality), data)
+                results[idx] = data
+    return results
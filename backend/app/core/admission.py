@@ -0,0 +1,160 @@
+# pamäťový rozpočet procesu pre ťažké PDF operácie
+import asyncio
+import os
+import threading
+from collections import deque
+from typing import Deque, Optional
+
+from app.core.config import settings
+
+class AdmissionRejected(Exception):
+    """
+    The request was not admitted. `retry_after` is None when the request
+    could never fit into the budget, so retrying will not help.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ("cost", "loop", "future", "granted")
+
+    def __init__(self, cost: int, loop: asyncio.AbstractEventLoop):
+        self.cost = cost
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+class MemoryBudget:
+    """
+    Process-wide budget of working memory. Requests reserve their
+    estimated peak before running and release it afterwards; requests
+    that do not fit wait in FIFO order (so large jobs are not starved by
+    small ones) for up to `queue_timeout` seconds, and are rejected when
+    the queue is full or the wait times out.
+
+    State is guarded by a thread lock so the budget can be shared by
+    several event loops and worker threads.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        max_queue: int = 64,
+        queue_timeout: float = 30.0,
+        retry_after: int = 5,
+    ):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_use = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _grant_waiting(self) -> None:
+        # called with the lock held
+        while self._waiters and self.in_use + self._waiters[0].cost <= self.limit:
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.in_use += waiter.cost
+            self.admitted += 1
+            waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+
+    async def acquire(self, cost: int) -> None:
+        if cost > self.limit:
+            with self._lock:
+                self.rejected += 1
+            raise AdmissionRejected(
+                f"Request needs about {cost // 2**20} MB, "
+                f"more than the {self.limit // 2**20} MB available"
+            )
+
+        with self._lock:
+            if not self._waiters and self.in_use + cost <= self.limit:
+                self.in_use += cost
+                self.admitted += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected("Server is busy", self.retry_after)
+            waiter = _Waiter(cost, asyncio.get_running_loop())
+            self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            with self._lock:
+                if waiter.granted:
+                    if isinstance(exc, asyncio.TimeoutError):
+                        # granted just as the wait timed out
+                        return
+                    self.in_use -= cost
+                else:
+                    self._waiters.remove(waiter)
+                    self.rejected += 1
+                self._grant_waiting()
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            raise AdmissionRejected("Server is busy", self.retry_after)
+
+    def release(self, cost: int) -> None:
+        with self._lock:
+            self.in_use -= cost
+            self._grant_waiting()
+
+# ASGI scope key under which the middleware collects a request's reservations
+RESERVATIONS_KEY = "memory_reservations"
+
+class AdmissionMiddleware:
+    """
+    Keep memory reserved by a request until its response has been sent.
+    Outputs (BytesIO, ZIP archives) are counted in the cost estimate and
+    stay alive while a StreamingResponse sends them, so releasing when
+    the work finishes would let concurrent downloads overrun the budget.
+    Endpoints append their reserved costs to scope[RESERVATIONS_KEY].
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        reservations = scope[RESERVATIONS_KEY] = []
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            for cost in reservations:
+                memory_budget.release(cost)
+
+def _default_limit() -> int:
+    """Half of the memory available to this process (cgroup limit or RAM)."""
+    total = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            value = f.read().strip()
+        if value != "max":
+            total = min(total, int(value))
+    except (OSError, ValueError):
+        pass
+    return total // 2
+
+memory_budget = MemoryBudget(
+    settings.ADMISSION_MEMORY_BUDGET or _default_limit(),
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    retry_after=settings.ADMISSION_RETRY_AFTER,
+)
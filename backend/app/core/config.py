@@ -14,6 +14,92 @@ class Settings(BaseSettings):
 
     API_PREFIX: str = "/api/v1"
 
+    # geolokácia IP adries v histórii (URL so zástupným {ip})
+    GEO_ENDPOINT: str = "https://ipapi.co/{ip}/json/"
+
+    # fulltextový index extrahovaného textu (SQLite FTS5)
+    SEARCH_INDEX_PATH: str = "search_index.db"
+
+    # PDF backend: pypdf | pymupdf | auto (podľa výsledkov benchmarkov)
+    PDF_ENGINE: str = "pypdf"
+    PDF_ENGINE_BENCHMARKS: Optional[str] = None
+    # zmenšenie výstupných PDF: off | fast | max (požiadavka ho môže zmeniť)
+    PDF_OPTIMIZE: str = "fast"
+
+    # adresár dočasných súborov s výstupmi (prázdne = systémový temp)
+    OUTPUT_DIR: Optional[str] = None
+
+    # kontrola nahraných PDF pred spracovaním (limity; strana v bodoch)
+    PREFLIGHT_MAX_BYTES: int = 512 * 1024 * 1024
+    PREFLIGHT_MAX_PAGES: int = 10000
+    PREFLIGHT_MAX_PAGE_SIZE: float = 14400
+    PREFLIGHT_MAX_OBJECTS: int = 1000000
+    PREFLIGHT_MAX_STREAM_BYTES: int = 1024 * 1024 * 1024
+    # odmietnuť aj PDF, ktoré engine vie opraviť (poškodená tabuľka xref)
+    PREFLIGHT_STRICT: bool = False
+
+    # obnoviteľné nahrávanie veľkých PDF po častiach (TTL v sekundách)
+    UPLOAD_DIR: str = "uploads"
+    UPLOAD_TTL: int = 24 * 3600
+    # kvóta jedného používateľa: počet nahrávaní do vymazania/vypršania a ich ohlásené bajty
+    UPLOAD_MAX_PER_USER: int = 20
+    UPLOAD_MAX_BYTES_PER_USER: int = 4 * 1024 * 1024 * 1024
+
+    # dávkové spracovanie (prázdne BATCH_CONCURRENCY = počet procesov kompresie;
+    # súbežnosť obmedzuje aj limit používateľa v plánovači, SCHEDULER_USER_LIMIT)
+    BATCH_MAX_FILES: int = 500
+    BATCH_CONCURRENCY: Optional[int] = None
+    # koľkokrát sa súbor odmietnutý pre vyťaženie (503) skúsi znova po Retry-After
+    BATCH_BUSY_RETRIES: int = 10
+
+    # LRU cache náhľadov strán (v bajtoch)
+    THUMBNAIL_CACHE_BYTES: int = 64 * 1024 * 1024
+
+    # pamäťový rozpočet ťažkých operácií (v bajtoch, prázdne = polovica RAM)
+    ADMISSION_MEMORY_BUDGET: Optional[int] = None
+    ADMISSION_MAX_QUEUE: int = 64
+    ADMISSION_QUEUE_TIMEOUT: float = 30.0
+    ADMISSION_RETRY_AFTER: int = 5
+
+    # férové plánovanie úloh (prázdne SCHEDULER_WORKERS = počet CPU)
+    SCHEDULER_WORKERS: Optional[int] = None
+    # súbežné úlohy jedného používateľa na celom serveri (delí sa medzi workery, aspoň 1)
+    SCHEDULER_USER_LIMIT: int = 2
+    SCHEDULER_FRONTEND_WEIGHT: float = 8.0
+    SCHEDULER_API_WEIGHT: float = 1.0
+    SCHEDULER_MAX_QUEUE: int = 256
+    SCHEDULER_QUEUE_TIMEOUT: float = 60.0
+
+    # výsledky požiadaviek s hlavičkou Idempotency-Key (TTL v sekundách)
+    IDEMPOTENCY_TTL: int = 3600
+    IDEMPOTENCY_MAX_ENTRIES: int = 1024
+    # záznamy kľúčov spoločné pre workery (prázdne = OUTPUT_DIR/idempotency)
+    IDEMPOTENCY_DIR: Optional[str] = None
+
+    # profily PDF operácií na požiadanie (hlavička X-Profile, len admin)
+    PROFILE_DIR: str = "profiles"
+    PROFILE_SAMPLE_INTERVAL: float = 0.005
+    PROFILE_TRACE_FRAMES: int = 1
+
+    # produkčný server: gunicorn + uvicorn workery (prázdne SERVER_WORKERS = počet CPU,
+    # SERVER_MAX_RSS v bajtoch, prázdne = bez limitu)
+    SERVER_BIND: str = "0.0.0.0:8000"
+    SERVER_WORKERS: Optional[int] = None
+    SERVER_PRELOAD: bool = True
+    SERVER_MAX_REQUESTS: int = 2000
+    SERVER_MAX_REQUESTS_JITTER: int = 200
+    SERVER_MAX_RSS: Optional[int] = None
+    SERVER_RSS_CHECK_INTERVAL: float = 15.0
+    SERVER_KEEPALIVE: int = 5
+    SERVER_BACKLOG: int = 2048
+    SERVER_TIMEOUT: int = 120
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+
+    # spoločné metriky workerov (prázdne = gunicorn použije adresár v systémovom temp)
+    METRICS_DIR: Optional[str] = None
+    METRICS_WRITE_INTERVAL: float = 5.0
+
     model_config = SettingsConfigDict(
         env_file=".env",
         extra="ignore"
@@ -0,0 +1,52 @@
+# uvicorn worker pre gunicorn (importuje sa len v produkčnom režime)
+import logging
+
+from gunicorn.arbiter import Arbiter
+from uvicorn.server import Server
+from uvicorn_worker import UvicornWorker
+
+from app.core.config import settings
+from app.core.server import resident_memory
+
+log = logging.getLogger(__name__)
+
+class PdfServiceWorker(UvicornWorker):
+    """
+    Uvicorn worker that drains in-flight requests for up to
+    graceful_timeout on shutdown and recycles itself once its resident
+    memory exceeds SERVER_MAX_RSS. Fragmentation left behind by
+    PyMuPDF and Pillow is never returned to the OS, so the only cure
+    is a new process; the master forks a replacement as soon as this
+    one has exited.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.server = None
+        self.config.timeout_graceful_shutdown = self.cfg.graceful_timeout
+        if settings.SERVER_MAX_RSS:
+            # callback_notify doubles as the memory check
+            self.config.timeout_notify = min(
+                self.config.timeout_notify, settings.SERVER_RSS_CHECK_INTERVAL
+            )
+
+    async def _serve(self) -> None:
+        # same as UvicornWorker._serve, but keeps the server for callback_notify
+        self.config.app = self.wsgi
+        self.server = Server(config=self.config)
+        self._install_sigquit_handler()
+        await self.server.serve(sockets=self.sockets)
+        if not self.server.started:
+            raise SystemExit(Arbiter.WORKER_BOOT_ERROR)
+
+    async def callback_notify(self) -> None:
+        self.notify()
+        limit = settings.SERVER_MAX_RSS
+        if limit and self.server is not None and not self.server.should_exit:
+            rss = resident_memory()
+            if rss > limit:
+                log.warning(
+                    "Worker %s uses %d MB (limit %d MB), recycling",
+                    self.pid, rss // 2**20, limit // 2**20,
+                )
+                self.server.should_exit = True
@@ -0,0 +1,411 @@
+# opakované požiadavky s hlavičkou Idempotency-Key (bez externých závislostí)
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import jwt
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, JSONResponse
+
+from app.api.utils.output import output_file
+from app.core.config import settings
+from app.core.security import decode_access_token
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+_MAX_KEY_LENGTH = 255
+# regenerated for the replay or meaningless on it
+_SKIPPED_HEADERS = {b"content-length", b"date", b"server"}
+
+Key = Tuple[str, str, str]
+
+# a keyed request still running; a failed one leaves no record
+_PENDING = ""
+
+class _Entry:
+    """The record of one keyed request, as last read from its file."""
+
+    __slots__ = ("file", "record")
+
+    def __init__(self, file: str, record: dict):
+        self.file = file
+        self.record = record
+
+    @property
+    def path(self) -> Optional[str]:
+        return self.record["path"]
+
+    @property
+    def status(self) -> int:
+        return self.record["status"]
+
+    @property
+    def headers(self) -> List[Tuple[bytes, bytes]]:
+        return [(k.encode("latin-1"), v.encode("latin-1")) for k, v in self.record["headers"]]
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _read(file: str) -> Optional[dict]:
+    try:
+        with open(file, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _write(file: str, record: dict) -> None:
+    tmp = f"{file}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+    os.replace(tmp, file)
+
+class IdempotencyStore:
+    """
+    Responses of keyed requests, kept on disk for `ttl` seconds after
+    they complete. Every key has a JSON record in `directory`
+    (IDEMPOTENCY_DIR, by default under OUTPUT_DIR) that all server
+    workers on the host share under a file lock, so a retry finds the
+    result whichever worker it reaches and concurrent duplicates run
+    the request once. A duplicate polls the record until the first
+    request is done; a record left running by a worker that died is
+    dropped, and the next retry runs the request again.
+    """
+
+    POLL_INTERVAL = 0.05
+    PRUNE_INTERVAL = 1.0
+
+    def __init__(self, ttl: float, max_entries: int, directory: Optional[str] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.replayed = 0
+        self._directory = directory
+        self._pruned = 0.0
+
+    @property
+    def directory(self) -> str:
+        return self._directory or settings.IDEMPOTENCY_DIR or os.path.join(
+            settings.OUTPUT_DIR or tempfile.gettempdir(), "idempotency"
+        )
+
+    def __len__(self) -> int:
+        try:
+            return sum(name.endswith(".json") for name in os.listdir(self.directory))
+        except FileNotFoundError:
+            return 0
+
+    def _file(self, key: Key) -> str:
+        name = hashlib.sha256("\0".join(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _expired(self, record: dict, now: float) -> bool:
+        if record["done"]:
+            return record["expires"] <= now
+        return not _alive(record["pid"])
+
+    def claim(self, key: Key) -> Tuple[_Entry, bool]:
+        """
+        The entry of `key` and whether this request is the first with it,
+        in which case it is recorded as running and must be processed.
+        """
+        if time.monotonic() - self._pruned >= self.PRUNE_INTERVAL:
+            self._prune()
+        file = self._file(key)
+        with self._locked():
+            record = _read(file)
+            if record is not None and not self._expired(record, time.time()):
+                return _Entry(file, record), False
+            if record is not None:
+                _unlink(record["path"])
+            record = {
+                "pid": os.getpid(), "fingerprint": _PENDING, "done": False,
+                "status": 0, "headers": [], "path": None, "expires": 0.0,
+            }
+            _write(file, record)
+        return _Entry(file, record), True
+
+    def set_fingerprint(self, entry: _Entry, fingerprint: str) -> None:
+        # only the first request writes its running record, no lock needed
+        entry.record["fingerprint"] = fingerprint
+        _write(entry.file, entry.record)
+
+    def finish(
+        self,
+        entry: _Entry,
+        status: int,
+        headers: List[Tuple[bytes, bytes]],
+        path: Optional[str],
+    ) -> None:
+        if path is None:
+            # not replayable: the next retry runs the request again
+            with self._locked():
+                _unlink(entry.file)
+            return
+        entry.record.update(
+            done=True,
+            status=status,
+            headers=[(k.decode("latin-1"), v.decode("latin-1")) for k, v in headers],
+            path=path,
+            expires=time.time() + self.ttl,
+        )
+        _write(entry.file, entry.record)
+
+    async def wait(self, entry: _Entry, done: bool) -> Optional[_Entry]:
+        """
+        Poll a record until its fingerprint is known, or with `done`
+        until the request has finished. None when it failed.
+        """
+        while True:
+            record = _read(entry.file)
+            if record is None or (not record["done"] and not _alive(record["pid"])):
+                return None
+            if record["done"] or (not done and record["fingerprint"] != _PENDING):
+                return _Entry(entry.file, record)
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    def _prune(self) -> None:
+        self._pruned = time.monotonic()
+        now = time.time()
+        with self._locked():
+            completed = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                file = os.path.join(self.directory, name)
+                record = _read(file)
+                if record is None:
+                    continue
+                if self._expired(record, now):
+                    _unlink(record["path"])
+                    _unlink(file)
+                elif record["done"]:
+                    completed.append((record["expires"], file, record["path"]))
+            # over the limit the responses expiring first go
+            completed.sort()
+            for _, file, path in completed[:max(0, len(completed) - self.max_entries)]:
+                _unlink(path)
+                _unlink(file)
+
+    def clear(self) -> None:
+        """Drop the records of requests this process is still running."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        pid = os.getpid()
+        with self._locked():
+            for name in names:
+                file = os.path.join(self.directory, name)
+                record = _read(file) if name.endswith(".json") else None
+                if record is not None and not record["done"] and record["pid"] == pid:
+                    _unlink(file)
+
+def _unlink(path: Optional[str]) -> None:
+    if path is None:
+        return
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+idempotency_store = IdempotencyStore(settings.IDEMPOTENCY_TTL, settings.IDEMPOTENCY_MAX_ENTRIES)
+
+def _subject(headers: Dict[bytes, bytes]) -> Optional[str]:
+    scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return str(decode_access_token(token).get("sub") or "") or None
+    except jwt.PyJWTError:
+        return None
+
+class _Fingerprint:
+    """
+    SHA-256 of a request's query and body. The multipart boundary is left
+    out: clients pick a new random one when they rebuild a form for a
+    retry, though the submitted fields and files are the same.
+    """
+
+    def __init__(self, scope):
+        self._digest = hashlib.sha256(scope.get("query_string", b""))
+        content_type = dict(scope["headers"]).get(b"content-type", b"")
+        _, _, boundary = content_type.partition(b"boundary=")
+        self._boundary = boundary.split(b";")[0].strip(b'" ')
+        self._carry = b""
+
+    def update(self, data: bytes) -> None:
+        if not self._boundary:
+            self._digest.update(data)
+            return
+        data = (self._carry + data).replace(self._boundary, b"")
+        # a boundary split between two chunks is completed by the next one
+        keep = len(self._boundary) - 1
+        self._digest.update(data[:-keep] if keep else data)
+        self._carry = data[-keep:] if keep else b""
+
+    def hexdigest(self) -> str:
+        self._digest.update(self._carry)
+        self._carry = b""
+        return self._digest.hexdigest()
+
+def _cacheable(status: int) -> bool:
+    # overload and server errors are worth retrying for real
+    return status < 500 and status not in (408, 429)
+
+class IdempotencyMiddleware:
+    """
+    Deduplicate retried POSTs to the PDF endpoints that carry an
+    Idempotency-Key header. Keys are scoped to the authenticated user and
+    the path. A duplicate that arrives while the first request is still
+    running, on this worker or another, waits for it; one arriving later gets the stored response,
+    marked with Idempotent-Replayed, for IDEMPOTENCY_TTL seconds. Either
+    way the operation is not run again and no second history entry is
+    written. Reusing a key for a different body or query is a 422.
+
+    Queries and bodies are fingerprinted as they stream in. Responses
+    are copied to a file as they are sent; a FileResponse sent with the
+    pathsend extension is hard-linked instead of copied.
+    """
+
+    def __init__(self, app, store: IdempotencyStore = idempotency_store):
+        self.app = app
+        self.store = store
+        self.prefix = f"{settings.API_PREFIX}/pdf/"
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith(self.prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        value = headers.get(IDEMPOTENCY_HEADER)
+        subject = _subject(headers) if value else None
+        if subject is None:
+            await self.app(scope, receive, send)
+            return
+        if len(value) > _MAX_KEY_LENGTH:
+            await JSONResponse(
+                {"detail": "Idempotency-Key is too long"}, status_code=400
+            )(scope, receive, send)
+            return
+
+        key = (subject, scope["path"], value.decode("latin-1"))
+        entry, first = self.store.claim(key)
+        if first:
+            await self._first(entry, scope, receive, send)
+        else:
+            await self._duplicate(entry, scope, receive, send)
+
+    async def _first(self, entry: _Entry, scope, receive, send) -> None:
+        digest = _Fingerprint(scope)
+        cache = None
+        linked: Optional[str] = None
+        complete = False
+        hashed = False
+        status = 0
+        headers: List[Tuple[bytes, bytes]] = []
+
+        async def hashing_receive():
+            nonlocal hashed
+            message = await receive()
+            if message["type"] == "http.request":
+                digest.update(message.get("body", b""))
+                if not message.get("more_body", False) and not hashed:
+                    hashed = True
+                    self.store.set_fingerprint(entry, digest.hexdigest())
+            return message
+
+        async def recording_send(message):
+            nonlocal cache, linked, complete, status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [
+                    (k, v) for k, v in message.get("headers", []) if k not in _SKIPPED_HEADERS
+                ]
+                if _cacheable(status):
+                    cache = output_file(".replay")
+            elif cache is not None and message["type"] == "http.response.body":
+                if message.get("body"):
+                    await run_in_threadpool(cache.write, message["body"])
+                complete = not message.get("more_body", False)
+            elif cache is not None and message["type"] == "http.response.pathsend":
+                # the output file is deleted after sending; keep a second name
+                cache.close()
+                os.unlink(cache.name)
+                linked = cache.name
+                os.link(message["path"], linked)
+                cache = None
+                complete = True
+            await send(message)
+
+        path = None
+        try:
+            await self.app(scope, hashing_receive, recording_send)
+            if complete:
+                # a response cut short by a disconnect is not replayed
+                path = linked or cache.name
+                if cache is not None:
+                    cache.close()
+        finally:
+            if path is None:
+                if cache is not None:
+                    cache.close()
+                    _unlink(cache.name)
+                _unlink(linked)
+            self.store.finish(entry, status, headers, path)
+
+    async def _duplicate(self, entry: _Entry, scope, receive, send) -> None:
+        digest = _Fingerprint(scope)
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            digest.update(message.get("body", b""))
+            more_body = message.get("more_body", False)
+
+        original = await self.store.wait(entry, done=False)
+        if original is not None and original.record["fingerprint"] != digest.hexdigest():
+            await JSONResponse(
+                {"detail": "Idempotency-Key was already used for a different request"},
+                status_code=422,
+            )(scope, receive, send)
+            return
+        entry = await self.store.wait(entry, done=True) if original is not None else None
+        if entry is None:
+            await JSONResponse(
+                {"detail": "The original request with this Idempotency-Key failed; retry"},
+                status_code=409,
+                headers={"Retry-After": "1"},
+            )(scope, receive, send)
+            return
+
+        self.store.replayed += 1
+        response = FileResponse(entry.path, status_code=entry.status)
+        # Content-Length is added from the file when the response is sent
+        response.raw_headers = entry.headers + [(REPLAYED_HEADER.lower().encode(), b"true")]
+        await response(scope, receive, send)
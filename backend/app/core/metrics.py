@@ -0,0 +1,446 @@
+# metriky v Prometheus textovom formáte (bez externých závislostí)
+import asyncio
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+LabelValues = Tuple[str, ...]
+
+# latency buckets in seconds, from cached thumbnails to large conversions
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+# payload sizes in bytes, 1 KiB … 1 GiB
+SIZE_BUCKETS = tuple(2 ** exp for exp in range(10, 31, 2))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+    def dump(self) -> List[list]:
+        """Samples as JSON-friendly lists, for SharedMetrics."""
+        raise NotImplementedError
+
+    def load(self, samples: List[list]) -> None:
+        """Add samples written by dump() to this metric."""
+        raise NotImplementedError
+
+    def empty(self) -> "_Metric":
+        return type(self)(self.name, self.documentation, self.label_names)
+
+class _ValueMetric(_Metric):
+    def __init__(
+        self,
+        name,
+        documentation,
+        labels=(),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+        self._values: Dict[LabelValues, float] = {}
+
+    def _items(self) -> List[Tuple[LabelValues, float]]:
+        if self.callback is not None:
+            return sorted(self.callback().items())
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(v)}"
+            for key, v in self._items()
+        ]
+
+    def dump(self) -> List[list]:
+        return [[list(key), value] for key, value in self._items()]
+
+    def load(self, samples: List[list]) -> None:
+        with self._lock:
+            for key, value in samples:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0) + value
+
+class Counter(_ValueMetric):
+    """
+    A monotonically increasing value, incremented by the code or read
+    from `callback` at scrape time (see Gauge) when the count is already
+    kept elsewhere. Counter names end in _total.
+    """
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        values = self.callback() if self.callback is not None else self._values
+        return values.get(self._key(labels), 0)
+
+class Gauge(_ValueMetric):
+    """
+    A value set by the code, or read from `callback` at scrape time.
+    The callback returns {label values: value}, so gauges of existing
+    counters (cache size, pool usage) cost nothing between scrapes.
+    """
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class _HistogramData:
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+class Histogram(_Metric):
+    """
+    Cumulative histogram with fixed buckets. An observation is one
+    bisect and three additions under a lock; buckets are made cumulative
+    only when rendered.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.bounds = tuple(sorted(buckets))
+        self._data: Dict[LabelValues, _HistogramData] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            data = self._data.get(key)
+            if data is None:
+                data = self._data[key] = _HistogramData(len(self.bounds) + 1)
+            data.buckets[idx] += 1
+            data.count += 1
+            data.sum += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        data = self._data.get(self._key(labels))
+        return data.count if data else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (key, list(d.buckets), d.count, d.sum) for key, d in self._data.items()
+            )
+        lines = []
+        for key, buckets, count, total in items:
+            cumulative = 0
+            for bound, n in zip(self.bounds + (float("inf"),), buckets):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_count{labels} {count}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        return lines
+
+    def dump(self) -> List[list]:
+        with self._lock:
+            return [
+                [list(key), list(d.buckets), d.count, d.sum]
+                for key, d in sorted(self._data.items())
+            ]
+
+    def load(self, samples: List[list]) -> None:
+        with self._lock:
+            for key, buckets, count, total in samples:
+                key = tuple(key)
+                data = self._data.get(key)
+                if data is None:
+                    data = self._data[key] = _HistogramData(len(self.bounds) + 1)
+                data.buckets = [a + b for a, b in zip(data.buckets, buckets)]
+                data.count += count
+                data.sum += total
+
+    def empty(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, self.label_names, self.bounds)
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = (), callback=None) -> Counter:
+        return self.register(Counter(name, documentation, labels, callback))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labels, callback))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            samples = metric.render()
+            if samples:
+                lines += metric.header() + samples
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, List[list]]:
+        return {name: metric.dump() for name, metric in self._metrics.items()}
+
+    def empty(self) -> "Registry":
+        """The same metrics without any samples or callbacks."""
+        copy = Registry()
+        for metric in self._metrics.values():
+            copy.register(metric.empty())
+        return copy
+
+class SharedMetrics:
+    """
+    Metrics of all workers of a gunicorn server. Every worker writes a
+    snapshot of its registry to `directory` (every
+    METRICS_WRITE_INTERVAL seconds and before answering a scrape) and a
+    scrape adds up the snapshots of all workers, so /metrics reports the
+    whole server whichever worker answers. Counters and histograms of
+    exited workers are folded into retired.json by the master, so totals
+    do not drop when a worker is recycled; gauges (memory, queues, pool
+    connections) are the sum over the live workers.
+    """
+
+    RETIRED = "retired.json"
+
+    def __init__(self, registry: "Registry", directory: str, pid: Optional[int] = None):
+        self.registry = registry
+        self.directory = directory
+        self.pid = pid or os.getpid()
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"{pid}.json")
+
+    @contextmanager
+    def _locked(self, mode: int):
+        with open(os.path.join(self.directory, ".lock"), "a+") as lock:
+            fcntl.flock(lock, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self, path: str) -> Dict[str, List[list]]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, path: str, data: Any) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def write(self) -> None:
+        """Replace this worker's snapshot."""
+        self._write(self._path(self.pid), self.registry.snapshot())
+
+    def retire(self, pid: int) -> None:
+        """Fold the last snapshot of an exited worker into retired.json."""
+        path = self._path(pid)
+        with self._locked(fcntl.LOCK_EX):
+            snapshot = self._read(path)
+            if not snapshot:
+                return
+            retired = self.registry.empty()
+            retired_path = os.path.join(self.directory, self.RETIRED)
+            for data in (self._read(retired_path), snapshot):
+                self._load(retired, data, gauges=False)
+            self._write(retired_path, retired.snapshot())
+            os.unlink(path)
+
+    @staticmethod
+    def _load(target: "Registry", snapshot: Dict[str, List[list]], gauges: bool) -> None:
+        for name, samples in snapshot.items():
+            metric = target._metrics.get(name)
+            if metric is not None and (gauges or metric.kind != "gauge"):
+                metric.load(samples)
+
+    def render(self) -> str:
+        self.write()
+        total = self.registry.empty()
+        with self._locked(fcntl.LOCK_SH):
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                snapshot = self._read(os.path.join(self.directory, name))
+                self._load(total, snapshot, gauges=name != self.RETIRED)
+        return total.render()
+
+registry = Registry()
+
+_shared: Dict[Tuple[str, int], SharedMetrics] = {}
+
+def shared_metrics() -> Optional[SharedMetrics]:
+    """SharedMetrics of this worker when METRICS_DIR is set (gunicorn), else None."""
+    directory = settings.METRICS_DIR
+    if not directory:
+        return None
+    key = (directory, os.getpid())
+    if key not in _shared:
+        _shared[key] = SharedMetrics(registry, directory)
+    return _shared[key]
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of the response",
+    ("method", "route", "status"),
+)
+REQUEST_BYTES = registry.counter(
+    "http_request_bytes_total", "Request body bytes received", ("route",)
+)
+RESPONSE_BYTES = registry.counter(
+    "http_response_bytes_total", "Response body bytes sent", ("route",)
+)
+OPERATION_PHASE = registry.histogram(
+    "pdf_operation_phase_seconds",
+    "Time spent in one phase (upload, preflight, queue, process, optimize, serialize) of a PDF operation",
+    ("operation", "phase"),
+)
+OPERATION_INPUT_BYTES = registry.histogram(
+    "pdf_operation_input_bytes",
+    "Size of the input of a PDF operation",
+    ("operation",),
+    buckets=SIZE_BUCKETS,
+)
+PAGES_PROCESSED = registry.counter(
+    "pdf_pages_processed_total", "Pages processed by PDF operations", ("operation",)
+)
+EVENT_LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds",
+    "Delay of a periodic timer on the event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+def _route_name(scope) -> str:
+    # the route template keeps the label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    """
+    Record latency, status and body sizes of every HTTP request. The
+    latency includes sending a streamed response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        received = 0
+        sent = 0
+        status = "500"
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal sent, status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            route = _route_name(scope)
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                method=scope["method"], route=route, status=status,
+            )
+            REQUEST_BYTES.inc(received, route=route)
+            RESPONSE_BYTES.inc(sent, route=route)
+
+async def monitor_event_loop(interval: float = 0.5) -> None:
+    """Sample how late a timer fires; runs until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - started - interval))
+
+async def write_shared_metrics(shared: SharedMetrics, interval: float) -> None:
+    """Write this worker's snapshot periodically; runs until cancelled."""
+    try:
+        while True:
+            shared.write()
+            await asyncio.sleep(interval)
+    finally:
+        # the last snapshot is what the master retires
+        shared.write()
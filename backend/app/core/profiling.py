@@ -0,0 +1,152 @@
+# profilovanie jednotlivých PDF operácií na požiadanie administrátora
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# request header an admin sets to profile one /pdf/* call
+PROFILE_HEADER = "X-Profile"
+
+PROFILE_FILE = "profile.folded"
+MEMORY_FILE = "memory.txt"
+PARAMS_FILE = "params.json"
+
+# tracemalloc and the stack sampler are process-wide, so profiled calls
+# run one at a time
+_profile_lock = threading.Lock()
+
+class StackSampler:
+    """
+    Sampling profiler of one thread. A daemon thread reads the target's
+    current frame every `interval` seconds and counts whole stacks; the
+    result is in the collapsed format ("outer;inner count") read by
+    flamegraph.pl, speedscope and similar tools.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+def _describe(value):
+    # uploads are recorded by size; the file itself is not stored
+    if isinstance(value, (bytes, bytearray)):
+        return {"bytes": len(value)}
+    if isinstance(value, (list, tuple)):
+        return [_describe(v) for v in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)
+
+def _memory_report(snapshot: tracemalloc.Snapshot, peak: int, limit: int = 25) -> str:
+    lines = [f"peak traced memory: {peak} bytes", "", "largest allocations by line:"]
+    for stat in snapshot.statistics("lineno")[:limit]:
+        lines.append(str(stat))
+    return "\n".join(lines) + "\n"
+
+def profile_call(operation: str, user_id: int, func, *args, **kwargs) -> Tuple[object, str]:
+    """
+    Run `func` under the stack sampler and tracemalloc and store the
+    collapsed profile, the allocation report and the call parameters in
+    PROFILE_DIR/<id>/. Returns the result and the profile id.
+
+    Work handed to the compression process pool is not sampled; its time
+    shows up as waiting on the pool.
+    """
+    profile_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+    directory = os.path.join(settings.PROFILE_DIR, profile_id)
+
+    with _profile_lock:
+        started = time.perf_counter()
+        # keep tracing that someone else started (e.g. python -X tracemalloc)
+        was_tracing = tracemalloc.is_tracing()
+        if was_tracing:
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start(settings.PROFILE_TRACE_FRAMES)
+        try:
+            with StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL) as sampler:
+                result = func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+        seconds = time.perf_counter() - started
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, PROFILE_FILE), "w") as f:
+        f.write(sampler.collapsed())
+    with open(os.path.join(directory, MEMORY_FILE), "w") as f:
+        f.write(_memory_report(snapshot, peak))
+    with open(os.path.join(directory, PARAMS_FILE), "w") as f:
+        json.dump(
+            {
+                "id": profile_id,
+                "operation": operation,
+                "user_id": user_id,
+                "function": f"{func.__module__}.{func.__qualname__}",
+                "args": _describe(args),
+                "kwargs": {k: _describe(v) for k, v in kwargs.items()},
+                "seconds": seconds,
+                "peak_bytes": peak,
+                "samples": sum(sampler.stacks.values()),
+            },
+            f,
+            indent=2,
+        )
+    return result, profile_id
+
+def list_profiles() -> List[Dict]:
+    """Parameters of the stored profiles, newest first."""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(settings.PROFILE_DIR), reverse=True):
+        try:
+            with open(os.path.join(settings.PROFILE_DIR, name, PARAMS_FILE)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+def profile_path(profile_id: str, filename: str) -> Optional[str]:
+    if filename not in (PROFILE_FILE, MEMORY_FILE, PARAMS_FILE):
+        return None
+    if os.path.basename(profile_id) != profile_id or profile_id.startswith("."):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, profile_id, filename)
+    return path if os.path.isfile(path) else None
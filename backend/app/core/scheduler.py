@@ -0,0 +1,216 @@
+# spravodlivé plánovanie ťažkých PDF úloh medzi používateľmi
+import asyncio
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from app.core.admission import AdmissionRejected
+from app.core.config import settings
+
+class _Job:
+    __slots__ = ("user_id", "source", "finish", "loop", "future", "granted", "enqueued")
+
+    def __init__(self, user_id: int, source: str, finish: float, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.source = source
+        self.finish = finish
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+        self.enqueued = time.monotonic()
+
+class UserUsage:
+    """Per-user counters, reported as metrics."""
+
+    __slots__ = ("running", "queued", "completed", "busy_seconds", "last_finish")
+
+    def __init__(self):
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.busy_seconds = 0.0
+        # virtual finish tag of the user's latest job
+        self.last_finish = 0.0
+
+class WaitStats:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+class FairScheduler:
+    """
+    Weighted fair queuing of CPU-heavy jobs across users.
+
+    At most `workers` jobs run at once and at most `user_limit` per user.
+    Every job gets a virtual finish tag of
+    max(virtual time, user's previous tag) + cost / weight; a free slot
+    goes to the queued job with the smallest tag whose user is below the
+    cap. A user submitting hundreds of jobs therefore only delays others
+    by their fair share, and frontend jobs, weighted higher, overtake
+    queued API batches. Like the memory budget, the queue is bounded in
+    length and waiting time; jobs beyond either raise AdmissionRejected.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        user_limit: int = 2,
+        weights: Optional[Dict[str, float]] = None,
+        max_queue: int = 256,
+        queue_timeout: float = 60.0,
+        retry_after: int = 5,
+    ):
+        self.workers = workers
+        self.user_limit = user_limit
+        self.weights = weights or {}
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.running = 0
+        self.rejected = 0
+        self.virtual_time = 0.0
+        self.users: Dict[int, UserUsage] = defaultdict(UserUsage)
+        self.wait: Dict[str, WaitStats] = defaultdict(WaitStats)
+        self._queue: List[_Job] = []
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def _start(self, job: _Job) -> None:
+        # called with the lock held
+        usage = self.users[job.user_id]
+        usage.running += 1
+        self.running += 1
+        self.virtual_time = max(self.virtual_time, job.finish)
+        self.wait[job.source].observe(time.monotonic() - job.enqueued)
+
+    def _dispatch(self) -> None:
+        # called with the lock held
+        while self._queue and self.running < self.workers:
+            eligible = [
+                job for job in self._queue
+                if self.users[job.user_id].running < self.user_limit
+            ]
+            if not eligible:
+                return
+            job = min(eligible, key=lambda j: j.finish)
+            self._queue.remove(job)
+            self.users[job.user_id].queued -= 1
+            job.granted = True
+            self._start(job)
+            job.loop.call_soon_threadsafe(_wake, job.future)
+
+    async def acquire(self, user_id: int, source: str, cost: float) -> None:
+        weight = self.weights.get(source, 1.0)
+        with self._lock:
+            usage = self.users[user_id]
+            finish = max(self.virtual_time, usage.last_finish) + cost / weight
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected("Server is busy", self.retry_after)
+            usage.last_finish = finish
+            job = _Job(user_id, source, finish, asyncio.get_running_loop())
+            usage.queued += 1
+            self._queue.append(job)
+            # the new job may be runnable right away even if others wait
+            # (e.g. their users are at the per-user cap)
+            self._dispatch()
+            if job.granted:
+                return
+
+        try:
+            await asyncio.wait_for(asyncio.shield(job.future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            with self._lock:
+                if job.granted:
+                    if isinstance(exc, asyncio.TimeoutError):
+                        # granted just as the wait timed out
+                        return
+                    self._finish(user_id, 0.0)
+                else:
+                    self._queue.remove(job)
+                    self.users[user_id].queued -= 1
+                    if isinstance(exc, asyncio.TimeoutError):
+                        self.rejected += 1
+                self._dispatch()
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            raise AdmissionRejected("Server is busy", self.retry_after)
+
+    def _finish(self, user_id: int, busy: float) -> None:
+        # called with the lock held
+        usage = self.users[user_id]
+        usage.running -= 1
+        usage.completed += 1
+        usage.busy_seconds += busy
+        self.running -= 1
+
+    def release(self, user_id: int, busy: float = 0.0) -> None:
+        with self._lock:
+            self._finish(user_id, busy)
+            self._dispatch()
+
+    def snapshot(self) -> Dict:
+        """Queue wait per source and usage per user."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self.running,
+                "queued": len(self._queue),
+                "rejected": self.rejected,
+                "wait_seconds": {
+                    source: {
+                        "count": w.count,
+                        "mean": w.total / w.count if w.count else 0.0,
+                        "max": w.max,
+                    }
+                    for source, w in self.wait.items()
+                },
+                "users": {
+                    user_id: {
+                        "running": u.running,
+                        "queued": u.queued,
+                        "completed": u.completed,
+                        "busy_seconds": u.busy_seconds,
+                    }
+                    for user_id, u in self.users.items()
+                },
+            }
+
+    @asynccontextmanager
+    async def slot(self, user_id: int, source: str, cost: float):
+        await self.acquire(user_id, source, cost)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(user_id, time.monotonic() - started)
+
+scheduler = FairScheduler(
+    settings.SCHEDULER_WORKERS or os.cpu_count() or 1,
+    user_limit=settings.SCHEDULER_USER_LIMIT,
+    weights={
+        "frontend": settings.SCHEDULER_FRONTEND_WEIGHT,
+        "api": settings.SCHEDULER_API_WEIGHT,
+    },
+    max_queue=settings.SCHEDULER_MAX_QUEUE,
+    queue_timeout=settings.SCHEDULER_QUEUE_TIMEOUT,
+    retry_after=settings.ADMISSION_RETRY_AFTER,
+)
@@ -0,0 +1,86 @@
+# produkčný režim: gunicorn master s predhriatou aplikáciou a uvicorn workermi
+import logging
+import os
+import tempfile
+from typing import Dict
+
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+def resident_memory() -> int:
+    """Resident set size of this process in bytes (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+def worker_count() -> int:
+    return settings.SERVER_WORKERS or os.cpu_count() or 1
+
+def gunicorn_options() -> Dict[str, object]:
+    """Gunicorn settings derived from the SERVER_* settings (see gunicorn.conf.py)."""
+    return {
+        "bind": [settings.SERVER_BIND],
+        "workers": worker_count(),
+        "worker_class": "app.core.gunicorn_worker.PdfServiceWorker",
+        "preload_app": settings.SERVER_PRELOAD,
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        "keepalive": settings.SERVER_KEEPALIVE,
+        "backlog": settings.SERVER_BACKLOG,
+        "timeout": settings.SERVER_TIMEOUT,
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT,
+        "forwarded_allow_ips": settings.SERVER_FORWARDED_ALLOW_IPS,
+    }
+
+def init_worker(workers: int) -> None:
+    """
+    Prepare a freshly forked worker. Pooled database connections
+    inherited from the master are dropped without closing them (they
+    belong to the master), and limits whose defaults are sized for the
+    whole machine are split between the workers, so N workers together
+    reserve no more memory, CPU slots or compression processes than one
+    process did. The per-user scheduler limit is meant for the whole
+    server too, so it is split as well, but never below one job.
+    """
+    from app.api.utils import compress
+    from app.core.admission import memory_budget
+    from app.core.scheduler import scheduler
+    from app.db.session import engine
+
+    engine.dispose(close=False)
+    if workers > 1:
+        if settings.ADMISSION_MEMORY_BUDGET is None:
+            memory_budget.limit //= workers
+        if settings.SCHEDULER_WORKERS is None:
+            scheduler.workers = max(1, scheduler.workers // workers)
+        scheduler.user_limit = max(1, scheduler.user_limit // workers)
+        compress.POOL_WORKERS = max(1, compress.POOL_WORKERS // workers)
+
+def prepare_metrics_dir() -> str:
+    """
+    Create the directory the workers share their metrics through (see
+    SharedMetrics) and empty it of snapshots left by an earlier run.
+    Called in the master before the first fork; the setting is also
+    exported for workers that load the application themselves.
+    """
+    directory = settings.METRICS_DIR or os.path.join(
+        tempfile.gettempdir(), f"pdf-service-metrics-{os.getpid()}"
+    )
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            os.unlink(os.path.join(directory, name))
+    settings.METRICS_DIR = directory
+    os.environ["METRICS_DIR"] = directory
+    return directory
+
+def retire_worker_metrics(pid: int) -> None:
+    """Keep the counters of an exited worker in the server's totals."""
+    from app.core.metrics import SharedMetrics, registry
+
+    if settings.METRICS_DIR:
+        SharedMetrics(registry, settings.METRICS_DIR).retire(pid)
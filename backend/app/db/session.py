@@ -11,9 +11,12 @@ engine = create_engine(
     connect_args={},
 )
 
+# objects stay loaded after commit: the current user is looked up once
+# per request and must not be re-read after the history entry is saved
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
+    expire_on_commit=False,
     bind=engine,
 )
 
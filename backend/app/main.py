@@ -5,11 +5,17 @@ from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 
+from app.core.admission import AdmissionMiddleware
 from app.core.config import settings
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.metrics import MetricsMiddleware
 from app.api.routers.auth import router as auth_router
 from app.api.routers.pdf import router as pdf_router
+from app.api.routers.uploads import router as uploads_router
 from app.api.routers.history import router as history_router
 from app.api.routers.utils import router as utils_router
+from app.api.routers.search import router as search_router
+from app.api.routers.metrics import router as metrics_router
 from app.startup import lifespan
 
 API_PREFIX = settings.API_PREFIX
@@ -35,10 +41,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# rezervácie pamäte sa uvoľnia až po odoslaní odpovede
+app.add_middleware(AdmissionMiddleware)
+
+# opakované požiadavky s Idempotency-Key dostanú uloženú odpoveď
+app.add_middleware(IdempotencyMiddleware)
+
+# latencia a objem dát každej požiadavky (vrátane odoslania odpovede)
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth_router,     prefix=API_PREFIX)
 app.include_router(pdf_router,      prefix=API_PREFIX)
+app.include_router(uploads_router,  prefix=API_PREFIX)
 app.include_router(history_router,  prefix=API_PREFIX)
 app.include_router(utils_router,    prefix=API_PREFIX)
+app.include_router(search_router,   prefix=API_PREFIX)
+app.include_router(metrics_router)
 
 @app.get(f"{API_PREFIX}/", tags=["health"])
 async def read_root():
@@ -0,0 +1,59 @@
+from typing import Annotated, Literal, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+
+
+class _Params(BaseModel):
+    # unknown (or internal) parameters are rejected, not ignored
+    model_config = ConfigDict(extra="forbid")
+
+
+class RemovePagesParams(_Params):
+    page_range: Optional[str] = None
+
+class AddTextWatermarkParams(_Params):
+    text: str = Field(..., min_length=1)
+    color_hex: str = Field("#888888", pattern=r"^#?[0-9A-Fa-f]{6}$")
+    font_size: int = Field(48, gt=0, le=1000)
+    opacity: float = Field(0.3, ge=0, le=1)
+    rotation: float = 45
+    position: Literal[
+        "topLeft", "topCenter", "topRight", "center",
+        "bottomLeft", "bottomCenter", "bottomRight",
+    ] = "center"
+
+class CompressParams(_Params):
+    remove_duplicates: bool = True
+    remove_images: bool = False
+    reduce_image_quality: Optional[int] = Field(None, ge=0, le=100)
+    profile: Optional[Literal["screen", "ebook", "print"]] = None
+
+class NUpParams(_Params):
+    cols: int = Field(4, ge=1, le=16)
+    rows: int = Field(4, ge=1, le=16)
+
+
+class RemovePagesStep(BaseModel):
+    op: Literal["remove_pages"]
+    params: RemovePagesParams = RemovePagesParams()
+
+class AddTextWatermarkStep(BaseModel):
+    op: Literal["add_text_watermark"]
+    params: AddTextWatermarkParams
+
+class CompressStep(BaseModel):
+    op: Literal["compress"]
+    params: CompressParams = CompressParams()
+
+class NUpStep(BaseModel):
+    op: Literal["n_up"]
+    params: NUpParams = NUpParams()
+
+PipelineStep = Annotated[
+    Union[RemovePagesStep, AddTextWatermarkStep, CompressStep, NUpStep],
+    Field(discriminator="op"),
+]
+
+PipelineSteps = TypeAdapter(list[PipelineStep])
+
+PipelineStepAdapter = TypeAdapter(PipelineStep)
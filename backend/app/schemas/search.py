@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+
+class SearchHit(BaseModel):
+    hash: str
+    filename: str | None
+    page: int
+    snippet: str
+    score: float
+
+class IndexResult(BaseModel):
+    hash: str
+    page_count: int
+    pages_indexed: int
@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+
+
+class UploadCreate(BaseModel):
+    filename: str | None = None
+    size: int = Field(..., gt=0, description="Total size of the file in bytes")
+
+class UploadFinalize(BaseModel):
+    sha256: str | None = Field(None, description="Expected SHA-256 (hex) of the whole file")
+
+class UploadStatus(BaseModel):
+    id: str
+    filename: str | None
+    size: int
+    received: int
+    missing: list[tuple[int, int]]
+    finalized: bool
+    sha256: str | None
+    page_count: int | None
@@ -7,13 +7,11 @@ import ipaddress
 import httpx
 import logging
 
+from app.core.config import settings
 from app.db.models.history import History
 from app.db.models.user import User
 
 log = logging.getLogger(__name__)
-log.setLevel(logging.INFO)
-
-GEO_ENDPOINT = "https://ipapi.co/{ip}/json/"
 
 PRIVATE_NETS = (
     ipaddress.ip_network("10.0.0.0/8"),
@@ -37,21 +35,21 @@ def _get_client_ip(request: Request) -> str | None:
             for ip in request.headers[header].split(","):
                 ip = ip.strip()
                 if _is_public(ip):
-                    logging.info("Selected client IP from header %s: %s", header, ip)
+                    log.debug("Selected client IP from header %s: %s", header, ip)
                     return ip
     host = request.client.host if request.client else ""
-    logging.info("Fallback client IP: %s", host)
+    log.debug("Fallback client IP: %s", host)
     return host if _is_public(host) else None
 
 
 @lru_cache(maxsize=1024)
 def _cached_geo(ip: str) -> Tuple[str | None, str | None]:
     try:
-        r = httpx.get(GEO_ENDPOINT.format(ip=ip), timeout=3.0)
+        r = httpx.get(settings.GEO_ENDPOINT.format(ip=ip), timeout=3.0)
         if r.status_code == 200:
             data = r.json()
             return data.get("city"), data.get("country_name")
-        log.warning("Geo API %s → %s – %s", GEO_ENDPOINT, r.status_code, r.text[:120])
+        log.warning("Geo API %s → %s – %s", settings.GEO_ENDPOINT, r.status_code, r.text[:120])
     except Exception as exc:  # pragma: no cover
         log.debug("Geo lookup failed: %s", exc)
     return None, None
@@ -0,0 +1,218 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Tuple
+import hashlib
+import logging
+import sqlite3
+import threading
+
+from app.core.config import settings
+from app.api.utils.extract_text import extract_page_texts
+
+log = logging.getLogger(__name__)
+
+SNIPPET_TOKENS = 12
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    hash        TEXT PRIMARY KEY,
+    filename    TEXT,
+    page_count  INTEGER NOT NULL,
+    indexed_at  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS document_owners (
+    hash        TEXT NOT NULL,
+    user_id     INTEGER NOT NULL,
+    filename    TEXT,
+    PRIMARY KEY (hash, user_id)
+);
+CREATE TABLE IF NOT EXISTS indexed_pages (
+    hash        TEXT NOT NULL,
+    page        INTEGER NOT NULL,
+    PRIMARY KEY (hash, page)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5(
+    hash UNINDEXED,
+    page UNINDEXED,
+    text,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+_schema_lock = threading.Lock()
+_schema_ready: set[str] = set()
+
+
+def document_hash(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+@contextmanager
+def _connect(path: str | None = None) -> Iterator[sqlite3.Connection]:
+    path = path or settings.SEARCH_INDEX_PATH
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        with _schema_lock:
+            if path not in _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _migrate(conn)
+                _schema_ready.add(path)
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    # indexes created before owners had their own filename
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(document_owners)")}
+    if "filename" not in columns:
+        conn.execute("ALTER TABLE document_owners ADD COLUMN filename TEXT")
+
+
+def _fts_query(query: str) -> str:
+    """
+    Turn free user input into a safe FTS5 expression: every whitespace
+    separated term is quoted (so operators and punctuation are literal)
+    and the terms are AND-ed together.
+    """
+    terms = [t.replace('"', '""') for t in query.split()]
+    return " ".join(f'"{t}"' for t in terms if t)
+
+
+def indexed_pages(doc_hash: str, path: str | None = None) -> set[int]:
+    with _connect(path) as conn:
+        rows = conn.execute(
+            "SELECT page FROM indexed_pages WHERE hash = ?", (doc_hash,)
+        ).fetchall()
+    return {r[0] for r in rows}
+
+
+def index_pages(
+        doc_hash: str,
+        filename: str | None,
+        page_count: int,
+        pages: Iterable[Tuple[int, str]],
+        user_id: int | None = None,
+        path: str | None = None,
+) -> int:
+    """
+    Store per-page text for a document. Pages that are already indexed
+    are skipped, so repeated extracts of the same file only add what is
+    new. Returns the number of newly indexed pages.
+    """
+    added = 0
+    with _connect(path) as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO documents (hash, filename, page_count, indexed_at) "
+            "VALUES (?, ?, ?, ?)",
+            (doc_hash, filename, page_count, datetime.now(timezone.utc).isoformat()),
+        )
+        if user_id is not None:
+            # every owner sees the name they uploaded the content under
+            conn.execute(
+                "INSERT INTO document_owners (hash, user_id, filename) VALUES (?, ?, ?) "
+                "ON CONFLICT (hash, user_id) DO UPDATE "
+                "SET filename = COALESCE(excluded.filename, filename)",
+                (doc_hash, user_id, filename),
+            )
+        for page, text in pages:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO indexed_pages (hash, page) VALUES (?, ?)",
+                (doc_hash, page),
+            )
+            if cur.rowcount:
+                conn.execute(
+                    "INSERT INTO page_text (hash, page, text) VALUES (?, ?, ?)",
+                    (doc_hash, page, text),
+                )
+                added += 1
+    if added:
+        log.info("Indexed %d page(s) of %s", added, doc_hash[:12])
+    return added
+
+
+def index_document(
+        pdf_bytes: bytes,
+        filename: str | None = None,
+        user_id: int | None = None,
+        path: str | None = None,
+) -> dict:
+    """
+    Index every page of a PDF. Only pages missing from the index are
+    extracted, so re-uploading a known document costs a hash and a lookup.
+    """
+    doc_hash = document_hash(pdf_bytes)
+    known = indexed_pages(doc_hash, path)
+    page_count = None
+    with _connect(path) as conn:
+        row = conn.execute(
+            "SELECT page_count FROM documents WHERE hash = ?", (doc_hash,)
+        ).fetchone()
+        if row:
+            page_count = row[0]
+
+    if page_count is not None and len(known) >= page_count:
+        added = index_pages(doc_hash, filename, page_count, [], user_id, path)
+    else:
+        page_count, page_texts = extract_page_texts(pdf_bytes)
+        added = index_pages(
+            doc_hash,
+            filename,
+            page_count,
+            ((p, t) for p, t in page_texts if p not in known),
+            user_id,
+            path,
+        )
+    return {"hash": doc_hash, "page_count": page_count, "pages_indexed": added}
+
+
+def search(
+        query: str,
+        user_id: int | None = None,
+        limit: int = 20,
+        offset: int = 0,
+        path: str | None = None,
+) -> List[dict]:
+    """
+    Full-text search over indexed pages ranked by bm25. When `user_id`
+    is given only documents that user has indexed are searched, under
+    the filename that user gave them; otherwise the filename is the one
+    the document was first indexed under.
+    """
+    expr = _fts_query(query)
+    if not expr:
+        return []
+
+    params: list = [SNIPPET_TOKENS]
+    if user_id is None:
+        source = "d.filename FROM page_text AS p JOIN documents AS d ON d.hash = p.hash "
+    else:
+        source = (
+            "o.filename FROM page_text AS p "
+            "JOIN document_owners AS o ON o.hash = p.hash AND o.user_id = ? "
+        )
+        params.append(user_id)
+    sql = (
+        "SELECT p.hash, p.page, "
+        "snippet(page_text, 2, '[', ']', '…', ?) AS snippet, "
+        "bm25(page_text) AS score, " + source
+    )
+    sql += "WHERE page_text MATCH ? ORDER BY score LIMIT ? OFFSET ?"
+    params += [expr, limit, offset]
+
+    with _connect(path) as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    return [
+        {
+            "hash": h,
+            "filename": filename,
+            "page": page + 1,
+            "snippet": snippet,
+            "score": score,
+        }
+        for h, page, snippet, score, filename in rows
+    ]
@@ -0,0 +1,311 @@
+"""
+Resumable uploads of large PDFs.
+
+An upload is a directory under UPLOAD_DIR holding the file being
+assembled (`data`, created at its final size), `meta.json` (owner, name,
+size, hash once finalized) and `ranges.json` (byte ranges received so
+far). Chunks are written in place at their offsets, in any order and in
+parallel, and a dropped chunk is simply sent again. All state is on
+disk and guarded by a file lock, so chunks of one upload may reach any
+server worker.
+
+The SHA-256 of the file is computed while it arrives: whenever the
+received prefix grows, the worker that owns the running hash reads the
+new bytes back (from the page cache) and feeds them in, so finalizing
+an upload sent in order does not read the file again.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.api.utils.preflight import PreflightError, preflight_file
+from app.core.config import settings
+
+_READ_SIZE = 4 * 1024 * 1024
+
+class UploadError(Exception):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+class _RunningHash:
+    __slots__ = ("digest", "offset", "lock")
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+        self.offset = 0
+        self.lock = threading.Lock()
+
+# running hashes of uploads this process has received chunks of
+_hashes: Dict[str, _RunningHash] = {}
+_hashes_lock = threading.Lock()
+
+def _dir(upload_id: str) -> str:
+    try:
+        uuid.UUID(hex=upload_id)
+    except ValueError:
+        raise UploadError("Upload not found", 404) from None
+    return os.path.join(settings.UPLOAD_DIR, upload_id)
+
+@contextmanager
+def _locked(path: str) -> Iterator[None]:
+    with open(os.path.join(path, "lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _load(path: str, name: str):
+    with open(os.path.join(path, name), encoding="utf-8") as f:
+        return json.load(f)
+
+def _store(path: str, name: str, value) -> None:
+    tmp = os.path.join(path, f"{name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    os.replace(tmp, os.path.join(path, name))
+
+def _meta(upload_id: str, user_id: int) -> Tuple[str, Dict]:
+    path = _dir(upload_id)
+    try:
+        meta = _load(path, "meta.json")
+    except FileNotFoundError:
+        raise UploadError("Upload not found", 404) from None
+    if meta["user_id"] != user_id:
+        # other users' uploads do not exist as far as the caller knows
+        raise UploadError("Upload not found", 404)
+    return path, meta
+
+def _merge(ranges: List[List[int]], start: int, end: int) -> List[List[int]]:
+    merged: List[List[int]] = []
+    for s, e in sorted(ranges + [[start, end]]):
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return merged
+
+def _received(ranges: List[List[int]]) -> int:
+    return sum(e - s for s, e in ranges)
+
+def _missing(ranges: List[List[int]], size: int) -> List[List[int]]:
+    gaps, pos = [], 0
+    for s, e in ranges:
+        if s > pos:
+            gaps.append([pos, s])
+        pos = e
+    if pos < size:
+        gaps.append([pos, size])
+    return gaps
+
+def _status(upload_id: str, meta: Dict, ranges: List[List[int]]) -> Dict:
+    return {
+        "id": upload_id,
+        "filename": meta["filename"],
+        "size": meta["size"],
+        "received": _received(ranges),
+        "missing": _missing(ranges, meta["size"]),
+        "finalized": meta.get("sha256") is not None,
+        "sha256": meta.get("sha256"),
+        "page_count": meta.get("page_count"),
+    }
+
+def _hash_up_to(path: str, running: _RunningHash, prefix: int) -> None:
+    # called with running.lock held
+    with open(os.path.join(path, "data"), "rb") as f:
+        f.seek(running.offset)
+        while running.offset < prefix:
+            block = f.read(min(_READ_SIZE, prefix - running.offset))
+            if not block:
+                break
+            running.digest.update(block)
+            running.offset += len(block)
+
+def _evict_hashes() -> None:
+    """
+    Forget running hashes of uploads that are gone or were finalized,
+    also when that happened on another worker.
+    """
+    with _hashes_lock:
+        ids = list(_hashes)
+    for upload_id in ids:
+        try:
+            finished = _load(_dir(upload_id), "meta.json").get("sha256") is not None
+        except (OSError, ValueError):
+            finished = True
+        if finished:
+            with _hashes_lock:
+                _hashes.pop(upload_id, None)
+
+def _advance_hash(upload_id: str, path: str, prefix: int) -> None:
+    """Feed the bytes up to `prefix` into this process's running hash, if it is free."""
+    with _hashes_lock:
+        running = _hashes.get(upload_id)
+        new = running is None
+        if new:
+            running = _hashes[upload_id] = _RunningHash()
+    if new:
+        # the first chunk of an upload on this worker clears out stale ones
+        _evict_hashes()
+    if not running.lock.acquire(blocking=False):
+        return  # another chunk is hashing; it or the next one catches up
+    try:
+        _hash_up_to(path, running, prefix)
+    finally:
+        running.lock.release()
+
+def prune_uploads() -> int:
+    """Delete uploads older than UPLOAD_TTL seconds; returns how many."""
+    try:
+        names = os.listdir(settings.UPLOAD_DIR)
+    except FileNotFoundError:
+        return 0
+    deadline = time.time() - settings.UPLOAD_TTL
+    removed = 0
+    for name in names:
+        path = os.path.join(settings.UPLOAD_DIR, name)
+        try:
+            expired = _load(path, "meta.json")["created"] < deadline
+        except (OSError, ValueError, KeyError):
+            continue
+        if expired:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    _evict_hashes()
+    return removed
+
+def _check_quota(user_id: int, size: int) -> None:
+    """Limit how many uploads a user keeps open and the bytes they declare."""
+    count, total = 0, size
+    for name in os.listdir(settings.UPLOAD_DIR):
+        try:
+            meta = _load(os.path.join(settings.UPLOAD_DIR, name), "meta.json")
+        except (OSError, ValueError):
+            continue
+        if meta.get("user_id") == user_id:
+            count += 1
+            total += meta.get("size", 0)
+    if count >= settings.UPLOAD_MAX_PER_USER:
+        raise UploadError(
+            f"Too many open uploads (limit {settings.UPLOAD_MAX_PER_USER}); "
+            "finish or delete one first", 429
+        )
+    if total > settings.UPLOAD_MAX_BYTES_PER_USER:
+        raise UploadError(
+            f"Open uploads would exceed {settings.UPLOAD_MAX_BYTES_PER_USER} bytes; "
+            "finish or delete one first", 413
+        )
+
+def create_upload(user_id: int, filename: Optional[str], size: int) -> Dict:
+    if size <= 0:
+        raise UploadError("Upload size must be positive")
+    if size > settings.PREFLIGHT_MAX_BYTES:
+        raise UploadError(f"PDF is larger than {settings.PREFLIGHT_MAX_BYTES} bytes", 413)
+    prune_uploads()
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    path = _dir(upload_id)
+    # the quota holds for requests racing on several workers
+    with _locked(settings.UPLOAD_DIR):
+        _check_quota(user_id, size)
+        os.makedirs(path)
+        with open(os.path.join(path, "data"), "wb") as f:
+            # sparse: disk blocks are allocated as chunks arrive
+            f.truncate(size)
+        _store(path, "ranges.json", [])
+        meta = {"user_id": user_id, "filename": filename, "size": size, "created": time.time()}
+        _store(path, "meta.json", meta)
+    return _status(upload_id, meta, [])
+
+class ChunkWriter:
+    """
+    Writes one chunk at its offset as its blocks arrive. Only a chunk
+    that was written completely is recorded as received by commit().
+    """
+
+    def __init__(self, upload_id: str, user_id: int, offset: int):
+        self.path, self.meta = _meta(upload_id, user_id)
+        if self.meta.get("sha256") is not None:
+            raise UploadError("Upload is already finalized", 409)
+        size = self.meta["size"]
+        if offset < 0 or offset >= size:
+            raise UploadError(f"Offset must be between 0 and {size - 1}")
+        self.upload_id = upload_id
+        self.offset = self.pos = offset
+        self._fd = os.open(os.path.join(self.path, "data"), os.O_WRONLY)
+
+    def write(self, block: bytes) -> None:
+        if self.pos + len(block) > self.meta["size"]:
+            raise UploadError(
+                f"Chunk ends beyond the declared size of {self.meta['size']} bytes"
+            )
+        os.pwrite(self._fd, block, self.pos)
+        self.pos += len(block)
+
+    def commit(self) -> Dict:
+        if self.pos == self.offset:
+            raise UploadError("Empty chunk")
+        with _locked(self.path):
+            ranges = _merge(_load(self.path, "ranges.json"), self.offset, self.pos)
+            _store(self.path, "ranges.json", ranges)
+        if ranges[0][0] == 0:
+            _advance_hash(self.upload_id, self.path, ranges[0][1])
+        return _status(self.upload_id, self.meta, ranges)
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+def upload_status(upload_id: str, user_id: int) -> Dict:
+    path, meta = _meta(upload_id, user_id)
+    return _status(upload_id, meta, _load(path, "ranges.json"))
+
+def finalize_upload(upload_id: str, user_id: int, sha256: Optional[str] = None) -> Dict:
+    """
+    Check that every byte has arrived, finish the hash and run the
+    preflight checks. A file that fails them is deleted.
+    """
+    path, meta = _meta(upload_id, user_id)
+    with _locked(path):
+        ranges = _load(path, "ranges.json")
+        if meta.get("sha256") is None:
+            if _missing(ranges, meta["size"]):
+                raise UploadError(
+                    f"Upload is incomplete: {_received(ranges)} of {meta['size']} bytes received", 409
+                )
+            with _hashes_lock:
+                running = _hashes.pop(upload_id, None) or _RunningHash()
+            # waits for a chunk still feeding the hash
+            with running.lock:
+                _hash_up_to(path, running, meta["size"])
+            digest = running.digest.hexdigest()
+            if sha256 and sha256.lower() != digest:
+                raise UploadError("SHA-256 of the assembled file does not match", 422)
+            try:
+                meta["page_count"] = preflight_file(os.path.join(path, "data"))
+            except PreflightError as exc:
+                shutil.rmtree(path, ignore_errors=True)
+                raise UploadError(str(exc), exc.status_code) from None
+            meta["sha256"] = digest
+            _store(path, "meta.json", meta)
+    return _status(upload_id, meta, ranges)
+
+def delete_upload(upload_id: str, user_id: int) -> None:
+    path, _ = _meta(upload_id, user_id)
+    shutil.rmtree(path, ignore_errors=True)
+    with _hashes_lock:
+        _hashes.pop(upload_id, None)
+
+def finalized_upload(upload_id: str, user_id: int) -> Tuple[str, Dict]:
+    """Path of the assembled file of a finalized upload and its metadata."""
+    path, meta = _meta(upload_id, user_id)
+    if meta.get("sha256") is None:
+        raise UploadError("Upload is not finalized", 409)
+    return os.path.join(path, "data"), meta
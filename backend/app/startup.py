@@ -1,3 +1,5 @@
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 
 from sqlalchemy.orm import Session
@@ -5,6 +7,11 @@ from app.db.session import SessionLocal
 from app.db.models.user import User, Role
 from app.core.security import get_password_hash
 from app.core.config import settings
+from app.api.utils.compress import shutdown_pool
+from app.core.metrics import monitor_event_loop, shared_metrics, write_shared_metrics
+from app.core.idempotency import idempotency_store
+
+log = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app):
@@ -40,12 +47,24 @@ async def lifespan(app):
                     )
                 )
                 db.commit()
-                print(f"[startup] Seeded default admin {admin_email}")
+                log.info("Seeded default admin %s", admin_email)
         else:
-            print("[startup] Skipping admin seeding – "
-                  "INIT_ADMIN_EMAIL/PASSWORD not provided")
+            log.info("Skipping admin seeding – "
+                     "INIT_ADMIN_EMAIL/PASSWORD not provided")
+    finally:
+        db.close()
 
+    tasks = [asyncio.create_task(monitor_event_loop())]
+    shared = shared_metrics()
+    if shared is not None:
+        tasks.append(asyncio.create_task(
+            write_shared_metrics(shared, settings.METRICS_WRITE_INTERVAL)
+        ))
+    try:
         yield
-
     finally:
-        db.close()
\ No newline at end of file
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        shutdown_pool()
+        idempotency_store.clear()
\ No newline at end of file
@@ -1,10 +1,16 @@
+from io import BytesIO
+
+import fitz
 import pytest
+from PIL import Image
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.db.base import Base
+from app.db.models.user import Role, User
 from app.api.dependencies import get_db
+from app.core.config import settings
 from app.main import app
 
 TEST_DATABASE_URL = "sqlite:///./test.db"
@@ -12,7 +18,7 @@ engine = create_engine(
     TEST_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
 )
 
 @pytest.fixture(scope="session", autouse=True)
@@ -31,7 +37,82 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+@pytest.fixture(autouse=True)
+def search_index(tmp_path, monkeypatch):
+    """Search index of the test; extract-text adds to it on every call."""
+    path = str(tmp_path / "search_index.db")
+    monkeypatch.setattr(settings, "SEARCH_INDEX_PATH", path)
+    return path
+
+@pytest.fixture(autouse=True)
+def idempotency_dir(tmp_path, monkeypatch):
+    """Idempotency records of the test, not of earlier runs."""
+    path = str(tmp_path / "idempotency")
+    monkeypatch.setattr(settings, "IDEMPOTENCY_DIR", path)
+    return path
+
 @pytest.fixture()
 def client():
     with TestClient(app) as c:
-        yield c
\ No newline at end of file
+        yield c
+
+@pytest.fixture()
+def auth_headers(client):
+    """Bearer header of a freshly registered user."""
+    credentials = {"email": "pdf-user@example.com", "password": "secret123"}
+    client.post("/auth/register", json=credentials)
+    response = client.post(
+        "/auth/login",
+        data={"username": credentials["email"], "password": credentials["password"]},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture()
+def admin_headers(client):
+    """Bearer header of a user promoted to the admin role."""
+    credentials = {"email": "pdf-admin@example.com", "password": "secret123"}
+    client.post("/auth/register", json=credentials)
+    db = TestingSessionLocal()
+    try:
+        admin = db.query(Role).filter_by(name="admin").one()
+        db.query(User).filter_by(email=credentials["email"]).update({"role_id": admin.id})
+        db.commit()
+    finally:
+        db.close()
+    response = client.post(
+        "/auth/login",
+        data={"username": credentials["email"], "password": credentials["password"]},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture()
+def make_pdf():
+    """Factory of small PDFs with one line of text per page."""
+    def _make(*page_texts):
+        doc = fitz.open()
+        for text in page_texts:
+            doc.new_page().insert_text((72, 72), text)
+        return doc.tobytes()
+    return _make
+
+@pytest.fixture()
+def make_photo_pdf():
+    """
+    Factory of PDFs whose pages share one 1200×900 noise JPEG drawn
+    2 × 1.5 inches large, i.e. at 600 DPI.
+    """
+    def _make(pages=3):
+        buf = BytesIO()
+        Image.effect_noise((1200, 900), 50).convert("RGB").save(buf, "JPEG", quality=95)
+        doc = fitz.open()
+        xref = 0
+        for _ in range(pages):
+            page = doc.new_page()
+            # 1200 px na 2 palcoch → 600 DPI
+            rect = fitz.Rect(72, 72, 216, 180)
+            if xref:
+                page.insert_image(rect, xref=xref)
+            else:
+                xref = page.insert_image(rect, stream=buf.getvalue())
+        return doc.tobytes()
+    return _make
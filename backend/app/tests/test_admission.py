@@ -0,0 +1,60 @@
+# tests/test_admission.py
+import asyncio
+
+import pytest
+
+from app.core.admission import AdmissionRejected, MemoryBudget, memory_budget
+
+
+def test_queued_request_runs_after_release():
+    budget = MemoryBudget(100, queue_timeout=1)
+
+    async def scenario():
+        await budget.acquire(80)
+        waiting = asyncio.create_task(budget.acquire(50))
+        await asyncio.sleep(0.01)
+        assert not waiting.done() and budget.queued == 1
+        budget.release(80)
+        await waiting
+        assert budget.in_use == 50
+
+    asyncio.run(scenario())
+
+
+def test_timeout_and_oversized_requests_are_rejected():
+    budget = MemoryBudget(100, queue_timeout=0.01, retry_after=7)
+
+    async def scenario():
+        await budget.acquire(80)
+        with pytest.raises(AdmissionRejected) as busy:
+            await budget.acquire(50)
+        assert busy.value.retry_after == 7
+        with pytest.raises(AdmissionRejected) as too_big:
+            await budget.acquire(101)
+        assert too_big.value.retry_after is None
+
+    asyncio.run(scenario())
+    assert budget.queued == 0 and budget.in_use == 80 and budget.rejected == 2
+
+
+def test_reservation_is_held_until_response_is_sent(client, auth_headers, make_pdf):
+    seen = []
+    real_release = memory_budget.release
+
+    def release(cost):
+        seen.append(cost)
+        real_release(cost)
+
+    memory_budget.release = release
+    try:
+        before = memory_budget.in_use
+        response = client.post(
+            "/pdf/remove-pages",
+            files={"file": ("a.pdf", make_pdf("a", "b"))},
+            data={"page_range": "1"},
+            headers=auth_headers,
+        )
+    finally:
+        del memory_budget.release
+    assert response.status_code == 200
+    assert len(seen) == 1 and memory_budget.in_use == before
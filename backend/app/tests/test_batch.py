@@ -0,0 +1,101 @@
+# tests/test_batch.py
+import io
+import json
+from zipfile import ZipFile
+
+import fitz
+from fastapi import HTTPException
+
+from app.api.routers import pdf as pdf_router
+from app.core.config import settings
+from app.db.models.history import History
+from app.tests.conftest import TestingSessionLocal
+
+def _history_rows(action: str) -> int:
+    db = TestingSessionLocal()
+    try:
+        return db.query(History).filter_by(action=action).count()
+    finally:
+        db.close()
+
+def _post(client, headers, files, step, **data):
+    return client.post(
+        "/pdf/batch",
+        files=[("files", (name, content)) for name, content in files],
+        data={"operation": json.dumps(step), **data},
+        headers=headers,
+    )
+
+def test_batch_streams_results_and_a_manifest(client, auth_headers, make_pdf):
+    rows = _history_rows("batch_remove_pages (4 files)")
+    files = [
+        ("a.pdf", make_pdf("a1", "a2")),
+        ("b.pdf", make_pdf("b1", "b2", "b3")),
+        ("broken.pdf", b"not a pdf"),
+        ("c.pdf", make_pdf("c1", "c2")),
+    ]
+    response = _post(client, auth_headers, files, {"op": "remove_pages", "params": {"page_range": "1"}})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+
+    with ZipFile(io.BytesIO(response.content)) as zf:
+        manifest = json.loads(zf.read("manifest.json"))
+        entries = manifest["files"]
+        assert [e["index"] for e in entries] == [1, 2, 3, 4]
+        assert [e["status"] for e in entries] == [200, 200, 400, 200]
+        assert "broken.pdf" in entries[2]["error"]
+        assert entries[1]["output"] == "0002_b.pdf"
+        doc = fitz.open(stream=zf.read("0002_b.pdf"), filetype="pdf")
+        assert [page.get_text().strip() for page in doc] == ["b2", "b3"]
+        assert sorted(zf.namelist()) == ["0001_a.pdf", "0002_b.pdf", "0004_c.pdf", "manifest.json"]
+
+    # one history entry for the whole batch, none per file
+    assert _history_rows("batch_remove_pages (4 files)") == rows + 1
+
+def test_batch_accepts_finalized_uploads(client, auth_headers, make_pdf, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    pdf = make_pdf("u1", "u2")
+    upload = client.post("/pdf/uploads", json={"filename": "up.pdf", "size": len(pdf)}, headers=auth_headers).json()
+    client.put(f"/pdf/uploads/{upload['id']}?offset=0", content=pdf, headers=auth_headers)
+    client.post(f"/pdf/uploads/{upload['id']}/finalize", json={}, headers=auth_headers)
+
+    response = _post(client, auth_headers, [], {"op": "compress", "params": {}}, upload_ids=upload["id"])
+    assert response.status_code == 200
+    with ZipFile(io.BytesIO(response.content)) as zf:
+        (entry,) = json.loads(zf.read("manifest.json"))["files"]
+        assert entry["status"] == 200 and entry["output"] == "0001_up.pdf"
+        assert len(fitz.open(stream=zf.read("0001_up.pdf"), filetype="pdf")) == 2
+
+def test_batch_rejects_bad_requests_up_front(client, auth_headers, make_pdf, monkeypatch):
+    pdf = make_pdf("a")
+    assert _post(client, auth_headers, [("a.pdf", pdf)], {"op": "rotate"}).status_code == 400
+    assert _post(client, auth_headers, [], {"op": "compress", "params": {}}).status_code == 400
+
+    monkeypatch.setattr(settings, "BATCH_MAX_FILES", 2)
+    files = [(f"{i}.pdf", pdf) for i in range(3)]
+    assert _post(client, auth_headers, files, {"op": "compress", "params": {}}).status_code == 413
+
+def test_busy_files_are_retried(client, auth_headers, make_pdf, monkeypatch):
+    run = pdf_router._run
+    calls = []
+
+    async def busy_once(owner, operation, *args, **kwargs):
+        calls.append(operation)
+        if len(calls) <= 2:
+            raise HTTPException(status_code=503, detail="Server is busy", headers={"Retry-After": "0"})
+        return await run(owner, operation, *args, **kwargs)
+
+    monkeypatch.setattr(pdf_router, "_run", busy_once)
+    files = [("a.pdf", make_pdf("a")), ("b.pdf", make_pdf("b"))]
+    response = _post(client, auth_headers, files, {"op": "compress", "params": {}})
+    with ZipFile(io.BytesIO(response.content)) as zf:
+        entries = json.loads(zf.read("manifest.json"))["files"]
+    assert [e["status"] for e in entries] == [200, 200]
+    assert len(calls) == 4
+
+    monkeypatch.setattr(settings, "BATCH_BUSY_RETRIES", 0)
+    calls.clear()
+    response = _post(client, auth_headers, files[:1], {"op": "compress", "params": {}})
+    with ZipFile(io.BytesIO(response.content)) as zf:
+        (entry,) = json.loads(zf.read("manifest.json"))["files"]
+    assert entry["status"] == 503
@@ -0,0 +1,43 @@
+# tests/test_benchmarks.py
+import json
+from pathlib import Path
+
+from app.api.utils.engines import get_engine
+from app.api.utils.engines.selection import ENGINES
+from app.core.config import settings
+from benchmarks import run as run_module
+from benchmarks.run import _cases, compare, run
+
+
+def test_results_drive_auto_engine_selection(tmp_path, monkeypatch):
+    results = run(["text_heavy"], ["small"], ["extract_text"], repeat=1, log=lambda _: None)
+    assert {r["engine"] for r in results} == {"pypdf", "pymupdf"}
+    assert all(r["seconds"] > 0 and r["peak_bytes"] > 0 for r in results)
+
+    path = tmp_path / "results.json"
+    path.write_text(json.dumps({"results": results}))
+    monkeypatch.setattr(settings, "PDF_ENGINE_BENCHMARKS", str(path))
+    fastest = min(results, key=lambda r: r["seconds"])["engine"]
+    assert get_engine("auto", "extract_text", results[0]["input_bytes"]).name == fastest
+
+
+def test_compare_flags_slowdowns_and_memory_growth():
+    base = {"operation": "merge", "engine": "pypdf", "corpus": "c", "scale": "small"}
+    baseline = [{**base, "seconds": 1.0, "peak_bytes": 1000}]
+    assert compare([{**base, "seconds": 1.1, "peak_bytes": 1100}], baseline, 0.2, 0.2) == []
+    regressions = compare([{**base, "seconds": 1.5, "peak_bytes": 2000}], baseline, 0.2, 0.2)
+    assert len(regressions) == 2
+
+
+def test_per_request_stages_are_benchmarked():
+    results = run(["text_heavy"], ["small"], ["preflight", "optimize_fast", "optimize_max"],
+                  repeat=1, log=lambda _: None)
+    assert {r["operation"] for r in results} == {"preflight", "optimize_fast", "optimize_max"}
+    assert all("error" not in r for r in results)
+
+
+def test_committed_baseline_covers_every_case():
+    with open(Path(run_module.__file__).with_name("baseline.json"), encoding="utf-8") as fh:
+        baseline = json.load(fh)["results"]
+    measured = {(r["operation"], r["engine"]) for r in baseline if "seconds" in r}
+    assert measured == {(operation, engine) for operation, engine, _ in _cases(None, ENGINES)}
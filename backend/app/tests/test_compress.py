@@ -0,0 +1,107 @@
+# tests/test_compress.py
+from io import BytesIO
+
+import fitz
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+from app.api.utils.compress import compress_pdf_bytes, recompress_images
+
+
+def test_profile_downsamples_to_target_dpi(make_photo_pdf):
+    src = make_photo_pdf()
+    out = compress_pdf_bytes(src, profile="ebook", parallel=False).getvalue()
+
+    assert len(out) < len(src)
+    doc = fitz.open(stream=out, filetype="pdf")
+    assert len(doc) == 3
+    (xref, _, width, height, *_), = doc[0].get_images()
+    # 2 palce pri 150 DPI
+    assert (width, height) == (300, 225)
+    # zdieľaný obrázok ostal jeden objekt pre všetky strany
+    assert all(img[0] == xref for page in doc for img in page.get_images())
+
+
+def test_quality_only_keeps_dimensions(make_photo_pdf):
+    src = make_photo_pdf(pages=1)
+    out = compress_pdf_bytes(src, reduce_image_quality=30, parallel=False).getvalue()
+    doc = fitz.open(stream=out, filetype="pdf")
+    (_, _, width, height, *_), = doc[0].get_images()
+    assert (width, height) == (1200, 900)
+    assert len(out) < len(src)
+
+
+def test_parallel_matches_serial(make_photo_pdf):
+    # four distinct images, so the work is spread over the process pool
+    doc = fitz.open()
+    for _ in range(4):
+        part = fitz.open(stream=make_photo_pdf(pages=1), filetype="pdf")
+        doc.insert_pdf(part)
+    src = doc.tobytes()
+
+    serial = compress_pdf_bytes(src, profile="screen", parallel=False).getvalue()
+    parallel = compress_pdf_bytes(src, profile="screen", parallel=True).getvalue()
+    sizes = [
+        [img[2:4] for page in fitz.open(stream=out, filetype="pdf") for img in page.get_images()]
+        for out in (serial, parallel)
+    ]
+    assert sizes[0] == sizes[1] == [(144, 108)] * 4
+    assert len(parallel) < len(src)
+
+
+def test_identical_copies_keep_largest_placement_per_axis(make_photo_pdf):
+    # the same image stored twice, drawn wide on one page and tall on the other
+    jpeg = fitz.open(stream=make_photo_pdf(pages=1), filetype="pdf")
+    data = jpeg.extract_image(jpeg[0].get_images()[0][0])["image"]
+    doc = fitz.open()
+    for rect in (fitz.Rect(0, 0, 144, 54), fitz.Rect(0, 0, 54, 216)):
+        single = fitz.open()
+        single.new_page().insert_image(rect, stream=data, keep_proportion=False)
+        doc.insert_pdf(single)
+    assert len({img[0] for page in doc for img in page.get_images()}) == 2
+
+    writer = PdfWriter(clone_from=PdfReader(BytesIO(doc.tobytes())))
+    recompress_images(writer, 75, parallel=False, target_dpi=72)
+    out = BytesIO()
+    writer.write(out)
+    widths_heights = {img[2:4] for page in fitz.open(stream=out.getvalue(), filetype="pdf")
+                      for img in page.get_images()}
+    # 144 pt wide and 216 pt tall at 72 DPI
+    assert widths_heights == {(288, 216)}
+
+
+def test_same_bytes_with_different_decode_are_encoded_separately():
+    # two XObjects with identical data; /Decode inverts the second one
+    raw = Image.effect_noise((200, 200), 60).convert("L").point(lambda v: v // 4).tobytes()
+    writer = PdfWriter()
+    page = writer.add_blank_page(400, 200)
+    xobjects = DictionaryObject()
+    for idx, extra in enumerate([{}, {NameObject("/Decode"): ArrayObject([NumberObject(1), NumberObject(0)])}]):
+        image = DecodedStreamObject()
+        image.set_data(raw)
+        image.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(200),
+            NameObject("/Height"): NumberObject(200),
+            NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+            **extra,
+        })
+        xobjects[NameObject(f"/Im{idx}")] = writer._add_object(image)
+    page[NameObject("/Resources")] = DictionaryObject({NameObject("/XObject"): xobjects})
+    content = DecodedStreamObject()
+    content.set_data(b"q 200 0 0 200 0 0 cm /Im0 Do Q q 200 0 0 200 200 0 cm /Im1 Do Q")
+    page[NameObject("/Contents")] = writer._add_object(content)
+    src = BytesIO()
+    writer.write(src)
+
+    out = compress_pdf_bytes(src.getvalue(), reduce_image_quality=50, parallel=False).getvalue()
+    doc = fitz.open(stream=out, filetype="pdf")
+    means = [
+        sum(fitz.Pixmap(doc, img[0]).samples) / (200 * 200)
+        for img in doc[0].get_images(full=True)
+    ]
+    # the dark image stays dark and its inverted copy light
+    assert means[0] < 64 and means[1] > 192
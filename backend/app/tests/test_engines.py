@@ -0,0 +1,58 @@
+# tests/test_engines.py
+import json
+
+import fitz
+import pytest
+
+from app.core.config import settings
+from app.api.utils.engines import get_engine
+
+
+def _page_texts(data):
+    doc = fitz.open(stream=data, filetype="pdf")
+    return [page.get_text().strip() for page in doc]
+
+
+@pytest.mark.parametrize("name", ["pypdf", "pymupdf"])
+def test_engines_are_equivalent(name, make_pdf):
+    engine = get_engine(name)
+    src = make_pdf(*(f"page {i}" for i in range(1, 6)))
+
+    merged = engine.merge([src, make_pdf("page 1", "page 2")]).getvalue()
+    assert _page_texts(merged) == [f"page {i}" for i in (1, 2, 3, 4, 5, 1, 2)]
+
+    removed = engine.remove_pages(src, "2-3").getvalue()
+    assert _page_texts(removed) == ["page 1", "page 4", "page 5"]
+
+    parts = engine.split_range(src, "1-2,4")
+    assert [_page_texts(p.getvalue()) for p in parts] == [["page 1", "page 2"], ["page 4"]]
+
+    total, texts = engine.extract_text(src, "5")
+    assert total == 5 and texts[0][0] == 4 and "page 5" in texts[0][1]
+
+
+@pytest.mark.parametrize("name", ["pypdf", "pymupdf"])
+def test_removing_every_page_is_rejected(name, make_pdf):
+    with pytest.raises(ValueError):
+        get_engine(name).remove_pages(make_pdf("a", "b"), "1-2")
+
+
+def test_auto_uses_benchmark_results(tmp_path, monkeypatch):
+    results = tmp_path / "bench.json"
+    results.write_text(json.dumps({"results": [
+        {"operation": "merge", "engine": "pypdf", "input_bytes": 1000, "seconds": 0.01},
+        {"operation": "merge", "engine": "pymupdf", "input_bytes": 1000, "seconds": 0.05},
+        {"operation": "merge", "engine": "pypdf", "input_bytes": 10**7, "seconds": 9.0},
+        {"operation": "merge", "engine": "pymupdf", "input_bytes": 10**7, "seconds": 1.0},
+    ]}))
+    monkeypatch.setattr(settings, "PDF_ENGINE_BENCHMARKS", str(results))
+
+    assert get_engine("auto", "merge", 2000).name == "pypdf"
+    assert get_engine("auto", "merge", 5 * 10**6).name == "pymupdf"
+    # bez výsledkov pre operáciu → predvolený engine
+    assert get_engine("auto", "n_up", 2000).name == "pypdf"
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        get_engine("ghostscript")
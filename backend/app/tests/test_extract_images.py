@@ -0,0 +1,126 @@
+# tests/test_extract_images.py
+from io import BytesIO
+from zipfile import ZipFile
+
+import fitz
+import pytest
+from PIL import Image
+from pypdf import PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+from app.api.utils import extract_images
+from app.api.utils.engines import get_engine
+
+
+def _image(fmt, size):
+    buf = BytesIO()
+    Image.effect_noise(size, 40).convert("RGB").save(buf, fmt)
+    return buf.getvalue()
+
+
+@pytest.fixture()
+def images_pdf():
+    """Two pages sharing one JPEG, plus a small PNG icon on page 2."""
+    jpeg = _image("JPEG", (400, 300))
+    doc = fitz.open()
+    first = doc.new_page()
+    xref = first.insert_image(fitz.Rect(72, 72, 272, 222), stream=jpeg)
+    second = doc.new_page()
+    second.insert_image(fitz.Rect(72, 72, 272, 222), xref=xref)
+    second.insert_image(fitz.Rect(300, 72, 316, 88), stream=_image("PNG", (16, 16)))
+    return doc.tobytes(), jpeg
+
+
+def _names(zip_io):
+    return sorted(ZipFile(zip_io).namelist())
+
+
+@pytest.mark.parametrize("name", ["pypdf", "pymupdf"])
+def test_passthrough_and_dedup(name, images_pdf):
+    pdf, jpeg = images_pdf
+    engine = get_engine(name)
+
+    zip_io, count = engine.extract_images(pdf)
+    assert count == 2
+    names = _names(zip_io)
+    assert [n.rsplit(".", 1)[1] for n in names] == ["jpg", "png"]
+    # JPEG stream is copied byte for byte
+    assert ZipFile(zip_io).read(names[0]) == jpeg
+
+    _, count = engine.extract_images(pdf, deduplicate=False)
+    assert count == 3
+
+
+@pytest.mark.parametrize("name", ["pypdf", "pymupdf"])
+def test_filters(name, images_pdf):
+    pdf, _ = images_pdf
+    engine = get_engine(name)
+    assert engine.extract_images(pdf, min_width=100)[1] == 1
+    assert engine.extract_images(pdf, image_format="png")[1] == 1
+    assert engine.extract_images(pdf, page_range="1")[1] == 1
+
+
+def test_filtered_images_are_not_read(images_pdf, monkeypatch):
+    pdf, _ = images_pdf
+    calls = []
+    real = extract_images._image_bytes
+    monkeypatch.setattr(
+        extract_images, "_image_bytes",
+        lambda xobj, ext, passthrough: calls.append(ext) or real(xobj, ext, passthrough),
+    )
+    _, count = extract_images.extract_images_from_pdf_bytes(pdf, min_width=100)
+    assert count == 1 and calls == ["jpg"]
+
+
+def test_writes_into_given_stream(images_pdf, tmp_path):
+    pdf, _ = images_pdf
+    with open(tmp_path / "images.zip", "w+b") as out:
+        returned, count = get_engine("pymupdf").extract_images(pdf, out=out)
+        assert returned is out and count == 2
+        assert len(_names(out)) == 2
+
+
+def _raw_pdf(content, xobjects=()):
+    """One page with the given content stream and raw gray image XObjects /Im0, /Im1, …"""
+    writer = PdfWriter()
+    page = writer.add_blank_page(100, 100)
+    images = DictionaryObject()
+    for idx, extra in enumerate(xobjects):
+        image = DecodedStreamObject()
+        image.set_data(bytes([0, 255, 255, 0]))
+        image.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(2),
+            NameObject("/Height"): NumberObject(2),
+            NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+            **extra,
+        })
+        images[NameObject(f"/Im{idx}")] = writer._add_object(image)
+    page[NameObject("/Resources")] = DictionaryObject({NameObject("/XObject"): images})
+    stream = DecodedStreamObject()
+    stream.set_data(content)
+    page[NameObject("/Contents")] = writer._add_object(stream)
+    out = BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("name", ["pypdf", "pymupdf"])
+def test_inline_images_are_extracted(name):
+    pdf = _raw_pdf(b"q 20 0 0 20 10 10 cm BI /W 2 /H 2 /BPC 8 /CS /G ID \x00\xff\xff\x00 EI Q")
+    zip_io, count = get_engine(name).extract_images(pdf)
+    assert count == 1
+    (filename,) = _names(zip_io)
+    assert filename == "page1_img1.png"
+    assert Image.open(BytesIO(ZipFile(zip_io).read(filename))).size == (2, 2)
+    assert get_engine(name).extract_images(pdf, min_width=3)[1] == 0
+
+
+@pytest.mark.parametrize("name", ["pypdf", "pymupdf"])
+def test_same_data_with_different_dictionary_is_kept(name):
+    # identical stream bytes, but /Decode inverts the second image
+    inverted = {NameObject("/Decode"): ArrayObject([NumberObject(1), NumberObject(0)])}
+    pdf = _raw_pdf(b"q 20 0 0 20 10 10 cm /Im0 Do Q q 20 0 0 20 40 10 cm /Im1 Do Q", [{}, inverted])
+    assert get_engine(name).extract_images(pdf)[1] == 2
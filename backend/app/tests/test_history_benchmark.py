@@ -0,0 +1,36 @@
+# tests/test_history_benchmark.py
+import json
+
+from benchmarks.history import _rows, load_action_mix, main
+
+
+def test_generate_and_run_on_sqlite(tmp_path):
+    url = f"sqlite:///{tmp_path / 'history.db'}"
+    output = tmp_path / "results.json"
+    assert main(["--database-url", url, "generate", "--rows", "500", "--users", "20", "--batch", "200"]) == 0
+    assert main([
+        "--database-url", url, "--output", str(output), "run",
+        "--offsets", "0,450", "--repeat", "1", "--writers", "2",
+        "--insert-seconds", "0.2", "--purge",
+    ]) == 0
+
+    rows = json.loads(output.read_text())["results"]
+    pages = [r for r in rows if r["benchmark"] == "history_page"]
+    results = {r["benchmark"]: r for r in rows}
+    assert [p["rows"] for p in pages] == [100, 50]
+    assert results["export_csv"]["rows"] == 500
+    assert results["export_csv"]["peak_bytes"] > 0
+    assert results["concurrent_inserts"]["rows"] > 0
+    assert results["purge"]["rows"] == 500 + results["concurrent_inserts"]["rows"]
+
+
+def test_action_mix_can_come_from_an_export(tmp_path):
+    export = tmp_path / "history.csv"
+    export.write_text(
+        "id,user_email,action,source,city,country,timestamp\n"
+        + "".join(f"{i},a@b.c,merge_pdf,api,,,2026-01-01\n" for i in range(3))
+        + "4,a@b.c,n_up,api,,,2026-01-01\n"
+    )
+    mix = load_action_mix(str(export))
+    assert mix == [("merge_pdf", 3), ("n_up", 1)]
+    assert {row["action"] for row in _rows([1], 50, 1, 0, mix)} == {"merge_pdf", "n_up"}
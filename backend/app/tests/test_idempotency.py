@@ -0,0 +1,131 @@
+# tests/test_idempotency.py
+import asyncio
+import time
+
+import httpx
+
+from app.api.routers import pdf as pdf_router
+from app.core.idempotency import IdempotencyMiddleware, IdempotencyStore
+from app.db.models.history import History
+from app.main import app
+from app.tests.conftest import TestingSessionLocal
+
+STEPS = '[{"op": "remove_pages", "params": {"page_range": "1"}}]'
+
+def _pipeline_runs(monkeypatch, delay=0.0):
+    runs = []
+    run_pipeline_bytes = pdf_router.run_pipeline_bytes
+
+    def job(*args, **kwargs):
+        runs.append(1)
+        time.sleep(delay)
+        return run_pipeline_bytes(*args, **kwargs)
+
+    monkeypatch.setattr(pdf_router, "run_pipeline_bytes", job)
+    return runs
+
+def _history_rows() -> int:
+    db = TestingSessionLocal()
+    try:
+        return db.query(History).filter_by(action="pipeline").count()
+    finally:
+        db.close()
+
+def test_retry_replays_the_stored_response(client, auth_headers, make_pdf, monkeypatch):
+    runs = _pipeline_runs(monkeypatch)
+    pdf = make_pdf("a", "b")
+    headers = {**auth_headers, "Idempotency-Key": "retry-1"}
+    rows = _history_rows()
+
+    # every request gets a new multipart boundary, as a rebuilt form would
+    first = client.post("/pdf/pipeline", files={"file": ("a.pdf", pdf)}, data={"steps": STEPS}, headers=headers)
+    second = client.post("/pdf/pipeline", files={"file": ("a.pdf", pdf)}, data={"steps": STEPS}, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.content == first.content
+    assert second.headers["content-disposition"] == first.headers["content-disposition"]
+    assert len(runs) == 1
+    assert _history_rows() == rows + 1
+
+    changed = client.post(
+        "/pdf/pipeline", files={"file": ("b.pdf", make_pdf("c"))}, data={"steps": STEPS}, headers=headers
+    )
+    assert changed.status_code == 422
+
+    # without a key every request runs
+    client.post("/pdf/pipeline", files={"file": ("a.pdf", pdf)}, data={"steps": STEPS}, headers=auth_headers)
+    assert len(runs) == 2
+
+def test_concurrent_duplicates_share_one_run(client, auth_headers, make_pdf, monkeypatch):
+    runs = _pipeline_runs(monkeypatch, delay=0.3)
+    pdf = make_pdf("a", "b")
+    headers = {**auth_headers, "Idempotency-Key": "concurrent-1"}
+
+    async def send_both():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            return await asyncio.gather(*(
+                ac.post("/pdf/pipeline", files={"file": ("a.pdf", pdf)}, data={"steps": STEPS}, headers=headers)
+                for _ in range(3)
+            ))
+
+    responses = asyncio.run(send_both())
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert len({r.content for r in responses}) == 1
+    assert sum(r.headers.get("Idempotent-Replayed") == "true" for r in responses) == 2
+    assert len(runs) == 1
+
+def _below_idempotency():
+    # the application as the idempotency middleware sees it
+    layer = app.middleware_stack
+    while not isinstance(layer, IdempotencyMiddleware):
+        layer = layer.app
+    return layer.app
+
+def test_workers_share_keys_through_the_directory(client, auth_headers, make_pdf, monkeypatch, tmp_path):
+    runs = _pipeline_runs(monkeypatch, delay=0.3)
+    pdf = make_pdf("a", "b")
+    headers = {**auth_headers, "Idempotency-Key": "workers-1"}
+    # two workers: separate stores and middlewares over one directory
+    workers = [
+        IdempotencyMiddleware(_below_idempotency(), IdempotencyStore(3600, 16, str(tmp_path)))
+        for _ in range(2)
+    ]
+
+    async def send(worker):
+        transport = httpx.ASGITransport(app=worker)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            return await ac.post(
+                "/pdf/pipeline", files={"file": ("a.pdf", pdf)}, data={"steps": STEPS}, headers=headers
+            )
+
+    async def send_all():
+        concurrent = await asyncio.gather(send(workers[0]), send(workers[1]))
+        return [*concurrent, await send(workers[1])]
+
+    responses = asyncio.run(send_all())
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert len({r.content for r in responses}) == 1
+    assert sum(r.headers.get("Idempotent-Replayed") == "true" for r in responses) == 2
+    assert len(runs) == 1
+    assert len(workers[0].store) == len(workers[1].store) == 1
+
+def test_records_of_dead_workers_and_expired_ones_are_dropped(tmp_path):
+    store = IdempotencyStore(0, 16, str(tmp_path))
+    key = ("1", "/pdf/pipeline", "k")
+    entry, first = store.claim(key)
+    assert first
+    # running in a process that no longer exists
+    entry.record["pid"] = 2 ** 22 + 1
+    store.set_fingerprint(entry, "abc")
+    assert store.claim(key)[1]
+
+    replay = tmp_path / "replay"
+    replay.write_bytes(b"%PDF")
+    entry, _ = store.claim(key)
+    store.finish(entry, 200, [], str(replay))
+    # ttl 0: expired as soon as it is written
+    store._prune()
+    assert len(store) == 0 and not replay.exists()
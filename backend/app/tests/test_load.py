@@ -0,0 +1,36 @@
+# tests/test_load.py
+import asyncio
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from benchmarks.load import LoadTest, report, start_geo_stub
+
+
+def test_closed_loop_reports_latency_percentiles(client, monkeypatch):
+    geo = start_geo_stub(latency=0)
+    monkeypatch.setattr(
+        settings, "GEO_ENDPOINT", f"http://127.0.0.1:{geo.server_port}/{{ip}}/json/"
+    )
+    async def scenario():
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://loadtest"
+        ) as http:
+            test = LoadTest(http, {"extract_text": 3, "login": 1, "history": 1})
+            await test.setup(2)
+            # no seeded admin in the test database
+            assert "history" not in test.mix
+            await test.closed_loop(2, time.monotonic() + 1.0)
+            return test.stats
+
+    try:
+        stats = asyncio.run(scenario())
+    finally:
+        geo.shutdown()
+    result = report(stats, 1.0)
+    assert result["requests"] >= 2
+    assert result["error_rate"] == 0.0
+    for values in result["scenarios"].values():
+        assert values["p50_ms"] <= values["p95_ms"] <= values["p99_ms"]
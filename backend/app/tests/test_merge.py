@@ -0,0 +1,97 @@
+# tests/test_merge.py
+import os
+import tracemalloc
+from io import BytesIO
+
+import fitz
+import pytest
+from PIL import Image
+
+from app.api.utils.merge_pdf import merge_pdf_files
+
+
+def _texts(data):
+    return [page.get_text().strip() for page in fitz.open(stream=data, filetype="pdf")]
+
+
+def _merge(sources):
+    out = BytesIO()
+    total = merge_pdf_files((BytesIO(s) for s in sources), out)
+    return total, out.getvalue()
+
+
+def test_page_order_and_count(make_pdf):
+    total, merged = _merge([make_pdf("a1", "a2"), make_pdf("b1"), make_pdf("c1", "c2", "c3")])
+    assert total == 6
+    assert _texts(merged) == ["a1", "a2", "b1", "c1", "c2", "c3"]
+
+
+def test_object_stream_inputs(make_pdf):
+    # compressed xref + object streams, as written by most modern producers
+    doc = fitz.open(stream=make_pdf("x1", "x2"), filetype="pdf")
+    packed = doc.tobytes(use_objstms=1, compression_effort=1, garbage=1)
+    assert b"/ObjStm" in packed
+
+    total, merged = _merge([packed, make_pdf("y1")])
+    assert total == 3
+    assert _texts(merged) == ["x1", "x2", "y1"]
+
+
+def test_encrypted_input_is_rejected(make_pdf):
+    doc = fitz.open(stream=make_pdf("secret"), filetype="pdf")
+    locked = doc.tobytes(encryption=fitz.PDF_ENCRYPT_RC4_128, user_pw="u", owner_pw="o")
+    with pytest.raises(ValueError, match="File 2 is encrypted"):
+        _merge([make_pdf("a"), locked])
+
+
+def test_encrypted_input_gives_400(client, auth_headers, make_pdf):
+    doc = fitz.open(stream=make_pdf("secret"), filetype="pdf")
+    locked = doc.tobytes(encryption=fitz.PDF_ENCRYPT_RC4_128, user_pw="u", owner_pw="o")
+    response = client.post(
+        "/pdf/merge-pdf",
+        files=[("files", ("a.pdf", make_pdf("a"))), ("files", ("b.pdf", locked))],
+        data={"low_memory": "true"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("engine, status", [("pypdf", 200), ("pymupdf", 400), ("auto", 400)])
+def test_low_memory_only_runs_on_pypdf(client, auth_headers, make_pdf, engine, status):
+    response = client.post(
+        "/pdf/merge-pdf",
+        files=[("files", ("a.pdf", make_pdf("a"))), ("files", ("b.pdf", make_pdf("b")))],
+        data={"low_memory": "true", "engine": engine},
+        headers=auth_headers,
+    )
+    assert response.status_code == status
+
+
+def test_memory_does_not_grow_with_inputs(tmp_path):
+    # ~1 MB of incompressible image data per input
+    buf = BytesIO()
+    Image.frombytes("RGB", (600, 600), os.urandom(600 * 600 * 3)).save(buf, "PNG")
+    doc = fitz.open()
+    doc.new_page().insert_image(fitz.Rect(0, 0, 300, 300), stream=buf.getvalue())
+    one = doc.tobytes(deflate=True)
+    paths = []
+    for i in range(12):
+        path = tmp_path / f"{i}.pdf"
+        path.write_bytes(one)
+        paths.append(path)
+
+    tracemalloc.start()
+    try:
+        with open(tmp_path / "out.pdf", "wb") as out:
+            files = [open(p, "rb") for p in paths]
+            total = merge_pdf_files(files, out)
+            for f in files:
+                f.close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert total == 12
+    # bounded by a few copies of the largest object, not by 12 inputs
+    assert peak < 4 * len(one)
+    assert len(fitz.open(tmp_path / "out.pdf")) == 12
@@ -0,0 +1,74 @@
+# tests/test_metrics.py
+from app.core.metrics import Histogram, Registry, SharedMetrics
+
+
+def _worker_registry(requests, queued):
+    registry = Registry()
+    registry.counter("requests_total", "Requests", ("route",)).inc(requests, route="/a")
+    registry.gauge("queued", "Queued", callback=lambda: {(): queued})
+    registry.histogram("job_seconds", "Job time", buckets=(1.0,)).observe(0.5)
+    return registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    hist = registry.histogram("job_seconds", "Job time", ("op",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        hist.observe(value, op="merge")
+
+    text = registry.render()
+    assert "# TYPE job_seconds histogram" in text
+    assert 'job_seconds_bucket{op="merge",le="0.1"} 1' in text
+    assert 'job_seconds_bucket{op="merge",le="1"} 3' in text
+    assert 'job_seconds_bucket{op="merge",le="+Inf"} 4' in text
+    assert 'job_seconds_count{op="merge"} 4' in text
+
+
+def test_counter_can_read_its_value_at_scrape_time():
+    registry = Registry()
+    hits = {"n": 0}
+    counter = registry.counter("cache_hits_total", "Hits", callback=lambda: {(): hits["n"]})
+    hits["n"] = 3
+    assert counter.value() == 3
+    assert "# TYPE cache_hits_total counter\ncache_hits_total 3" in registry.render()
+
+
+def test_metrics_endpoint_reports_operation_phases(client, auth_headers, make_pdf):
+    response = client.post(
+        "/pdf/extract-text",
+        files={"file": ("a.pdf", make_pdf("a", "b"))},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+
+    text = client.get("/metrics").text
+    for phase in ("upload", "queue", "process"):
+        assert (
+            f'pdf_operation_phase_seconds_count{{operation="extract_text",phase="{phase}"}}'
+            in text
+        )
+    assert 'http_request_duration_seconds_count{method="POST",route="/pdf/extract-text",status="200"}' in text
+    assert 'pdf_pages_processed_total{operation="extract_text"}' in text
+    assert 'db_pool_connections{state="checked_out"}' in text
+    assert "# TYPE thumbnail_cache_requests_total counter" in text
+    assert '# TYPE admission_requests_total counter' in text
+    assert 'admission_requests_total{result="admitted"}' in text
+
+
+def test_shared_metrics_add_up_workers(tmp_path):
+    first = SharedMetrics(_worker_registry(2, 1), str(tmp_path), pid=101)
+    second = SharedMetrics(_worker_registry(3, 4), str(tmp_path), pid=102)
+    second.write()
+
+    text = first.render()
+    assert 'requests_total{route="/a"} 5' in text
+    assert "queued 5" in text
+    assert "job_seconds_count 2" in text
+
+    # a recycled worker keeps its counts but no longer its gauges
+    first.retire(102)
+    text = first.render()
+    assert 'requests_total{route="/a"} 5' in text
+    assert "queued 1" in text
+    assert 'job_seconds_bucket{le="1"} 2' in text
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == ["101.json", "retired.json"]
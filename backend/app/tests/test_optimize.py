@@ -0,0 +1,65 @@
+# tests/test_optimize.py
+import io
+from zipfile import ZipFile
+
+import fitz
+import pytest
+
+from app.api.utils.merge_pdf import merge_pdfs_bytes
+from app.api.utils.optimize import optimize_level, optimize_pdf
+
+def _texts(data):
+    return [page.get_text().strip() for page in fitz.open(stream=data, filetype="pdf")]
+
+def test_levels_shrink_a_merged_pdf(make_pdf):
+    pdf = make_pdf(*[f"page {i}" for i in range(10)])
+    merged = merge_pdfs_bytes([pdf, pdf]).getvalue()
+
+    fast = optimize_pdf(io.BytesIO(merged), "fast").getvalue()
+    best = optimize_pdf(io.BytesIO(merged), "max").getvalue()
+    assert len(best) <= len(fast) < len(merged)
+    assert _texts(best) == _texts(fast) == _texts(merged)
+    assert b"/ObjStm" in fast
+    # the font repeated by the merge is kept once
+    with fitz.open(stream=best, filetype="pdf") as doc:
+        fonts = {f[0] for page in doc for f in page.get_fonts()}
+    assert len(fonts) == 1
+
+def test_off_and_unreadable_output_are_left_alone():
+    data = io.BytesIO(b"%PDF-1.7 not really")
+    assert optimize_pdf(data, "off") is data
+    assert optimize_pdf(data, "max") is data
+
+def test_level_defaults_to_the_setting_and_is_validated():
+    assert optimize_level(None) == "fast"
+    assert optimize_level("MAX") == "max"
+    with pytest.raises(ValueError):
+        optimize_level("ultra")
+
+def test_endpoints_apply_the_requested_level(client, auth_headers, make_pdf):
+    pdf = make_pdf(*[f"page {i}" for i in range(10)])
+    files = [("files", ("a.pdf", pdf)), ("files", ("b.pdf", pdf))]
+
+    plain = client.post("/pdf/merge-pdf", files=files, data={"optimize": "off"}, headers=auth_headers)
+    default = client.post("/pdf/merge-pdf", files=files, headers=auth_headers)
+    low_memory = client.post(
+        "/pdf/merge-pdf", files=files, data={"low_memory": "true", "optimize": "max"}, headers=auth_headers
+    )
+    assert plain.status_code == default.status_code == low_memory.status_code == 200
+    assert len(default.content) < len(plain.content)
+    assert len(low_memory.content) < len(plain.content)
+    assert _texts(low_memory.content) == _texts(plain.content)
+
+    split = client.post(
+        "/pdf/split-pdf",
+        files={"file": ("a.pdf", pdf)},
+        data={"split_method": "interval", "interval": "5", "optimize": "max"},
+        headers=auth_headers,
+    )
+    with ZipFile(io.BytesIO(split.content)) as zf:
+        assert all(b"/ObjStm" in zf.read(name) for name in zf.namelist())
+
+    bad = client.post(
+        "/pdf/n-up", files={"file": ("a.pdf", pdf)}, data={"optimize": "ultra"}, headers=auth_headers
+    )
+    assert bad.status_code == 400
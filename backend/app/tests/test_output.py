@@ -0,0 +1,39 @@
+# tests/test_output.py
+import fitz
+
+from app.core.config import settings
+
+
+def test_outputs_are_sent_from_files_and_removed(client, auth_headers, make_pdf, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "OUTPUT_DIR", str(tmp_path))
+    pdf = make_pdf("a", "b", "c")
+
+    response = client.post(
+        "/pdf/remove-pages",
+        files={"file": ("a.pdf", pdf)},
+        data={"page_range": "2"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert response.headers["content-disposition"] == 'attachment; filename="modified.pdf"'
+    assert len(fitz.open(stream=response.content, filetype="pdf")) == 2
+
+    response = client.post(
+        "/pdf/split-pdf",
+        files={"file": ("a.pdf", pdf)},
+        data={"split_method": "interval", "interval": "2"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+
+    # a failed job does not leave its output file behind either
+    response = client.post(
+        "/pdf/remove-pages",
+        files={"file": ("a.pdf", pdf)},
+        data={"page_range": "1-3"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,70 @@
+# tests/test_page_selection.py
+import fitz
+import pytest
+
+from app.api.utils.engines import PymupdfEngine, PypdfEngine
+from app.api.utils.page_selection import parse_page_selection
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("", [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]),
+    ("1-3,5", [0, 1, 2, 4]),
+    ("3,1", [2, 0]),
+    ("5-3", [4, 3, 2]),
+    ("1-10:3", [0, 3, 6, 9]),
+    ("10-1:4", [9, 5, 1]),
+    ("8-", [7, 8, 9]),
+    ("-2", [0, 1]),
+    ("last", [9]),
+    ("even", [1, 3, 5, 7, 9]),
+    ("odd", [0, 2, 4, 6, 8]),
+    ("reverse", [9, 8, 7, 6, 5, 4, 3, 2, 1, 0]),
+    ("1-3,2-4", [0, 1, 2, 3]),
+    ("9-20, 30", [8, 9]),
+    ("15-12:2", []),
+    ("20-1:5", [9, 4]),
+])
+def test_selection(spec, expected):
+    selection = parse_page_selection(spec, 10)
+    assert list(selection) == expected
+    assert len(selection) == len(expected)
+
+
+def test_huge_range_stays_compact():
+    selection = parse_page_selection("1-1000000", 10_000)
+    assert selection.ranges == [range(0, 10_000)]
+    assert len(selection) == 10_000
+    assert 9_999 in selection and 10_000 not in selection
+
+
+@pytest.mark.parametrize("spec", ["a", "1-b", "1-5:0", "2:x"])
+def test_malformed_selection_is_rejected(spec):
+    with pytest.raises(ValueError, match="Invalid page range"):
+        parse_page_selection(spec, 10)
+
+
+@pytest.mark.parametrize("engine", [PypdfEngine(), PymupdfEngine()])
+def test_engines_follow_the_selection(engine, make_pdf):
+    pdf = make_pdf(*(f"p{i}" for i in range(1, 7)))
+
+    parts = engine.split_range(pdf, "3-1,4-6:2")
+    texts = [
+        [page.get_text().strip() for page in fitz.open(stream=part.getvalue(), filetype="pdf")]
+        for part in parts
+    ]
+    assert texts == [["p3", "p2", "p1"], ["p4", "p6"]]
+
+    _, page_texts = engine.extract_text(pdf, "even")
+    assert [idx for idx, _ in page_texts] == [1, 3, 5]
+    assert len(engine.extract_pages(pdf, "odd")) == 3
+
+
+def test_invalid_selection_is_a_client_error(client, auth_headers, make_pdf):
+    response = client.post(
+        "/pdf/extract-text",
+        files={"file": ("a.pdf", make_pdf("a"))},
+        data={"page_range": "one"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+    assert "Invalid page range" in response.json()["detail"]
@@ -0,0 +1,91 @@
+# tests/test_pipeline.py
+import json
+from io import BytesIO
+
+import fitz
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, NameObject
+
+from app.api.utils.pipeline import run_pipeline_bytes
+
+
+def _texts(data):
+    return [page.get_text().strip() for page in fitz.open(stream=data, filetype="pdf")]
+
+
+def test_steps_run_on_one_document(make_pdf):
+    src = make_pdf("p1", "p2", "p3")
+    out = run_pipeline_bytes(src, [
+        {"op": "remove_pages", "params": {"page_range": "2"}},
+        {"op": "add_text_watermark", "params": {"text": "DRAFT"}},
+        {"op": "compress", "params": {}},
+    ]).getvalue()
+    texts = _texts(out)
+    assert len(texts) == 2
+    assert "p1" in texts[0] and "DRAFT" in texts[0]
+    assert "p3" in texts[1] and "DRAFT" in texts[1]
+
+
+def _post(client, headers, pdf, steps):
+    return client.post(
+        "/pdf/pipeline",
+        files={"file": ("a.pdf", pdf)},
+        data={"steps": json.dumps(steps)},
+        headers=headers,
+    )
+
+
+def test_endpoint_returns_pdf(client, auth_headers, make_pdf):
+    response = _post(client, auth_headers, make_pdf("a", "b", "c", "d"),
+                     [{"op": "n_up", "params": {"cols": 2, "rows": 2}}])
+    assert response.status_code == 200
+    assert len(fitz.open(stream=response.content, filetype="pdf")) == 1
+
+
+@pytest.mark.parametrize("steps", [
+    [{"op": "n_up", "params": {"cols": "x"}}],
+    [{"op": "add_text_watermark", "params": {"text": "a", "font_size": "big"}}],
+    [{"op": "add_text_watermark", "params": {}}],
+    [{"op": "compress", "params": {"parallel": False}}],
+    [{"op": "compress", "params": {"profile": "tiny"}}],
+    [{"op": "rotate"}],
+    [],
+])
+def test_invalid_steps_are_rejected_up_front(client, auth_headers, make_pdf, steps):
+    response = _post(client, auth_headers, make_pdf("a"), steps)
+    assert response.status_code == 400
+
+
+def _plain_text_pdf(*texts):
+    """Pages whose content streams hold their text uncompressed."""
+    writer = PdfWriter()
+    for text in texts:
+        page = writer.add_blank_page(200, 200)
+        content = DecodedStreamObject()
+        content.set_data(b"BT /F1 12 Tf 10 10 Td (" + text + b") Tj ET")
+        page[NameObject("/Contents")] = writer._add_object(content)
+    out = BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def test_removed_pages_leave_no_content_behind():
+    src = _plain_text_pdf(b"kept first", b"removed secret", b"kept last")
+    out = run_pipeline_bytes(src, [{"op": "remove_pages", "params": {"page_range": "2"}}]).getvalue()
+    assert b"removed secret" not in out
+    assert b"kept first" in out and b"kept last" in out
+
+
+@pytest.mark.parametrize("engine", ["pypdf", "pymupdf"])
+def test_remove_pages_endpoint_leaves_no_content_behind(client, auth_headers, engine):
+    src = _plain_text_pdf(b"kept first", b"removed secret")
+    response = client.post(
+        "/pdf/remove-pages",
+        files={"file": ("a.pdf", src)},
+        data={"page_range": "2", "engine": engine, "optimize": "off"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    # pymupdf may compress the kept stream, so only the removed text is checked
+    assert b"removed secret" not in response.content
@@ -0,0 +1,101 @@
+# tests/test_preflight.py
+import fitz
+import pytest
+
+from app.api.routers import pdf as pdf_router
+from app.api.utils.preflight import PreflightError, preflight_file, preflight_pdf
+from app.core.config import settings
+
+def _encrypted(make_pdf, method):
+    doc = fitz.open(stream=make_pdf("secret"), filetype="pdf")
+    return doc.tobytes(encryption=method, owner_pw="owner", user_pw="user")
+
+def test_valid_pdf_passes(make_pdf):
+    assert preflight_pdf(make_pdf("a", "b", "c")) == 3
+
+@pytest.mark.parametrize("data, message", [
+    (b"hello world", "missing %PDF header"),
+    (None, "trailer"),
+])
+def test_damaged_files_are_rejected(make_pdf, data, message):
+    if data is None:
+        pdf = make_pdf("a")
+        data = pdf[: len(pdf) // 2]
+    with pytest.raises(PreflightError, match=message) as info:
+        preflight_pdf(data)
+    assert info.value.status_code == 400
+
+def _broken_xref(pdf):
+    # startxref moved off the cross-reference table; MuPDF repairs it
+    head, _, tail = pdf.rpartition(b"startxref")
+    offset = int(tail.split()[0])
+    return head + b"startxref\n" + str(offset + 3).encode() + b"\n%%EOF\n"
+
+def test_readers_quirks_are_accepted(make_pdf):
+    pdf = make_pdf("a", "b")
+    # bytes before the header, offsets counted from %PDF
+    assert preflight_pdf(b"\r\n\r\n" + pdf) == 2
+    # padding after %%EOF beyond the first trailer window
+    assert preflight_pdf(pdf + b"\0" * (200 * 1024)) == 2
+    assert preflight_pdf(pdf + b" " * 100000 + b"%%EOF\n") == 2
+
+def test_repairable_files_depend_on_strictness(make_pdf, monkeypatch, tmp_path):
+    broken = _broken_xref(make_pdf("a", "b"))
+    assert preflight_pdf(broken) == 2
+
+    monkeypatch.setattr(settings, "PREFLIGHT_STRICT", True)
+    with pytest.raises(PreflightError, match="startxref"):
+        preflight_pdf(broken)
+    # the header offset also holds in strict mode, also for files on disk
+    path = tmp_path / "shifted.pdf"
+    path.write_bytes(b"\r\n\r\n" + make_pdf("a"))
+    assert preflight_file(str(path)) == 1
+
+@pytest.mark.parametrize("method", [fitz.PDF_ENCRYPT_RC4_128, fitz.PDF_ENCRYPT_AES_256])
+def test_encrypted_files_are_rejected(make_pdf, method):
+    with pytest.raises(PreflightError, match="Encrypted"):
+        preflight_pdf(_encrypted(make_pdf, method))
+
+def test_limits(make_pdf, monkeypatch):
+    monkeypatch.setattr(settings, "PREFLIGHT_MAX_PAGES", 2)
+    with pytest.raises(PreflightError, match="3 pages") as info:
+        preflight_pdf(make_pdf("a", "b", "c"))
+    assert info.value.status_code == 413
+
+    doc = fitz.open()
+    doc.new_page(width=20000, height=500)
+    with pytest.raises(PreflightError, match="Page 1"):
+        preflight_pdf(doc.tobytes())
+
+def test_declared_image_size_is_checked(make_photo_pdf):
+    doc = fitz.open(stream=make_photo_pdf(1), filetype="pdf")
+    xref = doc.get_page_images(0)[0][0]
+    # a tiny stream claiming a huge raster, like a decompression bomb
+    doc.xref_set_key(xref, "Width", "200000")
+    doc.xref_set_key(xref, "Height", "200000")
+    with pytest.raises(PreflightError, match=f"Stream {xref}") as info:
+        preflight_pdf(doc.tobytes())
+    assert info.value.status_code == 413
+
+def test_rejected_before_cost_estimate(client, auth_headers, make_pdf, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("the upload should not reach the cost estimate")
+
+    monkeypatch.setattr(pdf_router, "estimate_raster_cost", fail)
+    monkeypatch.setattr(pdf_router, "document_page_count", fail)
+    encrypted = _encrypted(make_pdf, fitz.PDF_ENCRYPT_AES_256)
+    for endpoint in ("/pdf/pdf-to-png", "/pdf/thumbnail"):
+        response = client.post(
+            endpoint, files={"file": ("locked.pdf", encrypted)}, headers=auth_headers
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"].startswith("locked.pdf: Encrypted")
+
+    response = client.post(
+        "/pdf/merge-pdf",
+        files=[("files", ("a.pdf", make_pdf("a"))), ("files", ("b.pdf", b"not a pdf"))],
+        data={"low_memory": "true"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+    assert "b.pdf" in response.json()["detail"]
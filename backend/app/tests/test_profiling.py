@@ -0,0 +1,36 @@
+# tests/test_profiling.py
+from app.core.config import settings
+
+
+def test_admin_can_profile_a_call(client, admin_headers, auth_headers, make_pdf, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    pdf = make_pdf("a", "b")
+
+    # ignored for regular users
+    client.post(
+        "/pdf/extract-text",
+        files={"file": ("a.pdf", pdf)},
+        headers={**auth_headers, "X-Profile": "1"},
+    )
+    assert client.get("/pdf/profiles", headers=admin_headers).json() == []
+
+    response = client.post(
+        "/pdf/extract-text",
+        files={"file": ("a.pdf", pdf)},
+        data={"page_range": "2"},
+        headers={**admin_headers, "X-Profile": "1"},
+    )
+    assert response.status_code == 200
+    assert response.json()["text"].strip() == "b"
+
+    [profile] = client.get("/pdf/profiles", headers=admin_headers).json()
+    assert profile["operation"] == "extract_text"
+    assert profile["args"][0] == {"bytes": len(pdf)}
+    assert profile["args"][1] == "2"
+    assert profile["peak_bytes"] > 0
+
+    report = client.get(f"/pdf/profiles/{profile['id']}/memory.txt", headers=admin_headers)
+    assert report.text.startswith("peak traced memory")
+    missing = client.get(f"/pdf/profiles/{profile['id']}/app.py", headers=admin_headers)
+    assert missing.status_code == 404
+    assert client.get("/pdf/profiles", headers=auth_headers).status_code == 403
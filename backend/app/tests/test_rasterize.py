@@ -0,0 +1,51 @@
+# tests/test_rasterize.py
+from io import BytesIO
+from zipfile import ZipFile
+
+import pytest
+from PIL import Image
+
+from app.api.utils.rasterize import rasterize_pdf_bytes
+
+
+def _images(zip_io):
+    zf = ZipFile(zip_io)
+    return {name: Image.open(BytesIO(zf.read(name))) for name in zf.namelist()}
+
+
+def test_only_selected_pages_named_by_source_page(make_pdf):
+    pdf = make_pdf("a", "b", "c", "d", "e")
+    images = _images(rasterize_pdf_bytes(pdf, dpi=36, fmt="jpg", page_range="2,4-5"))
+    assert sorted(images) == ["page_2.jpg", "page_4.jpg", "page_5.jpg"]
+
+
+@pytest.mark.parametrize("fmt, quality", [("png", 10), ("jpeg", 0), ("webp", 101)])
+def test_out_of_range_quality_is_rejected(make_pdf, fmt, quality):
+    with pytest.raises(ValueError):
+        rasterize_pdf_bytes(make_pdf("a"), dpi=36, fmt=fmt, quality=quality)
+
+
+# WebP has no grayscale mode, its decoder always returns RGB
+@pytest.mark.parametrize("fmt", ["png", "jpeg"])
+def test_grayscale_renders_one_channel(make_pdf, fmt):
+    (image,) = _images(rasterize_pdf_bytes(make_pdf("a"), dpi=36, fmt=fmt, grayscale=True)).values()
+    assert image.mode == "L"
+
+
+def test_alpha_only_when_requested(make_pdf):
+    (image,) = _images(rasterize_pdf_bytes(make_pdf("a"), dpi=36, alpha=True)).values()
+    assert image.mode == "RGBA"
+    (image,) = _images(rasterize_pdf_bytes(make_pdf("a"), dpi=36, fmt="jpeg", alpha=True)).values()
+    assert image.mode == "RGB"
+
+
+def test_max_pixels_caps_resolution(make_pdf):
+    (image,) = _images(rasterize_pdf_bytes(make_pdf("a"), dpi=600, max_pixels=50_000)).values()
+    width, height = image.size
+    assert width * height <= 50_000
+    assert width * height > 40_000
+
+
+def test_no_pages_selected(make_pdf):
+    with pytest.raises(ValueError):
+        rasterize_pdf_bytes(make_pdf("a"), page_range="7")
@@ -0,0 +1,52 @@
+# tests/test_request_session.py
+from sqlalchemy import event
+
+from app.api.routers import pdf as pdf_router
+from app.tests.conftest import engine
+
+def test_one_user_lookup_and_no_connection_during_job(client, auth_headers, make_pdf, monkeypatch):
+    statements = []
+    checked_out = []
+    run_pipeline_bytes = pdf_router.run_pipeline_bytes
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def job(*args, **kwargs):
+        checked_out.append(engine.pool.checkedout())
+        return run_pipeline_bytes(*args, **kwargs)
+
+    monkeypatch.setattr(pdf_router, "run_pipeline_bytes", job)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post(
+            "/pdf/pipeline",
+            files={"file": ("a.pdf", make_pdf("a", "b"))},
+            data={"steps": '[{"op": "remove_pages", "params": {"page_range": "1"}}]'},
+            headers=auth_headers,
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    user_queries = [s for s in statements if s.lstrip().startswith("SELECT") and "FROM users" in s]
+    assert len(user_queries) == 1
+    assert sum(s.lstrip().startswith("INSERT INTO history") for s in statements) == 1
+    # the connection went back to the pool before the PDF work started
+    assert checked_out == [0]
+
+def test_connection_released_without_history_entry(client, auth_headers, make_pdf, monkeypatch):
+    # thumbnails write no history, so nothing else ends the transaction
+    checked_out = []
+    render_thumbnails = pdf_router.render_thumbnails
+
+    def job(*args, **kwargs):
+        checked_out.append(engine.pool.checkedout())
+        return render_thumbnails(*args, **kwargs)
+
+    monkeypatch.setattr(pdf_router, "render_thumbnails", job)
+    response = client.post(
+        "/pdf/thumbnail", files={"file": ("a.pdf", make_pdf("a"))}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert checked_out == [0]
@@ -0,0 +1,63 @@
+# tests/test_scheduler.py
+import asyncio
+
+import pytest
+
+from app.core.admission import AdmissionRejected
+from app.core.scheduler import FairScheduler
+
+
+def test_frontend_job_overtakes_queued_batch():
+    sched = FairScheduler(1, user_limit=1, weights={"frontend": 8, "api": 1})
+    order = []
+
+    async def job(user_id, source, name):
+        async with sched.slot(user_id, source, 10):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        batch = [asyncio.create_task(job(1, "api", f"batch{i}")) for i in range(4)]
+        await asyncio.sleep(0.001)
+        interactive = asyncio.create_task(job(2, "frontend", "interactive"))
+        await asyncio.gather(*batch, interactive)
+
+    asyncio.run(scenario())
+    assert order.index("interactive") <= 1
+    stats = sched.snapshot()
+    assert stats["users"][1]["completed"] == 4
+    assert stats["wait_seconds"]["frontend"]["count"] == 1
+
+
+def test_user_limit_leaves_slots_for_others():
+    sched = FairScheduler(3, user_limit=1)
+
+    async def scenario():
+        await sched.acquire(1, "api", 1)
+        waiting = asyncio.create_task(sched.acquire(1, "api", 1))
+        await asyncio.sleep(0.001)
+        assert not waiting.done()
+        await sched.acquire(2, "api", 1)
+        assert sched.running == 2
+        sched.release(1)
+        await waiting
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_and_timeout_are_rejected():
+    sched = FairScheduler(1, max_queue=1, queue_timeout=0.01, retry_after=3)
+
+    async def scenario():
+        await sched.acquire(1, "api", 1)
+        with pytest.raises(AdmissionRejected) as timed_out:
+            await sched.acquire(2, "api", 1)
+        assert timed_out.value.retry_after == 3
+        waiting = asyncio.create_task(sched.acquire(2, "api", 1))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await sched.acquire(3, "api", 1)
+        waiting.cancel()
+
+    asyncio.run(scenario())
+    assert sched.queued == 0 and sched.rejected == 2
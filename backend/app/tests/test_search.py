@@ -0,0 +1,107 @@
+# tests/test_search.py
+import sqlite3
+
+from app.services.search_service import document_hash, index_document, search
+
+
+def test_index_and_search(tmp_path, make_pdf):
+    index = str(tmp_path / "index.db")
+    pdf = make_pdf("quarterly invoice for ACME", "nothing to see here")
+
+    result = index_document(pdf, "invoice.pdf", user_id=1, path=index)
+    assert result == {"hash": document_hash(pdf), "page_count": 2, "pages_indexed": 2}
+
+    hits = search("invoice", user_id=1, path=index)
+    assert len(hits) == 1
+    assert hits[0]["page"] == 1
+    assert hits[0]["filename"] == "invoice.pdf"
+    assert "[invoice]" in hits[0]["snippet"]
+
+    # iný používateľ dokument nevidí
+    assert search("invoice", user_id=2, path=index) == []
+
+
+def test_reindex_is_incremental(tmp_path, make_pdf):
+    index = str(tmp_path / "index.db")
+    pdf = make_pdf("alpha", "beta")
+
+    index_document(pdf, "a.pdf", user_id=1, path=index)
+    again = index_document(pdf, "a.pdf", user_id=2, path=index)
+    assert again["pages_indexed"] == 0
+    assert len(search("beta", user_id=2, path=index)) == 1
+
+
+def test_search_query_is_escaped(tmp_path, make_pdf):
+    index = str(tmp_path / "index.db")
+    index_document(make_pdf("AND OR NOT"), "ops.pdf", path=index)
+    # operátory a zátvorky sa hľadajú doslovne, nevyhodia syntax error
+    assert len(search('"NOT" (', path=index)) == 1
+    assert search("missing OR not", path=index) == []
+
+
+def test_owner_sees_own_filename(tmp_path, make_pdf):
+    index = str(tmp_path / "index.db")
+    pdf = make_pdf("salary review")
+    index_document(pdf, "mine.pdf", user_id=1, path=index)
+    index_document(pdf, "theirs.pdf", user_id=2, path=index)
+
+    assert search("salary", user_id=1, path=index)[0]["filename"] == "mine.pdf"
+    assert search("salary", user_id=2, path=index)[0]["filename"] == "theirs.pdf"
+
+
+def _headers(client, email):
+    credentials = {"email": email, "password": "secret123"}
+    client.post("/auth/register", json=credentials)
+    response = client.post(
+        "/auth/login",
+        data={"username": credentials["email"], "password": credentials["password"]},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_endpoints_require_login(client):
+    assert client.get("/search/", params={"q": "x"}).status_code == 401
+    assert client.post("/search/index", files={"file": ("a.pdf", b"%PDF-")}).status_code == 401
+
+
+def test_endpoints_are_scoped_to_the_owner(client, auth_headers, admin_headers, make_pdf):
+    other = _headers(client, "search-other@example.com")
+    pdf = make_pdf("confidential merger plan")
+
+    indexed = client.post("/search/index", files={"file": ("plan.pdf", pdf)}, headers=auth_headers)
+    assert indexed.status_code == 200
+    assert indexed.json()["pages_indexed"] == 1
+
+    hits = client.get("/search/", params={"q": "merger"}, headers=auth_headers).json()
+    assert [(h["filename"], h["page"]) for h in hits] == [("plan.pdf", 1)]
+    assert client.get("/search/", params={"q": "merger"}, headers=other).json() == []
+    assert len(client.get("/search/", params={"q": "merger"}, headers=admin_headers).json()) == 1
+
+    # the other user uploading the same content sees only their own name
+    client.post("/search/index", files={"file": ("copy.pdf", pdf)}, headers=other)
+    hits = client.get("/search/", params={"q": "merger"}, headers=other).json()
+    assert [h["filename"] for h in hits] == ["copy.pdf"]
+
+
+def test_extract_text_indexes_for_the_caller(client, auth_headers, make_pdf):
+    other = _headers(client, "search-other@example.com")
+    pdf = make_pdf("extracted quarterly figures")
+    response = client.post(
+        "/pdf/extract-text", files={"file": ("report.pdf", pdf)}, headers=auth_headers
+    )
+    assert response.status_code == 200
+
+    hits = client.get("/search/", params={"q": "quarterly"}, headers=auth_headers).json()
+    assert [h["filename"] for h in hits] == ["report.pdf"]
+    assert client.get("/search/", params={"q": "quarterly"}, headers=other).json() == []
+
+
+def test_index_without_owner_filenames_is_migrated(tmp_path, make_pdf):
+    index = str(tmp_path / "old.db")
+    conn = sqlite3.connect(index)
+    conn.execute("CREATE TABLE document_owners (hash TEXT NOT NULL, user_id INTEGER NOT NULL, "
+                 "PRIMARY KEY (hash, user_id))")
+    conn.close()
+
+    index_document(make_pdf("legacy"), "legacy.pdf", user_id=1, path=index)
+    assert search("legacy", user_id=1, path=index)[0]["filename"] == "legacy.pdf"
@@ -0,0 +1,48 @@
+# tests/test_server.py
+import runpy
+from pathlib import Path
+
+from app.api.utils import compress
+from app.core import server
+from app.core.admission import memory_budget
+from app.core.config import settings
+from app.core.scheduler import scheduler
+
+def test_gunicorn_config_follows_settings(monkeypatch):
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 3)
+    monkeypatch.setattr(settings, "SERVER_MAX_REQUESTS", 500)
+    config = runpy.run_path(str(Path(__file__).parents[2] / "gunicorn.conf.py"))
+    assert config["workers"] == 3
+    assert config["max_requests"] == 500
+    assert config["preload_app"] is True
+    assert config["worker_class"] == "app.core.gunicorn_worker.PdfServiceWorker"
+    assert callable(config["post_fork"])
+    assert callable(config["child_exit"])
+
+def test_forked_workers_split_default_limits(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MEMORY_BUDGET", None)
+    monkeypatch.setattr(settings, "SCHEDULER_WORKERS", 8)
+    monkeypatch.setattr(memory_budget, "limit", 4 * 2**30)
+    monkeypatch.setattr(scheduler, "workers", 8)
+    monkeypatch.setattr(scheduler, "user_limit", 2)
+    monkeypatch.setattr(compress, "POOL_WORKERS", 8)
+
+    server.init_worker(4)
+
+    assert memory_budget.limit == 2**30
+    # configured explicitly, so left as it is
+    assert scheduler.workers == 8
+    assert compress.POOL_WORKERS == 2
+    # a user gets at most one job per worker, not two on each
+    assert scheduler.user_limit == 1
+
+def test_metrics_dir_is_emptied_and_exported(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setenv("METRICS_DIR", "")
+    (tmp_path / "4242.json").write_text("{}")
+    assert server.prepare_metrics_dir() == str(tmp_path)
+    assert list(tmp_path.glob("*.json")) == []
+    assert server.os.environ["METRICS_DIR"] == str(tmp_path)
+
+def test_resident_memory():
+    assert server.resident_memory() > 0
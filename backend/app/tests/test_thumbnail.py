@@ -0,0 +1,78 @@
+# tests/test_thumbnail.py
+from io import BytesIO
+from zipfile import ZipFile
+
+from PIL import Image
+
+from app.api.utils.thumbnail import ThumbnailCache, render_thumbnails, thumbnail_cache
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ThumbnailCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"   # a is now the most recent
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.size == 8
+    cache.put("big", b"x" * 11)          # larger than the whole cache
+    assert cache.get("big") is None
+
+
+def test_quality_is_part_of_the_key(make_pdf):
+    pdf = make_pdf("one")
+    low = render_thumbnails(pdf, "doc-q", [0], size=200, fmt="jpeg", quality=5)[0]
+    high = render_thumbnails(pdf, "doc-q", [0], size=200, fmt="jpeg", quality=95)[0]
+    assert low != high
+
+
+def test_endpoint_and_cached_lookup(client, auth_headers, make_pdf):
+    pdf = make_pdf("one", "two", "three")
+    response = client.post(
+        "/pdf/thumbnail",
+        files={"file": ("a.pdf", pdf)},
+        data={"page_range": "2", "size": 128, "format": "png"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert max(Image.open(BytesIO(response.content)).size) == 128
+    doc_hash = response.headers["x-document-hash"]
+
+    hits = thumbnail_cache.hits
+    cached = client.get(
+        f"/pdf/thumbnail/{doc_hash}/2", params={"size": 128, "format": "png"},
+        headers=auth_headers,
+    )
+    assert cached.status_code == 200 and cached.content == response.content
+    assert thumbnail_cache.hits == hits + 1
+
+    missing = client.get(f"/pdf/thumbnail/{doc_hash}/3", headers=auth_headers)
+    assert missing.status_code == 404
+
+    several = client.post(
+        "/pdf/thumbnail",
+        files={"file": ("a.pdf", pdf)},
+        data={"page_range": "1-3", "format": "webp"},
+        headers=auth_headers,
+    )
+    assert sorted(ZipFile(BytesIO(several.content)).namelist()) == [
+        "page_1.webp", "page_2.webp", "page_3.webp",
+    ]
+
+
+def test_cached_lookup_is_limited_to_uploaders(client, auth_headers, admin_headers, make_pdf):
+    pdf = make_pdf("private")
+    response = client.post(
+        "/pdf/thumbnail", files={"file": ("a.pdf", pdf)}, data={"format": "png"}, headers=auth_headers
+    )
+    url = f"/pdf/thumbnail/{response.headers['x-document-hash']}/1"
+
+    # another user who knows the hash sees the same 404 as for an unknown document
+    assert client.get(url, params={"format": "png"}, headers=admin_headers).status_code == 404
+    assert client.get(url, params={"format": "png"}, headers=auth_headers).status_code == 200
+
+    # uploading the document makes them an owner too
+    client.post("/pdf/thumbnail", files={"file": ("b.pdf", pdf)}, data={"format": "png"}, headers=admin_headers)
+    assert client.get(url, params={"format": "png"}, headers=admin_headers).status_code == 200
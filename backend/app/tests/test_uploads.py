@@ -0,0 +1,126 @@
+# tests/test_uploads.py
+import hashlib
+import json
+import shutil
+
+import pytest
+
+from app.core.config import settings
+from app.services import upload_service
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+
+def _create(client, headers, data, filename="big.pdf"):
+    response = client.post(
+        "/pdf/uploads", json={"filename": filename, "size": len(data)}, headers=headers
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+def _put(client, headers, upload_id, data, offset):
+    return client.put(
+        f"/pdf/uploads/{upload_id}", params={"offset": offset}, content=data, headers=headers
+    )
+
+def test_chunks_in_any_order(client, auth_headers, admin_headers, make_pdf):
+    pdf = make_pdf("first", "second", "third")
+    upload_id = _create(client, auth_headers, pdf)
+    third = len(pdf) // 3
+
+    # the last chunks first, as parallel or retried requests may arrive
+    assert _put(client, auth_headers, upload_id, pdf[2 * third:], 2 * third).status_code == 200
+    status = _put(client, auth_headers, upload_id, pdf[third:2 * third], third).json()
+    assert status["received"] == len(pdf) - third
+    assert status["missing"] == [[0, third]]
+
+    early = client.post(f"/pdf/uploads/{upload_id}/finalize", headers=auth_headers)
+    assert early.status_code == 409
+
+    _put(client, auth_headers, upload_id, pdf[:third], 0)
+    assert client.get(f"/pdf/uploads/{upload_id}", headers=auth_headers).json()["missing"] == []
+    # not visible to other users
+    assert client.get(f"/pdf/uploads/{upload_id}", headers=admin_headers).status_code == 404
+
+    final = client.post(
+        f"/pdf/uploads/{upload_id}/finalize",
+        json={"sha256": hashlib.sha256(pdf).hexdigest()},
+        headers=auth_headers,
+    ).json()
+    assert final["finalized"] and final["page_count"] == 3
+    assert final["sha256"] == hashlib.sha256(pdf).hexdigest()
+
+    text = client.post("/pdf/extract-text", data={"upload_id": upload_id}, headers=auth_headers)
+    assert text.status_code == 200
+    assert "second" in text.json()["text"]
+
+    for low_memory in ("false", "true"):
+        merged = client.post(
+            "/pdf/merge-pdf",
+            files=[("files", ("a.pdf", make_pdf("extra")))],
+            data={"upload_ids": upload_id, "low_memory": low_memory},
+            headers=auth_headers,
+        )
+        assert merged.status_code == 200
+
+    assert client.delete(f"/pdf/uploads/{upload_id}", headers=auth_headers).status_code == 204
+    gone = client.post("/pdf/extract-text", data={"upload_id": upload_id}, headers=auth_headers)
+    assert gone.status_code == 404
+
+def test_rejected_uploads(client, auth_headers, make_pdf):
+    pdf = make_pdf("a")
+    upload_id = _create(client, auth_headers, pdf)
+    assert _put(client, auth_headers, upload_id, pdf + b"tail", 0).status_code == 400
+    _put(client, auth_headers, upload_id, pdf, 0)
+    mismatch = client.post(
+        f"/pdf/uploads/{upload_id}/finalize", json={"sha256": "0" * 64}, headers=auth_headers
+    )
+    assert mismatch.status_code == 422
+
+    broken = pdf[: len(pdf) // 2]
+    upload_id = _create(client, auth_headers, broken)
+    _put(client, auth_headers, upload_id, broken, 0)
+    response = client.post(f"/pdf/uploads/{upload_id}/finalize", headers=auth_headers)
+    assert response.status_code == 400
+    assert "trailer" in response.json()["detail"]
+    assert client.get(f"/pdf/uploads/{upload_id}", headers=auth_headers).status_code == 404
+
+    not_finalized = _create(client, auth_headers, pdf)
+    response = client.post("/pdf/compress-pdf", data={"upload_id": not_finalized}, headers=auth_headers)
+    assert response.status_code == 409
+    assert client.post("/pdf/compress-pdf", headers=auth_headers).status_code == 400
+
+def test_quota_of_open_uploads(client, auth_headers, admin_headers, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_PER_USER", 2)
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES_PER_USER", 1000)
+    first = _create(client, auth_headers, b"x" * 400)
+    _create(client, auth_headers, b"x" * 400)
+
+    def create(headers, size):
+        return client.post("/pdf/uploads", json={"filename": "c.pdf", "size": size}, headers=headers)
+
+    assert create(auth_headers, 100).status_code == 429
+    # other users have their own quota
+    assert create(admin_headers, 100).status_code == 201
+
+    client.delete(f"/pdf/uploads/{first}", headers=auth_headers)
+    assert create(auth_headers, 700).status_code == 413
+    assert create(auth_headers, 600).status_code == 201
+
+def test_running_hashes_are_evicted(client, auth_headers, make_pdf, tmp_path):
+    pdf = make_pdf("a")
+    removed = _create(client, auth_headers, pdf)
+    finalized = _create(client, auth_headers, pdf)
+    _put(client, auth_headers, removed, pdf[:10], 0)
+    _put(client, auth_headers, finalized, pdf[:10], 0)
+    assert {removed, finalized} <= set(upload_service._hashes)
+
+    # deleted and finalized by another worker, which this one never hears of
+    shutil.rmtree(tmp_path / removed)
+    meta_path = tmp_path / finalized / "meta.json"
+    meta = json.loads(meta_path.read_text())
+    meta_path.write_text(json.dumps({**meta, "sha256": "0" * 64}))
+
+    upload_service.prune_uploads()
+    assert not {removed, finalized} & set(upload_service._hashes)
@@ -0,0 +1,84 @@
+"""
+Synthetic PDF corpora for the benchmarks, generated locally so no
+customer files are needed. Every generator is deterministic for a given
+scale, so results of different runs are comparable.
+"""
+import random
+from io import BytesIO
+from typing import Callable, Dict
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+# scale → multiplier of the page count (and image count)
+SCALES = {"small": 1, "medium": 8, "large": 40}
+
+_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam"
+).split()
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+def _photo(rng: random.Random, width: int, height: int) -> bytes:
+    # noise compresses badly, like real photos; seeded for repeatability
+    img = Image.effect_noise((width, height), 40 + rng.randint(0, 20)).convert("RGB")
+    buf = BytesIO()
+    img.save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+def text_heavy(scale: int) -> bytes:
+    """Dense text pages with embedded font use, 5 pages per scale unit."""
+    rng = random.Random(1)
+    doc = fitz.open()
+    for _ in range(5 * scale):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 545, 790), _paragraph(rng, 600), fontsize=9)
+    return doc.tobytes()
+
+def image_heavy(scale: int) -> bytes:
+    """Pages with two distinct high-resolution photos each."""
+    rng = random.Random(2)
+    doc = fitz.open()
+    for _ in range(2 * scale):
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(50, 50, 545, 400), stream=_photo(rng, 1200, 850))
+        page.insert_image(fitz.Rect(50, 420, 545, 790), stream=_photo(rng, 1200, 900))
+    return doc.tobytes()
+
+def many_pages(scale: int) -> bytes:
+    """Many short pages, 100 per scale unit."""
+    doc = fitz.open()
+    for number in range(100 * scale):
+        doc.new_page().insert_text((72, 72), f"Page {number + 1}")
+    return doc.tobytes()
+
+def huge_page(scale: int) -> bytes:
+    """Poster-sized pages (A0) with vector content, 2 per scale unit."""
+    doc = fitz.open()
+    for _ in range(2 * scale):
+        page = doc.new_page(width=2384, height=3370)
+        for i in range(0, 2384, 40):
+            page.draw_line((i, 0), (2384 - i, 3370), color=(i / 2384, 0.2, 0.5))
+        page.insert_text((100, 200), "Poster", fontsize=200)
+    return doc.tobytes()
+
+def mixed_sizes(scale: int) -> bytes:
+    """Pages alternating between A4, Letter, A3 landscape and A5."""
+    rng = random.Random(3)
+    sizes = [(595, 842), (612, 792), (1191, 842), (420, 595)]
+    doc = fitz.open()
+    for number in range(12 * scale):
+        width, height = sizes[number % len(sizes)]
+        page = doc.new_page(width=width, height=height)
+        page.insert_textbox(fitz.Rect(36, 36, width - 36, height - 36), _paragraph(rng, 150), fontsize=10)
+    return doc.tobytes()
+
+CORPORA: Dict[str, Callable[[int], bytes]] = {
+    "text_heavy": text_heavy,
+    "image_heavy": image_heavy,
+    "many_pages": many_pages,
+    "huge_page": huge_page,
+    "mixed_sizes": mixed_sizes,
+}
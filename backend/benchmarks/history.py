@@ -0,0 +1,328 @@
+"""
+History-store benchmark at production scale.
+
+    python -m benchmarks.history generate --rows 5000000 --users 20000
+    python -m benchmarks.history run --offsets 0,10000,1000000 --writers 8
+    python -m benchmarks.history run --purge        # deletes every row!
+
+Both commands use DATABASE_URL (or --database-url), so the same data can
+be generated into a local Postgres or a SQLite file (default
+sqlite:///./history_bench.db). Never point them at a production database:
+`generate` adds users and `run --purge` empties the history table.
+
+`generate` writes users with a skewed activity distribution and history
+rows with actions, sources, locations and timestamps spread over --days,
+in batches (COPY on Postgres, executemany elsewhere). Actions follow an
+assumed mix (ACTIONS) unless --actions-from names a CSV export of a
+real history (GET /history/export), whose action frequencies are used.
+
+`run` calls the history endpoints' functions directly on a session, so
+the numbers are the database and serialization cost without HTTP:
+page latency of full_history at deep offsets, export_history_csv
+throughput and traced peak memory, insert throughput of concurrent
+writers committing one row per request like log_action, and optionally
+the duration of delete_history.
+"""
+import argparse
+import asyncio
+import collections
+import csv
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./history_bench.db")
+os.environ.setdefault("JWT_SECRET", "benchmark")
+
+from sqlalchemy import create_engine, func  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.api.routers.history import delete_history, export_history_csv, full_history  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.models.history import History  # noqa: E402
+from app.db.models.user import Role, User  # noqa: E402
+
+# (action, relative frequency): an assumed mix, not measured; pass
+# --actions-from with a history export to use real frequencies
+ACTIONS = [
+    ("merge_pdf", 20), ("compress_pdf", 18), ("split_pdf", 12), ("extract_text", 12),
+    ("pdf_to_jpg", 9), ("pdf_to_png", 7), ("remove_pages", 7), ("add_text_watermark", 6),
+    ("extract_images", 4), ("n_up", 3), ("pipeline", 2),
+]
+LOCATIONS = [
+    ("Bratislava", "Slovakia"), ("Košice", "Slovakia"), ("Žilina", "Slovakia"),
+    ("Prague", "Czechia"), ("Brno", "Czechia"), ("Vienna", "Austria"),
+    ("Budapest", "Hungary"), ("Kraków", "Poland"), ("Berlin", "Germany"),
+    (None, None),
+]
+# one bcrypt hash shared by all generated users; hashing millions of
+# passwords would dominate the run ("benchmark")
+PASSWORD_HASH = "$2b$12$Deo2mW0N.W8jT85EnJ4cFO.f5NgKKPbZiQ3ywcq1sxVMaw6Eu7e1e"
+
+def _session_factory(url: Optional[str]):
+    engine = create_engine(url or os.environ["DATABASE_URL"])
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _ensure_users(db, count: int) -> List[int]:
+    role = db.query(Role).filter_by(name="user").first()
+    if role is None:
+        role = Role(name="user")
+        db.add(role)
+        db.commit()
+    existing = db.query(func.count(User.id)).filter(User.email.like("bench-%")).scalar()
+    if existing < count:
+        db.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "email": f"bench-{n}@example.com",
+                    "hashed_password": PASSWORD_HASH,
+                    "is_active": True,
+                    "role_id": role.id,
+                }
+                for n in range(existing, count)
+            ],
+        )
+        db.commit()
+    return [
+        row[0] for row in db.query(User.id).filter(User.email.like("bench-%")).limit(count)
+    ]
+
+def load_action_mix(path: str) -> List[Tuple[str, int]]:
+    """(action, count) pairs of a history CSV export."""
+    with open(path, newline="", encoding="utf-8") as fh:
+        counts = collections.Counter(row["action"] for row in csv.DictReader(fh))
+    if not counts:
+        raise ValueError(f"{path} has no history rows")
+    return counts.most_common()
+
+def _rows(
+    user_ids: List[int],
+    count: int,
+    days: int,
+    seed: int,
+    mix: Sequence[Tuple[str, int]] = ACTIONS,
+) -> Iterator[Dict]:
+    rng = random.Random(seed)
+    actions = [a for a, _ in mix]
+    weights = [w for _, w in mix]
+    # a few heavy users (integrations) and a long tail of occasional ones
+    activity = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(user_ids))))
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    step = days * 86400 / max(count, 1)
+    for n in range(count):
+        city, country = rng.choice(LOCATIONS)
+        yield {
+            "user_id": rng.choices(user_ids, cum_weights=activity)[0],
+            "action": rng.choices(actions, weights=weights)[0],
+            "source": "frontend" if rng.random() < 0.7 else "api",
+            "city": city,
+            "country": country,
+            "timestamp": start + timedelta(seconds=n * step + rng.random() * step),
+        }
+
+def _copy_postgres(connection, batch: List[Dict]) -> None:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in batch:
+        writer.writerow([
+            row["user_id"], row["action"], row["source"],
+            row["city"] or "", row["country"] or "", row["timestamp"].isoformat(),
+        ])
+    buf.seek(0)
+    with connection.connection.cursor() as cursor:
+        cursor.copy_expert(
+            "COPY history (user_id, action, source, city, country, timestamp) "
+            "FROM STDIN WITH (FORMAT csv, NULL '')",
+            buf,
+        )
+
+def generate(args) -> Dict:
+    engine, Session = _session_factory(args.database_url)
+    with Session() as db:
+        user_ids = _ensure_users(db, args.users)
+
+    started = time.perf_counter()
+    written = 0
+    batch: List[Dict] = []
+    with engine.begin() as connection:
+        mix = load_action_mix(args.actions_from) if args.actions_from else ACTIONS
+        for row in _rows(user_ids, args.rows, args.days, args.seed, mix):
+            batch.append(row)
+            if len(batch) == args.batch:
+                written += _flush(engine, connection, batch)
+                batch = []
+                print(f"{written} rows, {written / (time.perf_counter() - started):.0f} rows/s", end="\r")
+        if batch:
+            written += _flush(engine, connection, batch)
+    seconds = time.perf_counter() - started
+    print(f"\ninserted {written} history rows for {len(user_ids)} users in {seconds:.1f} s")
+    return {"benchmark": "generate", "rows": written, "seconds": seconds,
+            "rows_per_second": written / seconds if seconds else 0.0}
+
+def _flush(engine, connection, batch: List[Dict]) -> int:
+    if engine.dialect.name == "postgresql":
+        _copy_postgres(connection, batch)
+    else:
+        connection.execute(History.__table__.insert(), batch)
+    return len(batch)
+
+def bench_pages(Session, offsets: List[int], limit: int, repeat: int) -> List[Dict]:
+    results = []
+    with Session() as db:
+        for offset in offsets:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                rows = full_history(db=db, limit=limit, offset=offset)
+                timings.append(time.perf_counter() - started)
+            results.append({
+                "benchmark": "history_page",
+                "offset": offset,
+                "limit": limit,
+                "rows": len(rows),
+                "seconds": min(timings),
+            })
+            print(f"page at offset {offset}: {min(timings) * 1000:.1f} ms")
+    return results
+
+async def _consume(response) -> int:
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size
+
+def bench_export(Session, trace: bool = True) -> Dict:
+    """Timed untraced; the traced peak comes from a second export."""
+    peak = None
+    with Session() as db:
+        rows = db.query(func.count(History.id)).scalar()
+        started = time.perf_counter()
+        size = asyncio.run(_consume(export_history_csv(db=db)))
+        seconds = time.perf_counter() - started
+        if trace:
+            tracemalloc.start()
+            try:
+                asyncio.run(_consume(export_history_csv(db=db)))
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+    traced = f", peak {peak / 2**20:.1f} MiB" if peak is not None else ""
+    print(f"export of {rows} rows: {seconds:.2f} s, {size / 2**20:.1f} MiB{traced}")
+    return {
+        "benchmark": "export_csv",
+        "rows": rows,
+        "bytes": size,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else 0.0,
+        "peak_bytes": peak,
+    }
+
+def bench_inserts(Session, writers: int, duration: float, user_ids: List[int]) -> Dict:
+    """Concurrent writers committing one row each, as log_action does per request."""
+    counts = [0] * writers
+    latencies: List[float] = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def writer(number: int) -> None:
+        rng = random.Random(number)
+        local = []
+        with Session() as db:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                db.add(History(
+                    user_id=rng.choice(user_ids), action="merge_pdf", source="api",
+                    city="Bratislava", country="Slovakia",
+                    timestamp=datetime.now(timezone.utc),
+                ))
+                db.commit()
+                local.append(time.perf_counter() - started)
+                counts[number] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = sum(counts)
+    latencies.sort()
+    result = {
+        "benchmark": "concurrent_inserts",
+        "writers": writers,
+        "rows": total,
+        "seconds": duration,
+        "rows_per_second": total / duration,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None,
+    }
+    print(f"{writers} writers: {result['rows_per_second']:.0f} rows/s")
+    return result
+
+def bench_purge(Session) -> Dict:
+    with Session() as db:
+        rows = db.query(func.count(History.id)).scalar()
+        started = time.perf_counter()
+        delete_history(db=db)
+        seconds = time.perf_counter() - started
+    print(f"purge of {rows} rows: {seconds:.2f} s")
+    return {"benchmark": "purge", "rows": rows, "seconds": seconds}
+
+def run(args) -> List[Dict]:
+    _, Session = _session_factory(args.database_url)
+    with Session() as db:
+        user_ids = [row[0] for row in db.query(User.id).limit(1000)]
+    if not user_ids:
+        raise SystemExit("No users in the database; run `generate` first")
+    offsets = [int(o) for o in args.offsets.split(",")]
+    results = bench_pages(Session, offsets, args.limit, args.repeat)
+    results.append(bench_export(Session, not args.no_trace))
+    if args.writers:
+        results.append(bench_inserts(Session, args.writers, args.insert_seconds, user_ids))
+    if args.purge:
+        results.append(bench_purge(Session))
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", help="default: DATABASE_URL")
+    parser.add_argument("--output", help="write results as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="bulk-insert synthetic users and history")
+    gen.add_argument("--rows", type=int, default=1_000_000)
+    gen.add_argument("--users", type=int, default=5000)
+    gen.add_argument("--days", type=int, default=365)
+    gen.add_argument("--batch", type=int, default=50_000)
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--actions-from", help="history CSV export whose action mix to reproduce")
+
+    bench = commands.add_parser("run", help="measure the history endpoints")
+    bench.add_argument("--offsets", default="0,1000,100000,1000000")
+    bench.add_argument("--limit", type=int, default=100)
+    bench.add_argument("--repeat", type=int, default=3)
+    bench.add_argument("--writers", type=int, default=8, help="0 skips the insert benchmark")
+    bench.add_argument("--insert-seconds", type=float, default=5.0)
+    bench.add_argument("--no-trace", action="store_true", help="skip the traced export run")
+    bench.add_argument("--purge", action="store_true", help="also time delete_history (deletes all rows)")
+
+    args = parser.parse_args(argv)
+    results = [generate(args)] if args.command == "generate" else run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump({"results": results}, fh, indent=1, default=str)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+"""
+Load generator for the whole application.
+
+    python -m benchmarks.load --users 20 --duration 60
+    python -m benchmarks.load --url http://localhost:8000/api/v1 --rate 15
+    python -m benchmarks.load geo-stub --port 8765
+
+By default the real `app.main:app` runs in-process behind httpx's ASGI
+transport, with its own SQLite database (override DATABASE_URL to use
+Postgres). With --url the requests go to a running server instead.
+
+Virtual users log in and then pick scenarios (tool calls on the
+synthetic corpus, history browsing, logins) according to --mix. With
+--users N each user sends its next request as soon as the previous one
+finished (closed loop); with --rate R requests arrive as a Poisson
+process of R per second regardless of how fast the server answers (open
+loop), which is what shows the saturation point.
+
+Client IPs are drawn from a pool of public addresses, so every tool call
+also goes through the geo lookup of the history log. A local stand-in
+answers those lookups (with --geo-latency); a remote server has to be
+started with GEO_ENDPOINT pointing at `geo-stub`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.corpus import CORPORA
+
+ADMIN_EMAIL = "load-admin@example.com"
+ADMIN_PASSWORD = "load-admin-secret"
+
+DEFAULT_MIX = (
+    "extract_text=4,compress=2,thumbnail=4,to_png=1,split=2,"
+    "watermark=2,history=1,login=1"
+)
+
+def _geo_handler(latency: float):
+    class GeoHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            body = json.dumps({"city": "Bratislava", "country_name": "Slovakia"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return GeoHandler
+
+def start_geo_stub(port: int = 0, latency: float = 0.05) -> ThreadingHTTPServer:
+    """Serve ipapi.co-like answers on localhost from a daemon thread."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _geo_handler(latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _public_ips(count: int, rng: random.Random) -> List[str]:
+    return [
+        f"{rng.choice((31, 46, 81, 85, 91, 178, 193))}.{rng.randint(0, 255)}."
+        f"{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        for _ in range(count)
+    ]
+
+@dataclass
+class Stats:
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+    statuses: Dict[int, int] = field(default_factory=dict)
+    rss_samples: List[int] = field(default_factory=list)
+
+    def record(self, scenario: str, seconds: float, status: int) -> None:
+        self.latencies.setdefault(scenario, []).append(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status >= 400:
+            self.errors[scenario] = self.errors.get(scenario, 0) + 1
+
+def _percentile(values: List[float], q: float) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, mix: Dict[str, float], seed: int = 0):
+        self.client = client
+        self.mix = mix
+        self.rng = random.Random(seed)
+        self.ips = _public_ips(500, self.rng)
+        self.stats = Stats()
+        self.files = {
+            name: CORPORA[name](1) for name in ("text_heavy", "image_heavy", "mixed_sizes")
+        }
+        self.tokens: List[str] = []
+        self.admin_token: Optional[str] = None
+        self.scenarios: Dict[str, Callable] = {
+            "login": self._login,
+            "extract_text": self._extract_text,
+            "compress": self._compress,
+            "thumbnail": self._thumbnail,
+            "to_png": self._to_png,
+            "split": self._split,
+            "watermark": self._watermark,
+            "history": self._history,
+        }
+        unknown = set(mix) - set(self.scenarios)
+        if unknown:
+            raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    def _headers(self, token: str) -> Dict[str, str]:
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "X-Forwarded-For": self.rng.choice(self.ips),
+        }
+        if self.rng.random() < 0.7:
+            headers["Referer"] = "http://localhost:3000/tools"
+        return headers
+
+    async def _token(self, email: str, password: str) -> str:
+        response = await self.client.post(
+            "/auth/login", data={"username": email, "password": password}
+        )
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+    async def setup(self, users: int) -> None:
+        for number in range(users):
+            email = f"load-user-{number}@example.com"
+            await self.client.post("/auth/register", json={"email": email, "password": "secret123"})
+            self.tokens.append(await self._token(email, "secret123"))
+        try:
+            self.admin_token = await self._token(ADMIN_EMAIL, ADMIN_PASSWORD)
+        except httpx.HTTPStatusError:
+            # history browsing needs the seeded admin
+            self.mix.pop("history", None)
+
+    async def _login(self, user: int):
+        return await self.client.post(
+            "/auth/login",
+            data={"username": f"load-user-{user}@example.com", "password": "secret123"},
+        )
+
+    async def _tool(self, user: int, path: str, corpus: str, data: Dict):
+        return await self.client.post(
+            path,
+            files={"file": (f"{corpus}.pdf", self.files[corpus], "application/pdf")},
+            data=data,
+            headers=self._headers(self.tokens[user]),
+        )
+
+    async def _extract_text(self, user: int):
+        return await self._tool(user, "/pdf/extract-text", "text_heavy", {})
+
+    async def _compress(self, user: int):
+        return await self._tool(user, "/pdf/compress-pdf", "image_heavy", {"profile": "ebook"})
+
+    async def _thumbnail(self, user: int):
+        return await self._tool(user, "/pdf/thumbnail", "mixed_sizes", {"page_range": "1-4"})
+
+    async def _to_png(self, user: int):
+        return await self._tool(user, "/pdf/pdf-to-png", "text_heavy", {"dpi": "96", "page_range": "1-2"})
+
+    async def _split(self, user: int):
+        return await self._tool(
+            user, "/pdf/split-pdf", "mixed_sizes", {"split_method": "interval", "interval": "3"}
+        )
+
+    async def _watermark(self, user: int):
+        return await self._tool(user, "/pdf/add-text-watermark", "text_heavy", {"text": "DRAFT"})
+
+    async def _history(self, user: int):
+        return await self.client.get(
+            "/history/",
+            params={"limit": 50, "offset": self.rng.randint(0, 200)},
+            headers={"Authorization": f"Bearer {self.admin_token}"},
+        )
+
+    def _pick(self) -> str:
+        names = list(self.mix)
+        return self.rng.choices(names, weights=[self.mix[n] for n in names])[0]
+
+    async def one(self, user: int) -> None:
+        scenario = self._pick()
+        started = time.perf_counter()
+        try:
+            response = await self.scenarios[scenario](user)
+            # read streamed bodies completely, as a browser would
+            await response.aread()
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 599
+        self.stats.record(scenario, time.perf_counter() - started, status)
+
+    async def closed_loop(self, users: int, deadline: float) -> None:
+        async def user_loop(user: int):
+            while time.monotonic() < deadline:
+                await self.one(user)
+
+        await asyncio.gather(*(user_loop(u) for u in range(users)))
+
+    async def open_loop(self, rate: float, deadline: float) -> None:
+        pending = set()
+        while time.monotonic() < deadline:
+            task = asyncio.create_task(self.one(self.rng.randrange(len(self.tokens))))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            await asyncio.sleep(self.rng.expovariate(rate))
+        await asyncio.gather(*pending)
+
+def _self_rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+async def _remote_rss(client: httpx.AsyncClient) -> Optional[int]:
+    response = await client.get("/metrics")
+    for line in response.text.splitlines():
+        if line.startswith("process_resident_memory_bytes "):
+            return int(float(line.split()[1]))
+    return None
+
+async def _sample_rss(test: LoadTest, read: Callable, interval: float = 0.5) -> None:
+    while True:
+        rss = await read()
+        if rss:
+            test.stats.rss_samples.append(rss)
+        await asyncio.sleep(interval)
+
+def report(stats: Stats, elapsed: float) -> Dict:
+    total = sum(len(v) for v in stats.latencies.values())
+    scenarios = {}
+    for name, values in sorted(stats.latencies.items()):
+        scenarios[name] = {
+            "requests": len(values),
+            "errors": stats.errors.get(name, 0),
+            "p50_ms": _percentile(values, 50) * 1000,
+            "p95_ms": _percentile(values, 95) * 1000,
+            "p99_ms": _percentile(values, 99) * 1000,
+        }
+    return {
+        "seconds": elapsed,
+        "requests": total,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "error_rate": sum(stats.errors.values()) / total if total else 0.0,
+        "statuses": stats.statuses,
+        "rss_max_bytes": max(stats.rss_samples, default=None),
+        "rss_last_bytes": stats.rss_samples[-1] if stats.rss_samples else None,
+        "scenarios": scenarios,
+    }
+
+def _print_report(result: Dict) -> None:
+    print(
+        f"{result['requests']} requests in {result['seconds']:.1f} s, "
+        f"{result['throughput_rps']:.1f} req/s, errors {result['error_rate']:.1%}, "
+        f"statuses {result['statuses']}"
+    )
+    if result["rss_max_bytes"]:
+        print(f"server RSS max {result['rss_max_bytes'] / 2**20:.0f} MiB")
+    print(f"{'scenario':<14}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, s in result["scenarios"].items():
+        print(
+            f"{name:<14}{s['requests']:>9}{s['errors']:>8}"
+            f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+        )
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def _prepare_in_process(geo_latency: float):
+    """Configure and import the app; returns (app, geo stub server)."""
+    os.environ.setdefault("DATABASE_URL", "sqlite:///./loadtest.db")
+    os.environ.setdefault("JWT_SECRET", "load-test")
+    os.environ.setdefault("INIT_ADMIN_EMAIL", ADMIN_EMAIL)
+    os.environ.setdefault("INIT_ADMIN_PASSWORD", ADMIN_PASSWORD)
+    os.environ.setdefault("API_PREFIX", "")
+
+    geo = start_geo_stub(latency=geo_latency)
+    os.environ.setdefault("GEO_ENDPOINT", f"http://127.0.0.1:{geo.server_port}/{{ip}}/json/")
+
+    from app.db.base import Base
+    from app.db.session import engine
+    from app.main import app
+
+    Base.metadata.create_all(bind=engine)
+    return app, geo
+
+async def main_async(args) -> Dict:
+    mix = _parse_mix(args.mix)
+    deadline_after = args.duration
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        test = LoadTest(client, mix, args.seed)
+        read_rss = lambda: _remote_rss(client)  # noqa: E731
+        lifespan = None
+    else:
+        app, _ = _prepare_in_process(args.geo_latency)
+        from app.core.config import settings
+
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url=f"http://loadtest{settings.API_PREFIX}",
+            timeout=args.timeout,
+        )
+        test = LoadTest(client, mix, args.seed)
+
+        async def read_rss():
+            return _self_rss()
+
+        lifespan = app.router.lifespan_context(app)
+
+    async with client:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            await test.setup(args.users)
+            sampler = asyncio.create_task(_sample_rss(test, read_rss))
+            started = time.monotonic()
+            deadline = started + deadline_after
+            if args.rate:
+                await test.open_loop(args.rate, deadline)
+            else:
+                await test.closed_loop(args.users, deadline)
+            elapsed = time.monotonic() - started
+            sampler.cancel()
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+    return report(test.stats, elapsed)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["geo-stub"]:
+        parser = argparse.ArgumentParser(prog="benchmarks.load geo-stub")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0.05)
+        args = parser.parse_args(argv[1:])
+        server = start_geo_stub(args.port, args.latency)
+        print(f"geo stand-in on http://127.0.0.1:{server.server_port}/{{ip}}/json/")
+        threading.Event().wait()
+        return 0
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="base URL of a running server (incl. API prefix)")
+    parser.add_argument("--users", type=int, default=10, help="virtual users")
+    parser.add_argument("--rate", type=float, help="open loop: requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight,…")
+    parser.add_argument("--geo-latency", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(main_async(args))
+    _print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
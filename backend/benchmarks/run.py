@@ -0,0 +1,255 @@
+"""
+Time and memory benchmarks of the PDF utilities.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --quick --baseline benchmarks/baseline.json --threshold 0.25
+
+Every case (operation × engine × corpus × scale) runs `--repeat` times
+without tracing and reports the fastest run, then once under tracemalloc
+for the peak of Python allocations (memory allocated inside MuPDF is not
+traced). Results are written as
+
+    {"meta": {...}, "results": [{"operation", "engine", "corpus", "scale",
+                                 "input_bytes", "seconds", "peak_bytes"}, ...]}
+
+which is also the file PDF_ENGINE=auto reads (PDF_ENGINE_BENCHMARKS).
+With --baseline the run fails (exit status 1) when a case is slower or
+uses more memory than the baseline by more than the thresholds; a
+results file of an earlier run serves as the baseline.
+benchmarks/baseline.json is a --quick run of the whole suite; timings
+depend on the machine, so regenerate it on the machine that compares
+against it (its "meta" says where it was made).
+"""
+import argparse
+import json
+import os
+from io import BytesIO
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# the utilities import the application settings, which require these
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("JWT_SECRET", "benchmark")
+
+from app.api.utils.compress import shutdown_pool  # noqa: E402
+from app.api.utils.cost import estimate_raster_cost  # noqa: E402
+from app.api.utils.engines import OPERATIONS  # noqa: E402
+from app.api.utils.engines.selection import ENGINES  # noqa: E402
+from app.api.utils.merge_pdf import merge_pdf_files  # noqa: E402
+from app.api.utils.optimize import optimize_pdf  # noqa: E402
+from app.api.utils.pipeline import run_pipeline_bytes  # noqa: E402
+from app.api.utils.preflight import preflight_pdf  # noqa: E402
+from app.api.utils.thumbnail import render_thumbnails, thumbnail_cache  # noqa: E402
+from app.services.search_service import document_hash  # noqa: E402
+from benchmarks.corpus import CORPORA, SCALES  # noqa: E402
+
+# engine label of utilities that are not part of an engine
+UTILITY = "util"
+
+# operation → function(engine, pdf) running it with representative parameters
+ENGINE_CALLS: Dict[str, Callable] = {
+    "merge": lambda e, pdf: e.merge([pdf, pdf]),
+    "extract_text": lambda e, pdf: e.extract_text(pdf),
+    "extract_images": lambda e, pdf: e.extract_images(pdf),
+    "remove_pages": lambda e, pdf: e.remove_pages(pdf, "1"),
+    "split_range": lambda e, pdf: e.split_range(pdf, "1"),
+    "split_interval": lambda e, pdf: e.split_interval(pdf, 2),
+    "extract_pages": lambda e, pdf: e.extract_pages(pdf, "odd"),
+    "compress": lambda e, pdf: e.compress(pdf, profile="ebook"),
+    "add_text_watermark": lambda e, pdf: e.add_text_watermark(pdf, "DRAFT"),
+    "n_up": lambda e, pdf: e.n_up(pdf, cols=2, rows=2),
+    "to_png": lambda e, pdf: e.to_png(pdf, dpi=72),
+    "to_jpg": lambda e, pdf: e.to_jpg(pdf, dpi=72),
+}
+assert set(ENGINE_CALLS) == set(OPERATIONS)
+
+def _merge_streamed(pdf: bytes) -> None:
+    merge_pdf_files([BytesIO(pdf), BytesIO(pdf)], BytesIO())
+
+def _thumbnails(pdf: bytes) -> None:
+    # a cold cache, otherwise only the first repeat renders anything
+    with thumbnail_cache._lock:
+        thumbnail_cache._items.clear()
+        thumbnail_cache.size = 0
+    render_thumbnails(pdf, document_hash(pdf), [0], 256, "webp")
+
+UTILITY_CALLS: Dict[str, Callable[[bytes], object]] = {
+    "merge_streamed": _merge_streamed,
+    "pipeline": lambda pdf: run_pipeline_bytes(pdf, [
+        {"op": "add_text_watermark", "params": {"text": "DRAFT"}},
+        {"op": "n_up", "params": {"cols": 2, "rows": 1}},
+    ]),
+    "thumbnail": _thumbnails,
+    "estimate_raster_cost": lambda pdf: estimate_raster_cost(pdf, 150),
+    # run on every upload and every PDF response
+    "preflight": preflight_pdf,
+    "optimize_fast": lambda pdf: optimize_pdf(BytesIO(pdf), "fast"),
+    "optimize_max": lambda pdf: optimize_pdf(BytesIO(pdf), "max"),
+}
+
+Case = Tuple[str, str, Callable[[bytes], object]]
+
+def _cases(operations: Optional[Iterable[str]], engines: Iterable[str]) -> List[Case]:
+    cases: List[Case] = []
+    for operation, call in ENGINE_CALLS.items():
+        for name in engines:
+            engine = ENGINES[name]
+            cases.append((operation, name, lambda pdf, c=call, e=engine: c(e, pdf)))
+    for operation, call in UTILITY_CALLS.items():
+        cases.append((operation, UTILITY, call))
+    if operations:
+        wanted = set(operations)
+        cases = [case for case in cases if case[0] in wanted]
+    return cases
+
+def measure(func: Callable[[bytes], object], pdf: bytes, repeat: int) -> Tuple[float, int]:
+    """Fastest of `repeat` untraced runs and the traced peak of one run."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(pdf)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        func(pdf)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+def run(
+    corpora: Iterable[str],
+    scales: Iterable[str],
+    operations: Optional[Iterable[str]] = None,
+    engines: Iterable[str] = tuple(ENGINES),
+    repeat: int = 3,
+    log=print,
+) -> List[Dict]:
+    results = []
+    cases = _cases(operations, engines)
+    for corpus in corpora:
+        for scale in scales:
+            pdf = CORPORA[corpus](SCALES[scale])
+            for operation, engine, func in cases:
+                row = {
+                    "operation": operation,
+                    "engine": engine,
+                    "corpus": corpus,
+                    "scale": scale,
+                    "input_bytes": len(pdf),
+                }
+                try:
+                    row["seconds"], row["peak_bytes"] = measure(func, pdf, repeat)
+                except Exception as exc:  # a failing case must not stop the suite
+                    row["error"] = f"{type(exc).__name__}: {exc}"
+                    log(f"{corpus}/{scale} {operation} [{engine}] failed: {row['error']}")
+                else:
+                    log(
+                        f"{corpus}/{scale} {operation} [{engine}] "
+                        f"{row['seconds'] * 1000:.1f} ms, peak {row['peak_bytes'] / 2**20:.1f} MiB"
+                    )
+                results.append(row)
+    return results
+
+def _key(row: Dict) -> Tuple:
+    return (row["operation"], row["engine"], row.get("corpus"), row.get("scale"))
+
+def compare(
+    results: List[Dict],
+    baseline: List[Dict],
+    time_threshold: float,
+    memory_threshold: float,
+    min_seconds: float = 0.005,
+) -> List[str]:
+    """
+    Regressions of `results` against `baseline`, one message per case.
+    Cases faster than `min_seconds` in the baseline are only checked for
+    memory; their timings are mostly noise.
+    """
+    previous = {_key(row): row for row in baseline if "seconds" in row}
+    regressions = []
+    for row in results:
+        old = previous.get(_key(row))
+        if old is None:
+            continue
+        name = "{}/{} {} [{}]".format(row.get("corpus"), row.get("scale"), row["operation"], row["engine"])
+        if "error" in row:
+            regressions.append(f"{name}: now fails ({row['error']})")
+            continue
+        if old["seconds"] >= min_seconds and row["seconds"] > old["seconds"] * (1 + time_threshold):
+            regressions.append(
+                f"{name}: {row['seconds']:.4f} s vs {old['seconds']:.4f} s "
+                f"(+{row['seconds'] / old['seconds'] - 1:.0%})"
+            )
+        if row["peak_bytes"] > old["peak_bytes"] * (1 + memory_threshold):
+            regressions.append(
+                f"{name}: peak {row['peak_bytes']} B vs {old['peak_bytes']} B "
+                f"(+{row['peak_bytes'] / max(old['peak_bytes'], 1) - 1:.0%})"
+            )
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown, 0.2 = 20 %% (default)")
+    parser.add_argument("--memory-threshold", type=float, default=0.2,
+                        help="allowed growth of the traced peak (default 0.2)")
+    parser.add_argument("--corpus", action="append", choices=sorted(CORPORA),
+                        help="corpora to run (default: all)")
+    parser.add_argument("--scale", action="append", choices=list(SCALES),
+                        help="scales to run (default: small and medium)")
+    parser.add_argument("--operation", action="append",
+                        help="operations to run (default: all)")
+    parser.add_argument("--engine", action="append", choices=sorted(ENGINES),
+                        help="engines to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quick", action="store_true",
+                        help="small scale, one repeat")
+    args = parser.parse_args(argv)
+
+    scales = args.scale or (["small"] if args.quick else ["small", "medium"])
+    try:
+        results = run(
+            args.corpus or list(CORPORA),
+            scales,
+            args.operation,
+            args.engine or list(ENGINES),
+            1 if args.quick else args.repeat,
+        )
+    finally:
+        shutdown_pool()
+
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(
+            {
+                "meta": {
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "cpus": os.cpu_count(),
+                },
+                "results": results,
+            },
+            fh,
+            indent=1,
+        )
+    print(f"wrote {len(results)} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh).get("results", [])
+        regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print("no regressions against", args.baseline)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
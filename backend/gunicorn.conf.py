@@ -0,0 +1,33 @@
+# konfigurácia gunicornu pre produkčný režim; hodnoty sú v Settings (SERVER_*)
+#
+#   gunicorn -c gunicorn.conf.py app.main:app
+#
+# Master načíta aplikáciu (PyMuPDF, Pillow, pypdf, SQLAlchemy) raz a workery
+# sa z neho forkujú, takže tieto moduly zdieľajú pamäť (copy-on-write).
+# Worker sa recykluje po SERVER_MAX_REQUESTS požiadavkách (+ náhodný jitter,
+# aby sa nereštartovali naraz) alebo keď jeho RSS prekročí SERVER_MAX_RSS.
+# SIGTERM najprv dokončí rozbehnuté požiadavky (SERVER_GRACEFUL_TIMEOUT).
+# Workery si metriky zapisujú do METRICS_DIR, takže /metrics sčíta celý
+# server; počítadlá ukončených workerov master zachová (child_exit).
+from app.core.server import (
+    gunicorn_options,
+    init_worker,
+    prepare_metrics_dir,
+    retire_worker_metrics,
+)
+
+globals().update(gunicorn_options())
+
+accesslog = "-"
+
+def on_starting(server):
+    prepare_metrics_dir()
+
+def post_fork(server, worker):
+    init_worker(server.cfg.workers)
+
+def worker_exit(server, worker):
+    server.log.info("Worker %s exited after %s requests", worker.pid, worker.nr)
+
+def child_exit(server, worker):
+    retire_worker_metrics(worker.pid)